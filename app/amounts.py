@@ -0,0 +1,79 @@
+# app/amounts.py
+"""
+Batch conversion of raw transaction amounts (proto doubles) to exact
+fixed-point cents for records.amount (Numeric(18, 2)).
+
+A whole decoded chunk is scaled and rounded in one step (NumPy when it is
+installed, a plain loop over array('d') otherwise) instead of a per-row
+Decimal(str(x)). The result is what Numeric(18, 2) stored for Decimal(str(x)):
+the shortest decimal text of the double, rounded half away from zero. Only
+values whose scaled double lies within rounding error of a half cent go
+through Decimal to get that right. Non-finite and out-of-range values come
+back flagged in a mask rather than being coerced to zero.
+"""
+from __future__ import annotations
+import math
+from array import array
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional speed-up; the array('d') path below is equivalent
+    np = None
+
+# Numeric(18, 2) allows 16 integer digits, but a double only carries exact
+# cents up to 2**53; larger values are rejected rather than silently rounded
+MAX_CENTS = 2**53 - 1
+# scaled doubles this many ulps (or 1e-6) from a half cent may round either way
+_TIE_ULPS = 8
+_CENT = Decimal(1)
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def _half_up(value: float) -> int:
+    # what Postgres stores for Decimal(str(value)) in a Numeric(18, 2)
+    return int(Decimal(repr(value)).scaleb(2).quantize(_CENT, rounding=ROUND_HALF_UP))
+
+def _near_tie(scaled: float) -> bool:
+    return abs(abs(scaled - math.trunc(scaled)) - 0.5) <= max(1e-6, _TIE_ULPS * math.ulp(scaled))
+
+def to_cents(amounts: Sequence) -> tuple[list[int], list[bool]]:
+    """
+    Round amounts to integer cents, half away from zero on their shortest
+    decimal text (as Numeric(18, 2) did with Decimal(str(x))).
+    Returns (cents, valid); cents is 0 where valid is False.
+    """
+    if np is not None:
+        try:
+            values = np.asarray(amounts, dtype=np.float64)
+        except (TypeError, ValueError):
+            values = np.fromiter((_as_float(a) for a in amounts), dtype=np.float64, count=len(amounts))
+        with np.errstate(over="ignore", invalid="ignore"):
+            scaled = values * 100.0
+            valid = np.isfinite(scaled) & (np.abs(scaled) <= MAX_CENTS)
+            rounded = np.rint(scaled)
+            tie = valid & (np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5)
+                           <= np.maximum(1e-6, _TIE_ULPS * np.spacing(np.abs(scaled))))
+        cents = np.where(valid, rounded, 0.0).astype(np.int64)
+        for i in np.flatnonzero(tie).tolist():
+            cents[i] = _half_up(float(values[i]))
+        return cents.tolist(), valid.tolist()
+
+    values = array("d", (_as_float(a) for a in amounts))
+    cents, valid = [], []
+    for v in values:
+        scaled = v * 100.0
+        ok = math.isfinite(scaled) and abs(scaled) <= MAX_CENTS
+        cents.append((_half_up(v) if _near_tie(scaled) else round(scaled)) if ok else 0)
+        valid.append(ok)
+    return cents, valid
+
+def cents_text(cents: int) -> str:
+    """Exact decimal text for an integer number of cents, e.g. -1205 -> '-12.05'."""
+    whole, frac = divmod(abs(cents), 100)
+    return f"{'-' if cents < 0 else ''}{whole}.{frac:02d}"
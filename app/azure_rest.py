@@ -1,9 +1,17 @@
 # app/azure_rest.py
 import base64
+import hashlib
+import json
 import os
+import threading
 import xml.etree.ElementTree as ET
-from typing import Iterator, NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import IO, Iterator, NamedTuple
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from app.config import settings
 from app.logging import get_logger
 
@@ -12,6 +20,48 @@ log = get_logger(__name__)
 class BlobItem(NamedTuple):
     name: str
     etag: str
+    last_modified: datetime | None = None
+    size: int | None = None
+    content_md5: str | None = None  # hex, from the listing's Content-MD5 when the blob has one
+
+class BlobFetch(NamedTuple):
+    etag: str
+    content_md5: str | None  # hex MD5 of the bytes received
+    size: int
+    not_modified: bool = False  # If-None-Match matched; nothing was written
+
+class ListCursor:
+    """
+    Mutable progress of a list_blobs() walk. page_marker is the marker that
+    fetched the page currently being yielded (None for the first page), so a
+    caller can persist it and resume listing from that page on the next run.
+    """
+    def __init__(self) -> None:
+        self.page_marker: str | None = None
+        self.pages = 0
+
+# shared, pooled HTTP session (requests.Session is safe for concurrent GETs)
+_SESSION: requests.Session | None = None
+_SESSION_LOCK = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide requests.Session used for all Blob REST calls.
+    The connection pool is sized for DOWNLOAD_WORKERS blobs times
+    DOWNLOAD_SEGMENT_WORKERS ranges so parallel downloads reuse keep-alive
+    connections instead of opening one per request.
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                pool = max(1, settings.DOWNLOAD_WORKERS) * max(1, settings.DOWNLOAD_SEGMENT_WORKERS)
+                sess = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool, pool_maxsize=pool)
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+                _SESSION = sess
+    return _SESSION
 
 def _base_url() -> str:
     if settings.AZURE_BASE_URL:
@@ -32,49 +82,345 @@ def _auth_headers() -> dict:
         return {"Authorization": f"Basic {token}"}
     return {}
 
-def list_blobs(prefix: str | None = None) -> Iterator[BlobItem]:
+def _parse_http_date(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+def md5_hex(content_md5: str | None) -> str | None:
+    """Azure's base64 Content-MD5 as lowercase hex (None if absent or malformed)."""
+    if not content_md5:
+        return None
+    try:
+        return base64.b64decode(content_md5).hex()
+    except (ValueError, TypeError):
+        return None
+
+def _iter_blob_page(body, page: dict) -> Iterator[BlobItem]:
+    """
+    Incrementally parse one List Blobs XML body (a file-like object).
+    Yields a BlobItem as soon as each <Blob> closes and drops processed
+    elements, so memory stays flat regardless of page size. The page's
+    NextMarker is stored in page["next_marker"].
+    """
+    blobs_el = None
+    for event, el in ET.iterparse(body, events=("start", "end")):
+        if event == "start":
+            if el.tag == "Blobs":
+                blobs_el = el
+            continue
+        if el.tag == "Blob":
+            name = el.findtext("Name")
+            etag = el.findtext("Properties/Etag") or ""
+            last_modified = _parse_http_date(el.findtext("Properties/Last-Modified"))
+            length = el.findtext("Properties/Content-Length")
+            yield BlobItem(
+                name=name,
+                etag=etag.strip('"'),
+                last_modified=last_modified,
+                size=int(length) if length else None,
+                content_md5=md5_hex(el.findtext("Properties/Content-MD5")),
+            )
+            el.clear()
+            if blobs_el is not None:
+                blobs_el.clear()
+        elif el.tag == "NextMarker":
+            page["next_marker"] = el.text
+
+def list_blobs(prefix: str | None = None, marker: str | None = None, cursor: ListCursor | None = None) -> Iterator[BlobItem]:
     """
     List blobs in the container via the Azure REST 'List Blobs' XML API.
-    Yields BlobItem(name, etag).
+    Yields BlobItem(name, etag, last_modified, size, content_md5) while each page is still
+    downloading (the response body is parsed as a stream).
+    Starts from `marker` if given; `cursor` (if given) tracks the marker of
+    the page being yielded.
     """
-    marker = None
     while True:
-        params = {"restype": "container", "comp": "list"}
+        if cursor is not None:
+            cursor.page_marker = marker
+            cursor.pages += 1
+        params = {"restype": "container", "comp": "list", "maxresults": str(settings.AZURE_LIST_MAX_RESULTS)}
+        if settings.AZURE_LIST_INCLUDE:
+            params["include"] = settings.AZURE_LIST_INCLUDE
         if prefix:
             params["prefix"] = prefix
         if marker:
             params["marker"] = marker
 
-        resp = requests.get(_container_url(), headers=_auth_headers(), params=params, timeout=30)
-        resp.raise_for_status()
-
-        root = ET.fromstring(resp.content)
-        for blob in root.findall(".//Blobs/Blob"):
-            name = blob.findtext("Name")
-            etag = blob.findtext("Properties/Etag") or ""
-            yield BlobItem(name=name, etag=etag.strip('"'))
+        page: dict = {}
+        with get_session().get(_container_url(), headers=_auth_headers(), params=params, stream=True, timeout=30) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            yield from _iter_blob_page(resp.raw, page)
 
-        marker = root.findtext(".//NextMarker")
+        marker = page.get("next_marker")
         if not marker:
             break
 
-def download_blob(blob_name: str, dest_path: str) -> str:
-    """
-    Download a blob to dest_path. Returns the blob's ETag (without quotes).
-    """
+def _blob_url(blob_name: str) -> str:
     url = f"{_base_url()}/{settings.AZURE_CONTAINER}/{blob_name}"
     if settings.AZURE_SAS_TOKEN:
         sep = "&" if "?" in url else "?"
         url = f"{url}{sep}{settings.AZURE_SAS_TOKEN}"
+    return url
+
+class BlobIntegrityError(IOError):
+    """Downloaded bytes do not match the blob's Content-MD5."""
+
+def _readinto_file(raw, fd: int, offset: int, buf: bytearray) -> tuple:
+    """Copy a response body into fd at offset with large readinto() buffers. Returns (bytes, md5)."""
+    view = memoryview(buf)
+    md5 = hashlib.md5()
+    written = 0
+    while True:
+        n = raw.readinto(view)
+        if not n:
+            break
+        os.pwrite(fd, view[:n], offset + written)
+        md5.update(view[:n])
+        written += n
+    return written, md5
+
+def _file_md5(fd: int, size: int):
+    md5 = hashlib.md5()
+    pos = 0
+    while pos < size:
+        chunk = os.pread(fd, settings.DOWNLOAD_BUFFER_BYTES, pos)
+        if not chunk:
+            break
+        md5.update(chunk)
+        pos += len(chunk)
+    return md5
+
+def _total_size(r: requests.Response) -> int:
+    # "Content-Range: bytes 0-8388607/123456789" on 206; plain Content-Length on 200
+    cr = r.headers.get("Content-Range")
+    if r.status_code == 206 and cr and "/" in cr:
+        return int(cr.rsplit("/", 1)[1])
+    return int(r.headers.get("Content-Length", "0"))
+
+def _load_progress(path: str, etag: str, size: int, segment: int) -> set[int]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            st = json.load(fh)
+    except (OSError, ValueError):
+        return set()
+    if st.get("etag") != etag or st.get("size") != size or st.get("segment") != segment:
+        return set()
+    return set(st.get("done", []))
+
+def _save_progress(path: str, etag: str, size: int, segment: int, done: set[int]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"etag": etag, "size": size, "segment": segment, "done": sorted(done)}, fh)
+    os.replace(tmp, path)
+
+def _finalize(fd: int, part_path: str, dest_path: str) -> None:
+    os.fsync(fd)
+    os.close(fd)
+    os.replace(part_path, dest_path)
+    dir_fd = os.open(os.path.dirname(dest_path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def fetch_blob(blob_name: str, out: IO[bytes], session: requests.Session | None = None) -> BlobFetch:
+    """
+    Stream a blob's body into the writable file object `out` (e.g. a
+    SpooledTemporaryFile) without touching INCOMING_DIR.
+    The body is hashed while streaming and checked against Content-MD5 when
+    the blob has one.
+    """
+    sess = session or get_session()
+    view = memoryview(bytearray(settings.DOWNLOAD_BUFFER_BYTES))
+    md5 = hashlib.md5()
+    size = 0
+    with sess.get(_blob_url(blob_name), headers=_auth_headers(), stream=True, timeout=60) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True
+        while True:
+            n = r.raw.readinto(view)
+            if not n:
+                break
+            out.write(view[:n])
+            md5.update(view[:n])
+            size += n
+        content_md5 = r.headers.get("Content-MD5")
+        etag = r.headers.get("ETag", "").strip('"')
+    if content_md5 and base64.b64encode(md5.digest()).decode() != content_md5:
+        raise BlobIntegrityError(f"Content-MD5 mismatch for {blob_name}")
+    return BlobFetch(etag, md5.hexdigest(), size)
+
+def download_blob(blob_name: str, dest_path: str, session: requests.Session | None = None) -> str:
+    """
+    Download a blob to dest_path. Returns the blob's ETag (without quotes).
+    See get_blob() for how the bytes are fetched.
+    """
+    return get_blob(blob_name, dest_path, session=session).etag
+
+def get_blob(blob_name: str, dest_path: str, session: requests.Session | None = None,
+             if_none_match: str | None = None) -> BlobFetch:
+    """
+    Download a blob to dest_path and return its ETag, MD5 and size.
+    Uses the shared pooled session unless one is passed in. With
+    if_none_match (an ETag) the request is conditional: if the blob still has
+    that ETag nothing is written and BlobFetch.not_modified is True.
+
+    Bytes land in dest_path + ".part" and are fsynced and atomically renamed
+    once complete, so dest_path never holds a partial file. Blobs larger than
+    DOWNLOAD_SEGMENT_BYTES are fetched as concurrent HTTP Range segments
+    (pinned to the first response's ETag with If-Match) written at their
+    offsets into a preallocated file; completed segments are recorded in
+    dest_path + ".part.json" so a failed download resumes where it stopped.
+    The result is checked against the blob's Content-MD5 when it has one.
+    """
+    sess = session or get_session()
+    url = _blob_url(blob_name)
+    seg = max(1, settings.DOWNLOAD_SEGMENT_BYTES)
+    part_path = dest_path + ".part"
+    progress_path = part_path + ".json"
 
     os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    with requests.get(url, headers=_auth_headers(), stream=True, timeout=60) as r:
+    buf = bytearray(settings.DOWNLOAD_BUFFER_BYTES)
+    cond = {"If-None-Match": f'"{if_none_match}"'} if if_none_match else {}
+    r = sess.get(url, headers={**_auth_headers(), **cond, "Range": f"bytes=0-{seg - 1}"}, stream=True, timeout=60)
+    if r.status_code == 416:
+        # empty blobs reject any Range; fetch them plainly
+        r.close()
+        r = sess.get(url, headers={**_auth_headers(), **cond}, stream=True, timeout=60)
+    if r.status_code == 304:
+        r.close()
+        log.info("Blob %s not modified (etag=%s); skipped download", blob_name, if_none_match)
+        return BlobFetch(if_none_match, None, 0, True)
+    with r:
         r.raise_for_status()
-        with open(dest_path, "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        r.raw.decode_content = True
         etag = r.headers.get("ETag", "").strip('"')
-    log.info("Downloaded %s → %s (etag=%s)", blob_name, dest_path, etag)
-    return etag
+        size = _total_size(r)
+        content_md5 = r.headers.get("x-ms-blob-content-md5") or (r.headers.get("Content-MD5") if r.status_code == 200 else None)
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if r.status_code == 200 or size <= seg:
+                # whole blob in this one response
+                os.ftruncate(fd, 0)
+                written, md5 = _readinto_file(r.raw, fd, 0, buf)
+                if content_md5 and base64.b64encode(md5.digest()).decode() != content_md5:
+                    raise BlobIntegrityError(f"Content-MD5 mismatch for {blob_name}")
+                _finalize(fd, part_path, dest_path)
+                fd = -1
+                log.info("Downloaded %s → %s (etag=%s, %d bytes)", blob_name, dest_path, etag, written)
+                return BlobFetch(etag, md5.hexdigest(), written)
+
+            n_segments = (size + seg - 1) // seg
+            done = _load_progress(progress_path, etag, size, seg)
+            if not done:
+                os.ftruncate(fd, 0)
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+            if 0 not in done:
+                _readinto_file(r.raw, fd, 0, buf)
+                done.add(0)
+                _save_progress(progress_path, etag, size, seg, done)
+        except BaseException:
+            if fd >= 0:
+                os.close(fd)
+            raise
+
+    try:
+        _download_segments(sess, url, fd, etag, size, seg, n_segments, done, progress_path)
+        md5 = _file_md5(fd, size)
+        if content_md5 and base64.b64encode(md5.digest()).decode() != content_md5:
+            os.close(fd)
+            fd = -1
+            for p in (part_path, progress_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            raise BlobIntegrityError(f"Content-MD5 mismatch for {blob_name}")
+        _finalize(fd, part_path, dest_path)
+        fd = -1
+    finally:
+        if fd >= 0:
+            os.close(fd)
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    log.info("Downloaded %s → %s (etag=%s, %d bytes in %d segments)", blob_name, dest_path, etag, size, n_segments)
+    return BlobFetch(etag, md5.hexdigest(), size)
+
+def _download_segments(sess, url, fd, etag, size, seg, n_segments, done, progress_path) -> None:
+    lock = threading.Lock()
+
+    def fetch(i: int) -> None:
+        start = i * seg
+        end = min(size, start + seg) - 1
+        headers = {**_auth_headers(), "Range": f"bytes={start}-{end}", "If-Match": f'"{etag}"'}
+        with sess.get(url, headers=headers, stream=True, timeout=60) as r:
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise IOError(f"Range request for bytes {start}-{end} returned {r.status_code}")
+            r.raw.decode_content = True
+            written, _ = _readinto_file(r.raw, fd, start, bytearray(settings.DOWNLOAD_BUFFER_BYTES))
+        if written != end - start + 1:
+            raise IOError(f"Short read for bytes {start}-{end}: got {written}")
+        with lock:
+            done.add(i)
+            _save_progress(progress_path, etag, size, seg, done)
+
+    todo = [i for i in range(n_segments) if i not in done]
+    if not todo:
+        return
+    workers = max(1, min(settings.DOWNLOAD_SEGMENT_WORKERS, len(todo)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blob-seg") as pool:
+        # list() re-raises the first failure once in-flight segments settle;
+        # finished segments stay recorded for the next attempt
+        list(pool.map(fetch, todo))
+
+def get_blob_properties(blob_name: str, session: requests.Session | None = None) -> CaseInsensitiveDict | None:
+    """
+    HEAD the blob (Get Blob Properties). Returns its response headers (looked
+    up case-insensitively, whatever casing the server or a proxy sends), or
+    None if it does not exist.
+    """
+    sess = session or get_session()
+    r = sess.head(_blob_url(blob_name), headers=_auth_headers(), timeout=30)
+    if r.status_code == 404:
+        return None
+    r.raise_for_status()
+    return r.headers
+
+def put_blob(blob_name: str, data: bytes, content_type: str, content_md5: str | None = None,
+             session: requests.Session | None = None) -> str:
+    """Create/replace a block blob in a single request. Returns the new ETag."""
+    sess = session or get_session()
+    headers = {**_auth_headers(), "x-ms-blob-type": "BlockBlob", "Content-Type": content_type}
+    if content_md5:
+        headers["Content-MD5"] = content_md5
+    r = sess.put(_blob_url(blob_name), headers=headers, data=data, timeout=60)
+    r.raise_for_status()
+    return r.headers.get("ETag", "").strip('"')
+
+def put_block(blob_name: str, block_id: str, data: bytes | memoryview,
+              session: requests.Session | None = None) -> None:
+    """Stage one uncommitted block (Put Block); block_id is already base64-encoded."""
+    sess = session or get_session()
+    r = sess.put(_blob_url(blob_name), params={"comp": "block", "blockid": block_id},
+                 headers=_auth_headers(), data=data, timeout=120)
+    r.raise_for_status()
 
+def put_block_list(blob_name: str, block_ids: list[str], content_type: str, content_md5: str | None = None,
+                   session: requests.Session | None = None) -> str:
+    """Commit staged blocks in order (Put Block List). Returns the new ETag."""
+    sess = session or get_session()
+    body = "".join(f"<Latest>{b}</Latest>" for b in block_ids)
+    body = f'<?xml version="1.0" encoding="utf-8"?><BlockList>{body}</BlockList>'.encode()
+    headers = {**_auth_headers(), "Content-Type": "application/xml", "x-ms-blob-content-type": content_type}
+    if content_md5:
+        headers["x-ms-blob-content-md5"] = content_md5
+    r = sess.put(_blob_url(blob_name), params={"comp": "blocklist"}, headers=headers, data=body, timeout=60)
+    r.raise_for_status()
+    return r.headers.get("ETag", "").strip('"')
@@ -1,6 +1,7 @@
 # app/config.py
 from __future__ import annotations
 import sys
+from typing import Literal
 from pydantic import Field, AnyHttpUrl
 from pydantic_settings import BaseSettings
 
@@ -13,13 +14,88 @@ class Settings(BaseSettings):
     AZURE_BASIC_USER: str | None = Field(None, env="AZURE_BASIC_USER")
     AZURE_BASIC_PASS: str | None = Field(None, env="AZURE_BASIC_PASS")
 
+    # Blob listing: page size and extra datasets (e.g. "metadata"); empty keeps pages small
+    AZURE_LIST_MAX_RESULTS: int = Field(5000, env="AZURE_LIST_MAX_RESULTS")
+    AZURE_LIST_INCLUDE: str = Field("", env="AZURE_LIST_INCLUDE")
+
+    # Blob downloads
+    DOWNLOAD_WORKERS: int = Field(8, env="DOWNLOAD_WORKERS")
+    # blobs above one segment are fetched as concurrent HTTP Range segments
+    DOWNLOAD_SEGMENT_BYTES: int = Field(8 * 1024 * 1024, env="DOWNLOAD_SEGMENT_BYTES")
+    DOWNLOAD_SEGMENT_WORKERS: int = Field(4, env="DOWNLOAD_SEGMENT_WORKERS")
+    DOWNLOAD_BUFFER_BYTES: int = Field(1024 * 1024, env="DOWNLOAD_BUFFER_BYTES")
+
+    # Disk-free ingest: decode small blobs straight from memory (spilling to a
+    # temp file above INGEST_SPOOL_BYTES); larger blobs still go to INCOMING_DIR
+    INGEST_IN_MEMORY: bool = Field(False, env="INGEST_IN_MEMORY")
+    INGEST_MEMORY_MAX_BYTES: int = Field(64 * 1024 * 1024, env="INGEST_MEMORY_MAX_BYTES")
+    INGEST_SPOOL_BYTES: int = Field(8 * 1024 * 1024, env="INGEST_SPOOL_BYTES")
+    INGEST_KEEP_LOCAL_COPY: bool = Field(False, env="INGEST_KEEP_LOCAL_COPY")
+
+    # Content-addressed store (by MD5) that downloaded payloads are moved into
+    CONTENT_STORE_DIR: str = Field("./app/runtime/objects", env="CONTENT_STORE_DIR")
+
+    # Blob uploads (scripts/upload_via_rest.py); memory use is capped at UPLOAD_MEMORY_BYTES of blocks
+    UPLOAD_WORKERS: int = Field(4, env="UPLOAD_WORKERS")
+    UPLOAD_BLOCK_WORKERS: int = Field(8, env="UPLOAD_BLOCK_WORKERS")
+    UPLOAD_BLOCK_BYTES: int = Field(4 * 1024 * 1024, env="UPLOAD_BLOCK_BYTES")
+    UPLOAD_MEMORY_BYTES: int = Field(64 * 1024 * 1024, env="UPLOAD_MEMORY_BYTES")
+
+    # Incremental listing
+    SYNC_PREFIX: str | None = Field(None, env="SYNC_PREFIX")
+    SYNC_FULL_SWEEP_SECONDS: int = Field(3600, env="SYNC_FULL_SWEEP_SECONDS")
+    # only sync <name>.pb together with control_<name>.json; a File is recorded once both land
+    SYNC_PAIR_MODE: bool = Field(False, env="SYNC_PAIR_MODE")
+
     # Database
     DATABASE_URL: str = Field(..., env="DATABASE_URL")
+    # rows per multi-row INSERT when COPY is unavailable (non-psycopg Postgres drivers)
+    BULK_LOAD_CHUNK_ROWS: int = Field(5000, env="BULK_LOAD_CHUNK_ROWS")
+    # transactions decoded per step by app.pb_stream (bounds parse memory)
+    PARSE_BATCH_SIZE: int = Field(10000, env="PARSE_BATCH_SIZE")
+    # >1 parses NEW files on that many processes, claiming PARSE_CLAIM_BATCH at a time
+    PARSE_WORKERS: int = Field(1, env="PARSE_WORKERS")
+    PARSE_CLAIM_BATCH: int = Field(4, env="PARSE_CLAIM_BATCH")
+    # PARSING claims older than this belong to a crashed worker and are released;
+    # a live worker refreshes its queued claims as each file is parsed and holds
+    # the row lock of the file it is parsing, so it must exceed one file's parse
+    PARSE_CLAIM_TIMEOUT_SECONDS: int = Field(900, env="PARSE_CLAIM_TIMEOUT_SECONDS")
+
+    # Bill files: extra root types to recognise ("package.module:Class"), and for each
+    # root type name the dotted path of the repeated invoice/statement message that
+    # app.fanout splits into bill_parts rows, e.g. {"BillData": "statements.invoices"}
+    PB_EXTRA_ROOTS: list[str] = Field(default_factory=list, env="PB_EXTRA_ROOTS")
+    FANOUT_PATHS: dict[str, str] = Field(default_factory=dict, env="FANOUT_PATHS")
+    FANOUT_INLINE_BYTES: bool = Field(True, env="FANOUT_INLINE_BYTES")
+
+    # Workday mapping (app.workday); PB_DEBUG_JSON also writes each decoded bill as <name>.json
+    WORKDAY_COMPANY_ID: str = Field("", env="WORKDAY_COMPANY_ID")
+    PB_DEBUG_JSON: bool = Field(False, env="PB_DEBUG_JSON")
 
     # SOAP
     SOAP_WSDL_URL: AnyHttpUrl = Field(..., env="SOAP_WSDL_URL")
     SOAP_USER: str | None = Field(None, env="SOAP_USER")
     SOAP_PASS: str | None = Field(None, env="SOAP_PASS")
+    # app.soap_dispatch: calls in flight, records claimed per round, rows per write-back transaction
+    SOAP_CONCURRENCY: int = Field(8, env="SOAP_CONCURRENCY")
+    SOAP_CLAIM_BATCH: int = Field(500, env="SOAP_CLAIM_BATCH")
+    SOAP_WRITEBACK_BATCH: int = Field(200, env="SOAP_WRITEBACK_BATCH")
+    # PROCESSING records untouched this long belong to a crashed sender and are resent;
+    # a live sender refreshes its claims at least every third of this, so it must
+    # exceed the longest single send (retries x timeout + backoff)
+    SOAP_CLAIM_TIMEOUT_SECONDS: int = Field(900, env="SOAP_CLAIM_TIMEOUT_SECONDS")
+    # "threads": SOAP_CONCURRENCY Zeep clients; "asyncio": app.soap_async with
+    # up to SOAP_ASYNC_INFLIGHT keep-alive connections on one event loop
+    SOAP_BACKEND: Literal["threads", "asyncio"] = Field("threads", env="SOAP_BACKEND")
+    SOAP_ASYNC_INFLIGHT: int = Field(256, env="SOAP_ASYNC_INFLIGHT")
+    # >1: send up to this many records per ProcessTransactionBatch envelope (thread pool)
+    SOAP_BATCH_SIZE: int = Field(1, env="SOAP_BATCH_SIZE")
+    # app.soap_fast: byte templates instead of Zeep serialization where the operation allows it
+    SOAP_FAST_PATH: bool = Field(True, env="SOAP_FAST_PATH")
+    # app.wsdl_cache: fetched WSDL/XSD documents and the compiled client ("" disables); past
+    # the TTL the documents are fetched again and the client recompiled only if they changed
+    WSDL_CACHE_DIR: str = Field("./app/runtime/wsdl_cache", env="WSDL_CACHE_DIR")
+    WSDL_CACHE_TTL_SECONDS: int = Field(86400, env="WSDL_CACHE_TTL_SECONDS")
 
     # Orchestration
     SCHED_INTERVAL_SECONDS: int = Field(60, env="SCHED_INTERVAL_SECONDS")
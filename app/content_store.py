@@ -0,0 +1,48 @@
+# app/content_store.py
+"""
+Content-addressed store for downloaded blob payloads, keyed by MD5 hex (the
+digest Azure exposes as Content-MD5, or computed while streaming). Objects
+live at CONTENT_STORE_DIR/<md5[:2]>/<md5> and are written once, so a File
+row's local_path stays valid when a later version of the blob lands, and a
+blob whose ETag changed without its bytes changing is never fetched twice.
+"""
+from __future__ import annotations
+import os
+import shutil
+from typing import IO
+from app.config import settings
+
+def object_path(md5_hex: str) -> str:
+    return os.path.join(str(settings.CONTENT_STORE_DIR), md5_hex[:2], md5_hex)
+
+def lookup(md5_hex: str | None) -> str | None:
+    """Path of the stored object for md5_hex, or None if it is not present."""
+    if not md5_hex:
+        return None
+    path = object_path(md5_hex)
+    return path if os.path.exists(path) else None
+
+def adopt(src_path: str, md5_hex: str) -> str:
+    """
+    Move a freshly downloaded file into the store and return its object path.
+    If the object is already present the download is identical and is removed.
+    """
+    path = object_path(md5_hex)
+    if os.path.exists(path):
+        os.unlink(src_path)
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(src_path, path)
+    return path
+
+def put_stream(body: IO[bytes], md5_hex: str) -> str:
+    """Write a file object into the store (if absent), rewind it and return the object path."""
+    path = object_path(md5_hex)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.part"
+        with open(tmp, "wb") as fh:
+            shutil.copyfileobj(body, fh, settings.DOWNLOAD_BUFFER_BYTES)
+        os.replace(tmp, path)
+        body.seek(0)
+    return path
@@ -0,0 +1,128 @@
+# app/downloader.py
+from __future__ import annotations
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from tempfile import SpooledTemporaryFile
+from typing import IO, Callable, Iterable, Iterator, Mapping, NamedTuple
+from app import content_store
+from app.azure_rest import BlobItem, fetch_blob, get_blob, get_session
+from app.config import settings
+from app.logging import get_logger
+
+log = get_logger(__name__)
+
+class DownloadResult(NamedTuple):
+    blob_name: str
+    etag: str
+    local_path: str | None
+    error: str | None = None
+    elapsed: float = 0.0
+    # in-memory ingest: the blob body, rewound; the caller must close() it
+    body: IO[bytes] | None = None
+    content_md5: str | None = None
+    # True if no bytes were transferred (content already in the store, or 304)
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class PriorVersion(NamedTuple):
+    """An earlier File row for the same blob name, used for If-None-Match."""
+    etag: str
+    content_md5: str
+    local_path: str
+
+def _cached(item: BlobItem, path: str, md5: str, start: float, etag: str | None = None) -> DownloadResult:
+    return DownloadResult(item.name, etag or item.etag, path, None, time.perf_counter() - start,
+                          content_md5=md5, cached=True)
+
+def _download_one(item: BlobItem, dest: str, prior: PriorVersion | None = None) -> DownloadResult:
+    start = time.perf_counter()
+    stored = content_store.lookup(item.content_md5)
+    if stored:
+        return _cached(item, stored, item.content_md5, start)
+    try:
+        if_none_match = prior.etag if prior and content_store.lookup(prior.content_md5) else None
+        got = get_blob(item.name, dest, session=get_session(), if_none_match=if_none_match)
+        if got.not_modified:
+            return _cached(item, prior.local_path, prior.content_md5, start, prior.etag)
+        path = content_store.adopt(dest, got.content_md5)
+    except Exception as e:
+        return DownloadResult(item.name, item.etag, dest, f"{type(e).__name__}: {e}", time.perf_counter() - start)
+    return DownloadResult(item.name, got.etag or item.etag, path, None, time.perf_counter() - start,
+                          content_md5=got.content_md5)
+
+def _spool_one(item: BlobItem) -> DownloadResult:
+    start = time.perf_counter()
+    stored = content_store.lookup(item.content_md5)
+    if stored:
+        return _cached(item, stored, item.content_md5, start)
+    body = SpooledTemporaryFile(max_size=settings.INGEST_SPOOL_BYTES)
+    try:
+        got = fetch_blob(item.name, body, session=get_session())
+        body.seek(0)
+    except Exception as e:
+        body.close()
+        return DownloadResult(item.name, item.etag, None, f"{type(e).__name__}: {e}", time.perf_counter() - start)
+    return DownloadResult(item.name, got.etag or item.etag, None, None, time.perf_counter() - start, body,
+                          content_md5=got.content_md5)
+
+def fits_in_memory(item: BlobItem) -> bool:
+    """True if INGEST_IN_MEMORY is on and the listed size is within INGEST_MEMORY_MAX_BYTES."""
+    return (
+        settings.INGEST_IN_MEMORY
+        and item.size is not None
+        and item.size <= settings.INGEST_MEMORY_MAX_BYTES
+    )
+
+def download_many(
+    items: Iterable[BlobItem],
+    dest_for: Callable[[str], str],
+    workers: int | None = None,
+    prior: Mapping[str, PriorVersion] | None = None,
+    in_memory: Callable[[BlobItem], bool] = fits_in_memory,
+) -> Iterator[DownloadResult]:
+    """
+    Download blobs concurrently on a bounded thread pool and yield a
+    DownloadResult per blob as soon as it finishes (completion order).
+    Blobs for which in_memory(item) (default fits_in_memory) is true are spooled into
+    DownloadResult.body instead of being written to dest_for(name).
+
+    Downloads go through app.content_store: a blob whose listed Content-MD5
+    is already stored is not fetched at all, a blob with an entry in `prior`
+    is requested with If-None-Match on that version's ETag, and files written
+    to dest_for(name) are moved into the store (local_path is the object path).
+
+    At most `workers` downloads are in flight and at most 2*workers items are
+    pulled from `items` ahead of completion, so a lazy listing is never
+    materialised in full. Failures are reported in DownloadResult.error and
+    never raised, so one bad blob does not abort the batch.
+    """
+    workers = max(1, workers or settings.DOWNLOAD_WORKERS)
+    window = workers * 2
+    it = iter(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blob-dl") as pool:
+        inflight = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(inflight) < window:
+                item = next(it, None)
+                if item is None:
+                    exhausted = True
+                    break
+                if in_memory(item):
+                    inflight.add(pool.submit(_spool_one, item))
+                else:
+                    inflight.add(pool.submit(_download_one, item, dest_for(item.name), (prior or {}).get(item.name)))
+            if not inflight:
+                break
+            done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                res = fut.result()
+                if res.ok:
+                    where = "cached" if res.cached else "memory" if res.body is not None else "disk"
+                    log.debug("Fetched %s in %.3fs (%s)", res.blob_name, res.elapsed, where)
+                else:
+                    log.warning("Failed downloading blob %s: %s", res.blob_name, res.error)
+                yield res
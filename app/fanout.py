@@ -0,0 +1,95 @@
+# app/fanout.py
+"""
+Fan-out of bill files into one `bill_parts` row per invoice/statement.
+
+The repeated sub-message named by FANOUT_PATHS[root type] (e.g.
+"statements.invoices") is located by walking the wire format
+(app.pb_stream.iter_fields) over an mmap, so the bill is never decoded or
+held in memory as a whole. Each part is stored as its byte span and,
+with FANOUT_INLINE_BYTES (always, for a file ingested from memory with no
+local copy), as its own serialized bytes, which decode directly as the
+sub-message type. Rows are bulk-inserted BULK_LOAD_CHUNK_ROWS at a time.
+The file itself then ends FANNED_OUT: the parts are for downstream bill
+consumers, and no Record rows or SOAP calls come from it.
+"""
+from __future__ import annotations
+import time
+from itertools import islice
+from typing import Iterable, Iterator
+from google.protobuf import descriptor_pool, message_factory
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from google.protobuf.message import Message
+from sqlalchemy import insert
+from app.config import settings
+from app.logging import get_logger
+from app.models import BillPart, File, RecordStatus
+from app.pb_sniff import Sniff
+from app.pb_stream import iter_fields, iter_frames, mapped
+
+log = get_logger(__name__)
+
+def resolve_path(descriptor: Descriptor, path: str) -> tuple[list[int], Descriptor]:
+    """
+    Field numbers along path (proto or JSON field names) and the descriptor
+    of the message it ends on. Every step must be a message field and the
+    last one must be repeated; raises ValueError otherwise.
+    """
+    numbers, desc = [], descriptor
+    for part in path.split("."):
+        fd = desc.fields_by_name.get(part) or next((f for f in desc.fields if f.json_name == part), None)
+        if fd is None or fd.type != FieldDescriptor.TYPE_MESSAGE:
+            raise ValueError(f"{path!r}: {part!r} is not a message field of {desc.full_name}")
+        numbers.append(fd.number)
+        desc = fd.message_type
+    if fd.label != FieldDescriptor.LABEL_REPEATED:
+        raise ValueError(f"{path!r} does not end on a repeated field")
+    return numbers, desc
+
+def iter_part_spans(buf, numbers: list[int], ranges: Iterable[tuple[int, int]]) -> Iterator[tuple[int, int]]:
+    """(start, stop) of every message at field-number path `numbers` within ranges of buf."""
+    head, rest = numbers[0], numbers[1:]
+    for pos, end in ranges:
+        for _, start, stop in iter_fields(buf, head, pos, end):
+            if rest:
+                yield from iter_part_spans(buf, rest, [(start, stop)])
+            else:
+                yield start, stop
+
+def _rows(f: File, buf, found: Sniff, path: str) -> Iterator[dict]:
+    numbers, part_desc = resolve_path(found.message_cls.DESCRIPTOR, path)
+    ranges = iter_frames(buf) if found.delimited else [(0, len(buf))]
+    # a span is only usable against a local copy of the file
+    inline = settings.FANOUT_INLINE_BYTES or not f.local_path
+    new = RecordStatus.NEW.value
+    for seq, (start, stop) in enumerate(iter_part_spans(buf, numbers, ranges)):
+        yield {
+            "file_id": f.id, "seq": seq, "message_type": part_desc.full_name,
+            "offset": start, "length": stop - start,
+            "payload": bytes(buf[start:stop]) if inline else None, "status": new,
+        }
+
+def fan_out(s, f: File, buf, found: Sniff) -> int:
+    """
+    Insert one BillPart per FANOUT_PATHS[found.name] message in buf for File f
+    and set f.total_records, inside the session's current transaction.
+    Returns the part count. Raises DecodeError on malformed framing.
+    """
+    start = time.perf_counter()
+    s.flush()
+    rows, count = _rows(f, buf, found, settings.FANOUT_PATHS[found.name]), 0
+    while chunk := list(islice(rows, settings.BULK_LOAD_CHUNK_ROWS)):
+        s.execute(insert(BillPart), chunk)
+        count += len(chunk)
+    f.total_records = count
+    log.info("Fanned out File id=%s (%s) into %d %s parts in %.2fs", f.id, found.name, count,
+             settings.FANOUT_PATHS[found.name], time.perf_counter() - start)
+    return count
+
+def load_part(part: BillPart) -> Message:
+    """The decoded sub-message of a BillPart, from its inline bytes or its span in the File's local copy."""
+    desc = descriptor_pool.Default().FindMessageTypeByName(part.message_type)
+    cls = message_factory.GetMessageClass(desc)
+    if part.payload is not None:
+        return cls.FromString(part.payload)
+    with mapped(part.file.local_path) as buf:
+        return cls.FromString(buf[part.offset:part.offset + part.length])
@@ -0,0 +1,88 @@
+# app/field_access.py
+"""
+Field accessors for decoded Transaction messages, resolved once per message
+descriptor instead of probing candidate attribute names per transaction.
+
+Protos in the wild spell the same field differently (recordId / record_id /
+id, amount / amt, ...). FIELD_CANDIDATES lists the accepted spellings; the
+first one present in the descriptor wins and the result is cached by the
+descriptor's full name as a single operator.attrgetter.
+"""
+from __future__ import annotations
+from operator import attrgetter
+from typing import Callable
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from app.logging import get_logger
+
+log = get_logger(__name__)
+
+# logical field -> accepted proto field names, in order of preference
+FIELD_CANDIDATES: dict[str, tuple[str, ...]] = {
+    "record_id": ("recordId", "record_id", "id"),
+    "name": ("name",),
+    "amount": ("amount", "amt"),
+    "currency": ("currency",),
+    "timestamp": ("timestamp", "time"),
+}
+# a descriptor without these cannot produce a usable Record
+REQUIRED = ("record_id", "amount")
+
+class FieldMappingError(ValueError):
+    """A message descriptor has no field for a required logical field."""
+
+_ACCESSORS: dict[str, Callable] = {}
+
+def _resolve(descriptor: Descriptor) -> list[FieldDescriptor | None]:
+    fields = descriptor.fields_by_name
+    resolved = []
+    for logical, names in FIELD_CANDIDATES.items():
+        fd = next((fields[n] for n in names if n in fields), None)
+        if fd is None and logical in REQUIRED:
+            raise FieldMappingError(
+                f"{descriptor.full_name} has no field for {logical!r} (tried {', '.join(names)})"
+            )
+        if fd is not None and fd.label == FieldDescriptor.LABEL_REPEATED:
+            raise FieldMappingError(f"{descriptor.full_name}.{fd.name} is repeated; expected a scalar")
+        resolved.append(fd)
+    return resolved
+
+def _compile(descriptor: Descriptor) -> Callable:
+    resolved = _resolve(descriptor)
+    missing = [k for k, fd in zip(FIELD_CANDIDATES, resolved) if fd is None]
+    if missing:
+        log.warning("%s has no field for %s; loading them as empty strings",
+                    descriptor.full_name, ", ".join(missing))
+    present = [fd for fd in resolved if fd is not None]
+    getter = attrgetter(*(fd.name for fd in present))
+    # string fields (and the double amount) are used as-is; anything else is stringified
+    needs_str = [
+        fd is not None and logical != "amount" and fd.type != FieldDescriptor.TYPE_STRING
+        for logical, fd in zip(FIELD_CANDIDATES, resolved)
+    ]
+    if not missing and not any(needs_str):
+        return getter
+
+    slots = [fd is not None for fd in resolved]
+    def get(msg) -> tuple:
+        values = iter(getter(msg))
+        return tuple(
+            (str(next(values)) if conv else next(values)) if has else ""
+            for has, conv in zip(slots, needs_str)
+        )
+    return get
+
+def accessor(descriptor: Descriptor) -> Callable:
+    """
+    Return a callable mapping a message to the tuple
+    (record_id, name, amount, currency, timestamp), compiled once per
+    descriptor. Raises FieldMappingError if a REQUIRED field is missing.
+    """
+    get = _ACCESSORS.get(descriptor.full_name)
+    if get is None:
+        get = _ACCESSORS[descriptor.full_name] = _compile(descriptor)
+    return get
+
+def transaction_accessor() -> Callable:
+    """accessor() for this repo's Transaction message; call early to fail fast on schema drift."""
+    from app.proto.transactions_pb2 import Transaction
+    return accessor(Transaction.DESCRIPTOR)
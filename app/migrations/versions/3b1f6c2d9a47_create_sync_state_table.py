@@ -0,0 +1,32 @@
+"""create sync_state table
+
+Revision ID: 3b1f6c2d9a47
+Revises: 0fc8508e82bb
+Create Date: 2026-10-18 09:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3b1f6c2d9a47'
+down_revision = '0fc8508e82bb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sync_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('container', sa.String(length=256), nullable=False),
+    sa.Column('prefix', sa.String(length=512), nullable=False),
+    sa.Column('marker', sa.Text(), nullable=True),
+    sa.Column('watermark', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('last_full_sweep_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('container', 'prefix', name='uq_sync_state_container_prefix')
+    )
+
+
+def downgrade():
+    op.drop_table('sync_state')
@@ -0,0 +1,43 @@
+"""add control pair columns to files and orphan_blobs table
+
+Revision ID: 5d9b0e3f7a12
+Revises: c41d7e9a2b65
+Create Date: 2026-10-18 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5d9b0e3f7a12'
+down_revision = 'c41d7e9a2b65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('files', sa.Column('control_blob_name', sa.String(length=512), nullable=True))
+    op.add_column('files', sa.Column('control_etag', sa.String(length=128), nullable=True))
+    op.add_column('files', sa.Column('control_path', sa.String(length=1024), nullable=True))
+    op.create_table('orphan_blobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('container', sa.String(length=256), nullable=False),
+    sa.Column('blob_name', sa.String(length=512), nullable=False),
+    sa.Column('etag', sa.String(length=128), nullable=False),
+    sa.Column('pair_key', sa.String(length=512), nullable=False),
+    sa.Column('kind', sa.String(length=8), nullable=False),
+    sa.Column('last_modified', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('content_md5', sa.String(length=32), nullable=True),
+    sa.Column('first_seen_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('container', 'blob_name', name='uq_orphan_blobs_container_blob')
+    )
+    op.create_index('ix_orphan_blobs_container_key', 'orphan_blobs', ['container', 'pair_key'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_orphan_blobs_container_key', table_name='orphan_blobs')
+    op.drop_table('orphan_blobs')
+    op.drop_column('files', 'control_path')
+    op.drop_column('files', 'control_etag')
+    op.drop_column('files', 'control_blob_name')
@@ -0,0 +1,23 @@
+"""make files.local_path nullable for disk-free ingest
+
+Revision ID: 8e2a4c71d5f0
+Revises: 3b1f6c2d9a47
+Create Date: 2026-10-18 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '8e2a4c71d5f0'
+down_revision = '3b1f6c2d9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('files', 'local_path', existing_type=sa.String(length=1024), nullable=True)
+
+
+def downgrade():
+    op.execute("UPDATE files SET local_path = '' WHERE local_path IS NULL")
+    op.alter_column('files', 'local_path', existing_type=sa.String(length=1024), nullable=False)
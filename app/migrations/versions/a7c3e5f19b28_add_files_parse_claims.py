@@ -0,0 +1,27 @@
+"""add files.claimed_by / claimed_at for parse worker claims
+
+Revision ID: a7c3e5f19b28
+Revises: 5d9b0e3f7a12
+Create Date: 2026-10-18 13:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f19b28'
+down_revision = '5d9b0e3f7a12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('files', sa.Column('claimed_by', sa.String(length=64), nullable=True))
+    op.add_column('files', sa.Column('claimed_at', sa.TIMESTAMP(timezone=True), nullable=True))
+    # claim queries scan NEW rows and reap PARSING ones
+    op.create_index('ix_files_status', 'files', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_files_status', table_name='files')
+    op.drop_column('files', 'claimed_at')
+    op.drop_column('files', 'claimed_by')
@@ -0,0 +1,22 @@
+"""add files.error_message for parse and ingest failures
+
+Revision ID: b3d5f7a9c1e4
+Revises: e6f1a3b8c4d2
+Create Date: 2026-10-18 15:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b3d5f7a9c1e4'
+down_revision = 'e6f1a3b8c4d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('files', sa.Column('error_message', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('files', 'error_message')
@@ -0,0 +1,30 @@
+"""add files.content_md5 and duplicate_of_id for content-addressed dedupe
+
+Revision ID: c41d7e9a2b65
+Revises: 8e2a4c71d5f0
+Create Date: 2026-10-18 11:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9a2b65'
+down_revision = '8e2a4c71d5f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('files', sa.Column('content_md5', sa.String(length=32), nullable=True))
+    op.add_column('files', sa.Column('duplicate_of_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_files_duplicate_of_id', 'files', 'files', ['duplicate_of_id'], ['id'], ondelete='SET NULL')
+    op.create_index(op.f('ix_files_content_md5'), 'files', ['content_md5'], unique=False)
+    op.create_index(op.f('ix_files_duplicate_of_id'), 'files', ['duplicate_of_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_files_duplicate_of_id'), table_name='files')
+    op.drop_index(op.f('ix_files_content_md5'), table_name='files')
+    op.drop_constraint('fk_files_duplicate_of_id', 'files', type_='foreignkey')
+    op.drop_column('files', 'duplicate_of_id')
+    op.drop_column('files', 'content_md5')
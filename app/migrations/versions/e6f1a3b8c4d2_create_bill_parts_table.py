@@ -0,0 +1,40 @@
+"""create bill_parts table for per-invoice fan-out of bill files
+
+Revision ID: e6f1a3b8c4d2
+Revises: a7c3e5f19b28
+Create Date: 2026-10-18 14:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e6f1a3b8c4d2'
+down_revision = 'a7c3e5f19b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('bill_parts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('file_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('message_type', sa.String(length=256), nullable=False),
+    sa.Column('offset', sa.BigInteger(), nullable=False),
+    sa.Column('length', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=True),
+    sa.Column('soap_corr_id', sa.String(length=128), nullable=True),
+    sa.Column('status', sa.String(length=12), nullable=False),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('file_id', 'seq', name='uq_bill_parts_file_seq')
+    )
+    op.create_index('ix_bill_parts_file_status', 'bill_parts', ['file_id', 'status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_bill_parts_file_status', table_name='bill_parts')
+    op.drop_table('bill_parts')
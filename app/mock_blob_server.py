@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# app/mock_blob_server.py - local stand-in for the Azure Blob REST subset we use
+"""
+Directory-backed, multi-threaded stand-in for the Blob REST operations used
+by app.azure_rest and app.uploader: List Blobs (prefix, marker, maxresults),
+Get Blob (Range, If-Match, If-None-Match), Get Blob Properties (HEAD),
+Put Blob, Put Block and Put Block List.
+
+Blobs live as files under <root>/<container>/<name>; per-blob properties
+(ETag, Content-MD5, Content-Type) are kept in a JSON sidecar under
+<root>/.meta and staged blocks under <root>/.blocks. Query strings (SAS
+tokens) and auth headers are accepted and ignored.
+
+Knobs for reproducible throughput tests:
+  --latency-ms   fixed delay added to every request
+  --bandwidth    per-response cap in bytes/sec (0 = unlimited)
+  --error-rate   fraction of requests answered with 503 ServerBusy
+  --seed         seed for the error-injection RNG
+
+Run: python -m app.mock_blob_server --root ./app/runtime/blobstore --port 10000
+and point AZURE_BASE_URL at http://127.0.0.1:10000
+"""
+from __future__ import annotations
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.sax.saxutils import escape
+
+class BlobStore:
+    """Blob data, properties and staged blocks on disk."""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+
+    def _data_path(self, container: str, name: str) -> str:
+        return os.path.join(self.root, container, name)
+
+    def _meta_path(self, container: str, name: str) -> str:
+        return os.path.join(self.root, ".meta", container, name + ".json")
+
+    def _block_path(self, container: str, name: str, block_id: str) -> str:
+        safe = base64.urlsafe_b64encode(block_id.encode()).decode()
+        return os.path.join(self.root, ".blocks", container, name, safe)
+
+    def props(self, container: str, name: str) -> dict | None:
+        path = self._data_path(container, name)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(self._meta_path(container, name), "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            meta = self._write_meta(container, name, None, None)
+        st = os.stat(path)
+        meta["size"] = st.st_size
+        meta["last_modified"] = st.st_mtime
+        return meta
+
+    def _write_meta(self, container: str, name: str, content_md5: str | None, content_type: str | None) -> dict:
+        if content_md5 is None:
+            md5 = hashlib.md5()
+            with open(self._data_path(container, name), "rb") as fh:
+                for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                    md5.update(chunk)
+            content_md5 = base64.b64encode(md5.digest()).decode()
+        meta = {
+            "etag": f"0x{uuid.uuid4().hex[:15].upper()}",
+            "content_md5": content_md5,
+            "content_type": content_type or "application/octet-stream",
+        }
+        path = self._meta_path(container, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        return meta
+
+    def list(self, container: str, prefix: str = "") -> list[str]:
+        base = os.path.join(self.root, container)
+        names = []
+        for dirpath, _dirs, files in os.walk(base):
+            for f in files:
+                name = os.path.relpath(os.path.join(dirpath, f), base).replace(os.sep, "/")
+                if name.startswith(prefix) and not name.endswith(".tmp"):
+                    names.append(name)
+        return sorted(names)
+
+    def put(self, container: str, name: str, chunks, content_md5: str | None, content_type: str | None) -> dict:
+        path = self._data_path(container, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+        with self._lock:
+            os.replace(tmp, path)
+            return self._write_meta(container, name, content_md5, content_type)
+
+    def stage_block(self, container: str, name: str, block_id: str, data: bytes) -> None:
+        path = self._block_path(container, name, block_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(data)
+
+    def commit_blocks(self, container: str, name: str, block_ids: list[str],
+                      content_md5: str | None, content_type: str | None) -> dict:
+        paths = [self._block_path(container, name, b) for b in block_ids]
+        missing = [b for b, p in zip(block_ids, paths) if not os.path.isfile(p)]
+        if missing:
+            raise KeyError(missing[0])
+
+        def chunks():
+            for p in paths:
+                with open(p, "rb") as fh:
+                    yield fh.read()
+
+        meta = self.put(container, name, chunks(), content_md5, content_type)
+        block_dir = os.path.dirname(paths[0]) if paths else None
+        if block_dir and os.path.isdir(block_dir):
+            for f in os.listdir(block_dir):
+                os.remove(os.path.join(block_dir, f))
+        return meta
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    store: BlobStore
+    latency = 0.0
+    bandwidth = 0
+    error_rate = 0.0
+    rng: random.Random
+    quiet = True
+
+    def log_message(self, fmt, *args):
+        if not self.quiet:
+            print("%s - - [%s] %s" % (self.client_address[0], self.log_date_time_string(), fmt % args))
+
+    # -- helpers --------------------------------------------------------
+    def _route(self) -> tuple[str, str, dict]:
+        u = urlparse(self.path)
+        parts = unquote(u.path).lstrip("/").split("/", 1)
+        container = parts[0]
+        name = parts[1] if len(parts) > 1 else ""
+        q = {k: v[-1] for k, v in parse_qs(u.query, keep_blank_values=True).items()}
+        return container, name, q
+
+    def _preamble(self) -> bool:
+        """Apply latency and error injection; returns False if the request was failed."""
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self._drain()
+            self._reply(503, b"<Error><Code>ServerBusy</Code></Error>", {"Content-Type": "application/xml"})
+            return False
+        return True
+
+    def _drain(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        while length > 0:
+            chunk = self.rfile.read(min(length, 1024 * 1024))
+            if not chunk:
+                break
+            length -= len(chunk)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, data) -> None:
+        view = memoryview(data)
+        if not self.bandwidth:
+            self.wfile.write(view)
+            return
+        step = max(1, self.bandwidth // 20)  # ~50 ms slices
+        for off in range(0, len(view), step):
+            t0 = time.perf_counter()
+            self.wfile.write(view[off:off + step])
+            wait = step / self.bandwidth - (time.perf_counter() - t0)
+            if wait > 0:
+                time.sleep(wait)
+
+    def _reply(self, status: int, body: bytes = b"", headers: dict | None = None, send_body: bool = True) -> None:
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and send_body:
+            self._send(body)
+
+    def _blob_headers(self, meta: dict) -> dict:
+        return {
+            "ETag": f'"{meta["etag"]}"',
+            "Last-Modified": formatdate(meta["last_modified"], usegmt=True),
+            "Content-Type": meta["content_type"],
+            "Content-MD5": meta["content_md5"],
+            "x-ms-blob-content-md5": meta["content_md5"],
+            "x-ms-blob-type": "BlockBlob",
+            "Accept-Ranges": "bytes",
+        }
+
+    # -- operations -----------------------------------------------------
+    def do_HEAD(self):
+        if not self._preamble():
+            return
+        container, name, _q = self._route()
+        meta = self.store.props(container, name)
+        if meta is None:
+            return self._reply(404, send_body=False)
+        self.send_response(200)
+        for k, v in self._blob_headers(meta).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(meta["size"]))
+        self.end_headers()
+
+    def do_GET(self):
+        if not self._preamble():
+            return
+        container, name, q = self._route()
+        if q.get("comp") == "list":
+            return self._list(container, q)
+        meta = self.store.props(container, name)
+        if meta is None:
+            return self._reply(404, b"<Error><Code>BlobNotFound</Code></Error>", {"Content-Type": "application/xml"})
+        etag = f'"{meta["etag"]}"'
+        if_match = self.headers.get("If-Match")
+        if if_match and if_match not in ("*", etag):
+            return self._reply(412, b"<Error><Code>ConditionNotMet</Code></Error>", {"Content-Type": "application/xml"})
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and if_none_match in ("*", etag):
+            return self._reply(304, headers={"ETag": etag})
+
+        size = meta["size"]
+        start, end, status = 0, size - 1, 200
+        rng = self.headers.get("Range") or self.headers.get("x-ms-range")
+        if rng:
+            m = re.match(r"bytes=(\d+)-(\d*)$", rng.strip())
+            if not m or int(m.group(1)) >= size:
+                return self._reply(416, headers={"Content-Range": f"bytes */{size}"})
+            start = int(m.group(1))
+            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            status = 206
+        headers = self._blob_headers(meta)
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers.pop("Content-MD5")
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        length = max(0, end - start + 1)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        with open(self.store._data_path(container, name), "rb") as fh:
+            fh.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = fh.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                self._send(chunk)
+                remaining -= len(chunk)
+
+    def _list(self, container: str, q: dict) -> None:
+        prefix = q.get("prefix", "")
+        marker = q.get("marker", "")
+        max_results = int(q.get("maxresults") or 5000)
+        names = [n for n in self.store.list(container, prefix) if n > marker] if marker else self.store.list(container, prefix)
+        page, rest = names[:max_results], names[max_results:]
+        out = ['<?xml version="1.0" encoding="utf-8"?>',
+               f'<EnumerationResults ContainerName="{escape(container)}">',
+               f"<Prefix>{escape(prefix)}</Prefix><Marker>{escape(marker)}</Marker>",
+               f"<MaxResults>{max_results}</MaxResults><Blobs>"]
+        for name in page:
+            meta = self.store.props(container, name)
+            if meta is None:
+                continue
+            out.append(
+                f"<Blob><Name>{escape(name)}</Name><Properties>"
+                f"<Last-Modified>{formatdate(meta['last_modified'], usegmt=True)}</Last-Modified>"
+                f"<Etag>{meta['etag']}</Etag>"
+                f"<Content-Length>{meta['size']}</Content-Length>"
+                f"<Content-Type>{escape(meta['content_type'])}</Content-Type>"
+                f"<Content-MD5>{meta['content_md5']}</Content-MD5>"
+                f"<BlobType>BlockBlob</BlobType></Properties></Blob>"
+            )
+        next_marker = page[-1] if rest else ""
+        out.append(f"</Blobs><NextMarker>{escape(next_marker)}</NextMarker></EnumerationResults>")
+        self._reply(200, "".join(out).encode(), {"Content-Type": "application/xml"})
+
+    def do_PUT(self):
+        if not self._preamble():
+            return
+        container, name, q = self._route()
+        comp = q.get("comp")
+        if comp == "block":
+            self.store.stage_block(container, name, q.get("blockid", ""), self._read_body())
+            return self._reply(201)
+        if comp == "blocklist":
+            body = self._read_body().decode("utf-8", "replace")
+            ids = re.findall(r"<(?:Latest|Uncommitted|Committed)>(.*?)</", body)
+            try:
+                meta = self.store.commit_blocks(
+                    container, name, ids,
+                    self.headers.get("x-ms-blob-content-md5"),
+                    self.headers.get("x-ms-blob-content-type"),
+                )
+            except KeyError:
+                return self._reply(400, b"<Error><Code>InvalidBlockList</Code></Error>", {"Content-Type": "application/xml"})
+            return self._reply(201, headers={"ETag": f'"{meta["etag"]}"'})
+        data = self._read_body()
+        content_md5 = self.headers.get("Content-MD5") or self.headers.get("x-ms-blob-content-md5")
+        if self.headers.get("Content-MD5") and \
+           base64.b64encode(hashlib.md5(data).digest()).decode() != self.headers["Content-MD5"]:
+            return self._reply(400, b"<Error><Code>Md5Mismatch</Code></Error>", {"Content-Type": "application/xml"})
+        meta = self.store.put(container, name, [data], content_md5,
+                              self.headers.get("x-ms-blob-content-type") or self.headers.get("Content-Type"))
+        self._reply(201, headers={"ETag": f'"{meta["etag"]}"'})
+
+class BlobServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+def make_server(root: str, host: str = "127.0.0.1", port: int = 10000, latency_ms: float = 0.0,
+                bandwidth: int = 0, error_rate: float = 0.0, quiet: bool = True,
+                seed: int | None = None) -> BlobServer:
+    """Build (but do not start) a stand-in server; port 0 picks a free port."""
+    os.makedirs(root, exist_ok=True)
+    handler = type("BoundHandler", (Handler,), {
+        "store": BlobStore(root),
+        "latency": latency_ms / 1000.0,
+        "bandwidth": bandwidth,
+        "error_rate": error_rate,
+        "rng": random.Random(seed),
+        "quiet": quiet,
+    })
+    return BlobServer((host, port), handler)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local Azure Blob REST stand-in")
+    ap.add_argument("--root", default="./app/runtime/blobstore")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=10000)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--bandwidth", type=int, default=0, help="bytes/sec per response, 0 = unlimited")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int, default=None, help="seed for error injection")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+    server = make_server(args.root, args.host, args.port, args.latency_ms, args.bandwidth, args.error_rate,
+                         not args.verbose, args.seed)
+    print(f"Mock Blob server listening on http://{args.host}:{args.port} (root={args.root})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -1,6 +1,28 @@
 #!/usr/bin/env python3
 # app/mock_server.py - minimal SOAP mock (GET ?wsdl and POST /mock)
-from http.server import BaseHTTPRequestHandler, HTTPServer
+"""
+Multi-threaded SOAP mock for ProcessTransaction. The WSDL's service address
+follows the Host header, so the mock works on any port.
+
+ProcessTransactionBatch takes many <transaction>s per envelope and answers
+with one <item> (correlationId, result, error) per transaction, in order.
+
+Knobs for throughput tests:
+  --latency-ms   fixed delay before every POST response (simulated upstream)
+  --item-ms      extra delay per transaction in the envelope
+  --fail-rate    share of transactions answered FAILED (at random)
+  --quiet        do not print every request
+
+Run: python -m app.mock_server --port 8000
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 WSDL = b"""<?xml version="1.0"?>
 <definitions name="Mock" targetNamespace="http://example.com/soap"
@@ -28,17 +50,58 @@ WSDL = b"""<?xml version="1.0"?>
           </sequence>
         </complexType>
       </element>
+
+      <complexType name="Transaction">
+        <sequence>
+          <element name="recordId" type="string" minOccurs="0"/>
+          <element name="name" type="string" minOccurs="0"/>
+          <element name="amount" type="double" minOccurs="0"/>
+          <element name="currency" type="string" minOccurs="0"/>
+          <element name="timestamp" type="string" minOccurs="0"/>
+          <element name="correlationId" type="string" minOccurs="0"/>
+        </sequence>
+      </complexType>
+
+      <complexType name="TransactionResult">
+        <sequence>
+          <element name="correlationId" type="string" minOccurs="0"/>
+          <element name="result" type="string" minOccurs="0"/>
+          <element name="error" type="string" minOccurs="0"/>
+        </sequence>
+      </complexType>
+
+      <element name="ProcessTransactionBatch">
+        <complexType>
+          <sequence>
+            <element name="transaction" type="tns:Transaction" minOccurs="0" maxOccurs="unbounded"/>
+          </sequence>
+        </complexType>
+      </element>
+
+      <element name="ProcessTransactionBatchResponse">
+        <complexType>
+          <sequence>
+            <element name="item" type="tns:TransactionResult" minOccurs="0" maxOccurs="unbounded"/>
+          </sequence>
+        </complexType>
+      </element>
     </schema>
   </types>
 
   <message name="ProcessTransactionRequest"><part name="parameters" element="tns:ProcessTransaction"/></message>
   <message name="ProcessTransactionResponseMsg"><part name="parameters" element="tns:ProcessTransactionResponse"/></message>
+  <message name="ProcessTransactionBatchRequest"><part name="parameters" element="tns:ProcessTransactionBatch"/></message>
+  <message name="ProcessTransactionBatchResponseMsg"><part name="parameters" element="tns:ProcessTransactionBatchResponse"/></message>
 
   <portType name="MockPortType">
     <operation name="ProcessTransaction">
       <input message="tns:ProcessTransactionRequest"/>
       <output message="tns:ProcessTransactionResponseMsg"/>
     </operation>
+    <operation name="ProcessTransactionBatch">
+      <input message="tns:ProcessTransactionBatchRequest"/>
+      <output message="tns:ProcessTransactionBatchResponseMsg"/>
+    </operation>
   </portType>
 
   <binding name="MockBinding" type="tns:MockPortType">
@@ -48,6 +111,11 @@ WSDL = b"""<?xml version="1.0"?>
       <input><soap:body use="literal"/></input>
       <output><soap:body use="literal"/></output>
     </operation>
+    <operation name="ProcessTransactionBatch">
+      <soap:operation soapAction="ProcessTransactionBatch" />
+      <input><soap:body use="literal"/></input>
+      <output><soap:body use="literal"/></output>
+    </operation>
   </binding>
 
   <service name="MockService">
@@ -68,34 +136,110 @@ RESPONSE = b"""<?xml version="1.0" encoding="UTF-8"?>
 </soap:Envelope>
 """
 
+FAILURE = RESPONSE.replace(b"SUCCESS", b"FAILED")
+
+BATCH_HEAD = (b'<?xml version="1.0" encoding="UTF-8"?>\n'
+              b'<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+              b'<ProcessTransactionBatchResponse xmlns="http://example.com/soap">')
+BATCH_TAIL = b"</ProcessTransactionBatchResponse></soap:Body></soap:Envelope>"
+
+_ADDRESS = b"http://localhost:8000/mock"
+
+def _local(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+def batch_response(body: bytes, failed) -> tuple[bytes, int]:
+    """ProcessTransactionBatchResponse for a request body, and its transaction count; failed() decides each item."""
+    items = []
+    for el in ElementTree.fromstring(body).iter():
+        if _local(el.tag) != "transaction":
+            continue
+        corr = next((c.text or "" for c in el if _local(c.tag) == "correlationId"), "")
+        item = f"<correlationId>{escape(corr)}</correlationId>"
+        item += "<result>FAILED</result><error>simulated failure</error>" if failed() else "<result>SUCCESS</result>"
+        items.append(f"<item>{item}</item>")
+    return BATCH_HEAD + "".join(items).encode() + BATCH_TAIL, len(items)
+
 class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled client sessions reuse connections
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    latency = 0.0
+    item_latency = 0.0
+    fail_rate = 0.0
+    quiet = False
+
     def log_message(self, fmt, *args):
-        print("%s - - [%s] %s" % (self.client_address[0], self.log_date_time_string(), fmt%args))
+        if not self.quiet:
+            print("%s - - [%s] %s" % (self.client_address[0], self.log_date_time_string(), fmt%args))
 
     def do_GET(self):
         if self.path.endswith("?wsdl") or self.path.endswith("mock?wsdl"):
+            host = self.headers.get("Host")
+            wsdl = WSDL.replace(_ADDRESS, f"http://{host}/mock".encode()) if host else WSDL
             self.send_response(200)
             self.send_header("Content-Type", "text/xml; charset=utf-8")
-            self.send_header("Content-Length", str(len(WSDL)))
+            self.send_header("Content-Length", str(len(wsdl)))
             self.end_headers()
-            self.wfile.write(WSDL)
+            self.wfile.write(wsdl)
             return
         self.send_response(404)
+        self.send_header("Content-Length", "0")
         self.end_headers()
 
     def do_POST(self):
         length = int(self.headers.get("Content-Length", "0"))
         body = self.rfile.read(length) if length else b""
-        print("Received SOAP POST (len=%d) first100=%r" % (len(body), body[:100]))
+        if not self.quiet:
+            print("Received SOAP POST (len=%d) first100=%r" % (len(body), body[:100]))
+        self.server.count_post()
+        failed = lambda: self.fail_rate and random.random() < self.fail_rate
+        if self.headers.get("SOAPAction", "").strip('"') == "ProcessTransactionBatch":
+            reply, n = batch_response(body, failed)
+        else:
+            reply, n = (FAILURE if failed() else RESPONSE), 1
+        if self.latency or self.item_latency:
+            time.sleep(self.latency + self.item_latency * n)
         self.send_response(200)
         self.send_header("Content-Type", "text/xml; charset=utf-8")
-        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.send_header("Content-Length", str(len(reply)))
         self.end_headers()
-        self.wfile.write(RESPONSE)
+        self.wfile.write(reply)
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.posts = 0
+        self._lock = threading.Lock()
+
+    def count_post(self) -> None:
+        with self._lock:
+            self.posts += 1
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)  # clients hanging up mid-reply are expected
+
+def make_server(host: str = "127.0.0.1", port: int = 8000, latency_ms: float = 0.0,
+                quiet: bool = True, item_ms: float = 0.0, fail_rate: float = 0.0) -> MockServer:
+    """Build (but do not start) the mock; port 0 picks a free port."""
+    handler = type("BoundHandler", (Handler,), {"latency": latency_ms / 1000.0, "quiet": quiet,
+                                                "item_latency": item_ms / 1000.0, "fail_rate": fail_rate})
+    return MockServer((host, port), handler)
 
 if __name__ == "__main__":
-    server = HTTPServer(("0.0.0.0", 8000), Handler)
-    print("Mock SOAP server listening on http://0.0.0.0:8000/mock")
+    ap = argparse.ArgumentParser(description="Mock SOAP server")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--item-ms", type=float, default=0.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args()
+    server = make_server(args.host, args.port, args.latency_ms, args.quiet, args.item_ms, args.fail_rate)
+    print(f"Mock SOAP server listening on http://{args.host}:{args.port}/mock")
     try:
         server.serve_forever()
     except KeyboardInterrupt:
@@ -2,15 +2,21 @@
 from datetime import datetime, timezone
 from enum import StrEnum
 from sqlalchemy.orm import declarative_base, relationship, Mapped, mapped_column
-from sqlalchemy import String, Integer, ForeignKey, Numeric, Text, Index, UniqueConstraint, TIMESTAMP, func
+from sqlalchemy import String, Integer, BigInteger, ForeignKey, LargeBinary, Numeric, Text, Index, UniqueConstraint, TIMESTAMP, func
 
 Base = declarative_base()
 
 class FileStatus(StrEnum):
     NEW = "NEW"
+    # claimed by a parse worker (claimed_by/claimed_at); released to NEW if the worker dies
+    PARSING = "PARSING"
     PROCESSING = "PROCESSING"
     PROCESSED = "PROCESSED"
     FAILED = "FAILED"
+    # same bytes as duplicate_of_id; never parsed, so no duplicate Record rows
+    DUPLICATE = "DUPLICATE"
+    # a bill split into bill_parts rows (app.fanout); it has no Record rows to send
+    FANNED_OUT = "FANNED_OUT"
 
 class RecordStatus(StrEnum):
     NEW = "NEW"
@@ -23,13 +29,26 @@ class File(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     blob_name: Mapped[str] = mapped_column(String(512), index=True, nullable=False)
     etag: Mapped[str] = mapped_column(String(128), index=True, nullable=False)
-    local_path: Mapped[str] = mapped_column(String(1024), nullable=False)
-    status: Mapped[str] = mapped_column(String(12), default=FileStatus.NEW.value, nullable=False)
+    # None when the blob was ingested straight from memory without a local copy
+    local_path: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    # hex MD5 of the payload; keys app.content_store and duplicate detection
+    content_md5: Mapped[str | None] = mapped_column(String(32), index=True)
+    duplicate_of_id: Mapped[int | None] = mapped_column(ForeignKey("files.id", ondelete="SET NULL"), index=True)
+    # control_<name>.json companion of the .pb (SYNC_PAIR_MODE)
+    control_blob_name: Mapped[str | None] = mapped_column(String(512))
+    control_etag: Mapped[str | None] = mapped_column(String(128))
+    control_path: Mapped[str | None] = mapped_column(String(1024))
+    claimed_by: Mapped[str | None] = mapped_column(String(64))
+    claimed_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True))
+    status: Mapped[str] = mapped_column(String(12), default=FileStatus.NEW.value, nullable=False, index=True)
     total_records: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     processed_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # why the file was marked FAILED while parsing or ingesting it
+    error_message: Mapped[str | None] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
     records: Mapped[list["Record"]] = relationship(back_populates="file", cascade="all, delete-orphan")
+    bill_parts: Mapped[list["BillPart"]] = relationship(back_populates="file", cascade="all, delete-orphan")
 
     __table_args__ = (
         UniqueConstraint("blob_name", "etag", name="uq_blob_etag"),
@@ -53,3 +72,65 @@ class Record(Base):
 
 Index("ix_records_file_status", Record.file_id, Record.status)
 
+
+class BillPart(Base):
+    """
+    One invoice/statement split out of a bill file by app.fanout: its byte
+    span in the file and, unless FANOUT_INLINE_BYTES is off and the file has a
+    local copy, its serialized bytes.
+    """
+    __tablename__ = "bill_parts"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    file_id: Mapped[int] = mapped_column(ForeignKey("files.id", ondelete="CASCADE"), nullable=False)
+    seq: Mapped[int] = mapped_column(Integer, nullable=False)
+    message_type: Mapped[str] = mapped_column(String(256), nullable=False)
+    offset: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    length: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[bytes | None] = mapped_column(LargeBinary)
+    soap_corr_id: Mapped[str | None] = mapped_column(String(128))
+    status: Mapped[str] = mapped_column(String(12), default=RecordStatus.NEW.value, nullable=False)
+    error_message: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+    file: Mapped[File] = relationship(back_populates="bill_parts")
+
+    __table_args__ = (
+        UniqueConstraint("file_id", "seq", name="uq_bill_parts_file_seq"),
+        Index("ix_bill_parts_file_status", "file_id", "status"),
+    )
+
+
+class SyncState(Base):
+    """Listing checkpoint per container/prefix so each tick only lists what is new."""
+    __tablename__ = "sync_state"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    container: Mapped[str] = mapped_column(String(256), nullable=False)
+    prefix: Mapped[str] = mapped_column(String(512), default="", nullable=False)
+    marker: Mapped[str | None] = mapped_column(Text)
+    watermark: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True))
+    last_full_sweep_at: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True))
+    updated_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("container", "prefix", name="uq_sync_state_container_prefix"),
+    )
+
+
+class OrphanBlob(Base):
+    """One half of a .pb/control pair whose partner has not been listed yet (SYNC_PAIR_MODE)."""
+    __tablename__ = "orphan_blobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    container: Mapped[str] = mapped_column(String(256), nullable=False)
+    blob_name: Mapped[str] = mapped_column(String(512), nullable=False)
+    etag: Mapped[str] = mapped_column(String(128), nullable=False)
+    pair_key: Mapped[str] = mapped_column(String(512), nullable=False)
+    kind: Mapped[str] = mapped_column(String(8), nullable=False)  # "pb" | "control"
+    last_modified: Mapped[datetime | None] = mapped_column(TIMESTAMP(timezone=True))
+    size: Mapped[int | None] = mapped_column(BigInteger)
+    content_md5: Mapped[str | None] = mapped_column(String(32))
+    first_seen_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("container", "blob_name", name="uq_orphan_blobs_container_blob"),
+        Index("ix_orphan_blobs_container_key", "container", "pair_key"),
+    )
@@ -0,0 +1,203 @@
+# app/pairs.py
+"""
+Pair-aware sync (SYNC_PAIR_MODE): <name>.pb is only ingested together with
+its control_<name>.json. The listing is indexed in a single pass by pair key,
+so each pair is emitted as soon as its second half is listed; both halves
+are then downloaded concurrently and the File row is only inserted once
+both have landed. Halves whose partner has not been listed yet are kept in
+orphan_blobs and re-seeded on incremental ticks, so they pair up when the
+partner arrives without the container being rescanned for them.
+"""
+from __future__ import annotations
+from typing import Callable, Iterable, Iterator, NamedTuple
+from sqlalchemy import delete, select, tuple_
+from app.azure_rest import BlobItem
+from app.db import session_scope
+from app.downloader import DownloadResult, download_many, fits_in_memory
+from app.logging import get_logger
+from app.models import File, OrphanBlob
+from app.sync import (
+    PAGE_SIZE, RECORD_BATCH, IncrementalListing, chunked, prior_versions, record_downloads, unseen_blobs,
+)
+
+log = get_logger(__name__)
+
+PB_SUFFIX = ".pb"
+CONTROL_PREFIX = "control_"
+CONTROL_SUFFIX = ".json"
+
+class Pair(NamedTuple):
+    key: str
+    pb: BlobItem
+    control: BlobItem
+
+def pair_key(name: str) -> tuple[str, str] | None:
+    """(key, "pb" | "control") for a pair member, None for any other blob."""
+    if name.startswith(CONTROL_PREFIX) and name.endswith(CONTROL_SUFFIX):
+        return name[len(CONTROL_PREFIX):-len(CONTROL_SUFFIX)], "control"
+    if name.endswith(PB_SUFFIX):
+        return name[:-len(PB_SUFFIX)], "pb"
+    return None
+
+class PairIndex:
+    """
+    Hash index of unpaired halves, key -> {kind: BlobItem}. add() is O(1) and
+    returns the Pair once both halves are present; what is left at the end
+    of the listing are the orphans.
+    """
+    def __init__(self) -> None:
+        self._open: dict[str, dict[str, BlobItem]] = {}
+        self._seeded: set[str] = set()
+        self.consumed_orphans: set[str] = set()
+        self.ignored = 0
+
+    def seed(self, orphans: Iterable[tuple[str, BlobItem]]) -> None:
+        for kind, item in orphans:
+            self._open.setdefault(pair_key(item.name)[0], {})[kind] = item
+            self._seeded.add(item.name)
+
+    def add(self, item: BlobItem) -> Pair | None:
+        pk = pair_key(item.name)
+        if pk is None:
+            self.ignored += 1
+            return None
+        if item.name in self.consumed_orphans:
+            return None  # seeded half already paired earlier in this listing
+        key, kind = pk
+        halves = self._open.setdefault(key, {})
+        halves[kind] = item  # a relisted half replaces a seeded orphan (newer etag)
+        if len(halves) < 2:
+            return None
+        del self._open[key]
+        for half in halves.values():
+            if half.name in self._seeded:
+                self._seeded.discard(half.name)
+                self.consumed_orphans.add(half.name)
+        return Pair(key, halves["pb"], halves["control"])
+
+    def pairs(self, items: Iterable[BlobItem]) -> Iterator[Pair]:
+        for item in items:
+            pair = self.add(item)
+            if pair is not None:
+                yield pair
+
+    def leftovers(self) -> list[tuple[str, BlobItem]]:
+        return [(kind, item) for halves in self._open.values() for kind, item in halves.items()]
+
+def load_orphans(s, container: str) -> list[tuple[str, BlobItem]]:
+    rows = s.execute(select(OrphanBlob).where(OrphanBlob.container == container)).scalars()
+    return [
+        (o.kind, BlobItem(o.blob_name, o.etag, o.last_modified, o.size, o.content_md5))
+        for o in rows
+    ]
+
+def recorded_halves(s, leftovers: list[tuple[str, BlobItem]]) -> set[str]:
+    """
+    Names of leftover halves whose pair is already a File row (same name and
+    etag). An incremental tick re-lists the newest blob without its partner,
+    which was filtered out by the watermark; such a half is not an orphan.
+    """
+    pbs = [(i.name, i.etag) for kind, i in leftovers if kind == "pb"]
+    controls = [(i.name, i.etag) for kind, i in leftovers if kind == "control"]
+    found: set[str] = set()
+    for chunk in chunked(pbs, PAGE_SIZE):
+        found.update(s.execute(
+            select(File.blob_name).where(tuple_(File.blob_name, File.etag).in_(chunk))
+        ).scalars())
+    for chunk in chunked(controls, PAGE_SIZE):
+        found.update(s.execute(
+            select(File.control_blob_name).where(tuple_(File.control_blob_name, File.control_etag).in_(chunk))
+        ).scalars())
+    return found
+
+def save_orphans(s, container: str, leftovers: list[tuple[str, BlobItem]],
+                 consumed: Iterable[str], full_sweep: bool) -> None:
+    """
+    Persist the unpaired halves. A full sweep listed everything, so its
+    leftovers replace the container's orphan set (dropping deleted blobs);
+    an incremental tick only removes the orphans it paired up.
+    """
+    stale = OrphanBlob.container == container
+    if not full_sweep:
+        stale &= OrphanBlob.blob_name.in_(list(consumed) + [i.name for _, i in leftovers])
+    s.execute(delete(OrphanBlob).where(stale))
+    s.add_all([
+        OrphanBlob(
+            container=container, blob_name=i.name, etag=i.etag, pair_key=pair_key(i.name)[0], kind=kind,
+            last_modified=i.last_modified, size=i.size, content_md5=i.content_md5,
+        )
+        for kind, i in leftovers
+    ])
+
+def _landed_pairs(pending: list[Pair], results: Iterable[DownloadResult],
+                  failed: set[str]) -> Iterator[tuple[DownloadResult, DownloadResult]]:
+    # match each download back to its pair; yield (pb, control) once both are in
+    owner = {p.control.name: p for p in pending}
+    owner.update({p.pb.name: p for p in pending})
+    halves: dict[str, dict[str, DownloadResult]] = {}
+    for res in results:
+        pair = owner[res.blob_name]
+        got = halves.setdefault(pair.key, {})
+        got[res.blob_name] = res
+        if len(got) < 2:
+            continue
+        del halves[pair.key]
+        pb, ctl = got[pair.pb.name], got[pair.control.name]
+        if pb.ok and ctl.ok:
+            yield pb, ctl
+            continue
+        failed.add(pair.pb.name)
+        if pb.body is not None:
+            pb.body.close()
+
+def _pb_in_memory(item: BlobItem) -> bool:
+    # control files always land on disk; File.control_path points at them
+    return item.name.endswith(PB_SUFFIX) and fits_in_memory(item)
+
+def sync_pairs(dest_for: Callable[[str], str], workers: int | None = None) -> list[str]:
+    """
+    One pair-mode sync tick. Returns the local paths (or blob names, for
+    in-memory ingests) of the .pb files recorded.
+    """
+    listing = IncrementalListing()
+    index = PairIndex()
+    if not listing.full_sweep:
+        with session_scope() as s:
+            index.seed(load_orphans(s, listing.container))
+
+    recorded: list[str] = []
+    for group in chunked(index.pairs(listing), PAGE_SIZE):
+        with session_scope() as s:
+            fresh = {i.name for i in unseen_blobs(s, [p.pb for p in group])}
+            pending = [p for p in group if p.pb.name in fresh]
+            prior = prior_versions(s, [p.pb for p in pending])
+        log.debug("Pairs: %d complete, %d unseen", len(group), len(pending))
+        if not pending:
+            continue
+
+        failed: set[str] = set()
+        items = [half for p in pending for half in (p.pb, p.control)]
+        results = download_many(items, dest_for, workers=workers, prior=prior, in_memory=_pb_in_memory)
+        for batch in chunked(_landed_pairs(pending, results, failed), RECORD_BATCH):
+            try:
+                with session_scope() as s:
+                    ids = record_downloads(s, [pb for pb, _ in batch], {pb.blob_name: ctl for pb, ctl in batch})
+            except Exception as e:
+                log.error("Failed to record %d pairs: %s", len(batch), e)
+                failed.update(pb.blob_name for pb, _ in batch)
+                continue
+            log.info("Recorded %d new paired File rows (%d pairs landed)", len(ids), len(batch))
+            recorded.extend(pb.local_path or pb.blob_name for pb, _ in batch)
+        # a pair is retried as a whole if either half failed
+        listing.failed(half for p in pending if p.pb.name in failed for half in (p.pb, p.control))
+
+    leftovers = index.leftovers()
+    if listing.complete:
+        with session_scope() as s:
+            done = recorded_halves(s, leftovers)
+            leftovers = [(kind, i) for kind, i in leftovers if i.name not in done]
+            save_orphans(s, listing.container, leftovers, index.consumed_orphans | done, listing.full_sweep)
+    log.info("Pair sync: %d pairs recorded, %d orphan halves held, %d non-pair blobs ignored",
+             len(recorded), len(leftovers), index.ignored)
+    listing.save()
+    return recorded
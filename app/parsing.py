@@ -1,28 +1,144 @@
 # app/parsing.py
 from __future__ import annotations
 import os
+import socket
+import time
 import traceback
-from decimal import Decimal
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from google.protobuf.message import DecodeError
+from sqlalchemy import func, or_, select, update
+from app.bulk_load import load_records
 from app.config import settings
-from app.db import session_scope
-from app.models import File, FileStatus, Record, RecordStatus
+from app.fanout import fan_out
+from app.pb_sniff import root_sniffer
+from app.pb_stream import TxIndex, decode_batches, mapped, scan_transactions
+from app.db import engine, session_scope
+from app.field_access import transaction_accessor
+from app.models import File, FileStatus
 from app.logging import get_logger
 
 log = get_logger("parsing")
 
-# Try to be permissive with protobuf field names (some protos use camelCase)
-def _get_field(obj, *names, default=None):
-    for n in names:
-        if hasattr(obj, n):
-            return getattr(obj, n)
-    return default
+def _scan(f: File, buf) -> TxIndex | None:
+    # the root type and layout come from a cheap tag sniff, memoised per
+    # blob-name pattern; TransactionBatch payloads are then pre-scanned
+    found = root_sniffer().detect(f.blob_name, buf)
+    if found.name in settings.FANOUT_PATHS:
+        return None
+    if found.name != "TransactionBatch":
+        raise DecodeError(f"no FANOUT_PATHS entry for root type {found.name}")
+    start = time.perf_counter()
+    index = scan_transactions(buf, found.delimited)
+    log.info("Scanned File id=%s (%s): %d transactions in %d batches in %.1f ms", f.id, f.blob_name,
+             index.count, len(index.spans), (time.perf_counter() - start) * 1000)
+    return index
+
+def _decoded(f: File, buf, index: TxIndex):
+    done = 0
+    for batch in decode_batches(buf, index):
+        yield from batch
+        done += len(batch)
+        log.debug("File id=%s: %d/%d transactions decoded", f.id, done, index.count)
+
+def _load(s, f: File, buf, index: TxIndex | None = None) -> tuple[int, FileStatus]:
+    # the payload is decoded exactly once, from the spans of its pre-scan;
+    # returns the row count and the status the file moves to
+    if index is None:
+        index = _scan(f, buf)
+        if index is None:
+            return fan_out(s, f, buf, root_sniffer().detect(f.blob_name, buf)), FileStatus.FANNED_OUT
+    f.total_records = index.count
+    return load_records(s, f, _decoded(f, buf, index)), FileStatus.PROCESSING
+
+def prescan_file(f: File) -> TxIndex | None:
+    """
+    Count and validate File f's transactions without decoding them (see
+    app.pb_stream.scan_transactions). None for fan-out bill roots or a
+    missing local copy; raises DecodeError for a malformed file.
+    """
+    if not f.local_path or not os.path.exists(f.local_path):
+        return None
+    with mapped(f.local_path) as buf:
+        return _scan(f, buf)
+
+def ingest_file_data(s, f: File, data: bytes) -> int | None:
+    """
+    Disk-free ingest: decode an in-memory .pb payload straight into Record
+    rows for File f (already in the session), set total_records and move it
+    to PROCESSING (FANNED_OUT for bill roots). Returns the record count, or
+    None (File marked FAILED) if the payload cannot be ingested; the savepoint keeps such a failure from
+    touching the rest of the caller's transaction.
+    """
+    try:
+        with s.begin_nested():
+            count, status = _load(s, f, data)
+    except DecodeError as e:
+        log.error("Failed to parse protobuf for File id=%s blob=%s: %s", f.id, f.blob_name, str(e))
+        f.status = FileStatus.FAILED.value
+        f.error_message = f"ParseError: {str(e)}"
+        return None
+    except Exception as e:
+        # field mapping, amount or DB error while loading the rows
+        log.error("Unexpected error while ingesting File id=%s blob=%s: %s", f.id, f.blob_name, e)
+        log.debug("Traceback: %s", traceback.format_exc())
+        f.status = FileStatus.FAILED.value
+        f.error_message = f"{type(e).__name__}: {str(e)}"
+        return None
+    f.status = status.value
+    log.info("Ingested File id=%s (%s) from memory → %d records", f.id, f.blob_name, count)
+    return count
+
+def parse_file(s, f: File, index: TxIndex | None = None) -> int | None:
+    """
+    Parse File f's local .pb into Record rows (bill_parts rows for
+    FANOUT_PATHS roots) inside session s, set total_records and move it to
+    PROCESSING (FANNED_OUT for bill roots). Returns the record count, or None
+    if the file was marked FAILED. index is a prescan_file() result to reuse instead of scanning again.
+    """
+    path = f.local_path
+    if not path or not os.path.exists(path):
+        log.error("Local path missing for File id=%s path=%s; marking FAILED", f.id, path)
+        f.status = FileStatus.FAILED.value
+        return None
+
+    # stream transactions off an mmap of the file straight into a bulk
+    # insert (COPY on Postgres); the savepoint discards a file's partial
+    # rows if it turns out to be malformed, without touching the others.
+    # Bill roots listed in FANOUT_PATHS become bill_parts rows instead
+    try:
+        with mapped(path) as buf, s.begin_nested():
+            count, status = _load(s, f, buf, index)
+    except DecodeError as e:
+        log.error("Failed to parse protobuf for File id=%s path=%s: %s", f.id, path, str(e))
+        f.status = FileStatus.FAILED.value
+        f.error_message = f"ParseError: {str(e)}"
+        return None
+    except Exception as e:
+        # unexpected IO / import / DB error
+        log.error("Unexpected error while parsing File id=%s path=%s: %s", f.id, path, e)
+        log.debug("Traceback: %s", traceback.format_exc())
+        f.status = FileStatus.FAILED.value
+        f.error_message = f"{type(e).__name__}: {str(e)}"
+        return None
+
+    # update file state
+    f.status = status.value
+    log.info("Parsed File id=%s (%s) → %d records; set status=%s", f.id, f.blob_name, count, f.status)
+    return count
 
 def parse_new_files():
     """
     Find File rows with status == NEW, parse the associated .pb file into
     Record rows, update file.total_records and mark file.status -> PROCESSING.
+    With PARSE_WORKERS > 1 the files are parsed by a process pool instead
+    (see parse_new_files_parallel).
     """
+    transaction_accessor()  # FieldMappingError here, before any file is touched
+    if settings.PARSE_WORKERS > 1:
+        return parse_new_files_parallel()
+
     parsed_files = 0
     created_records = 0
 
@@ -30,77 +146,158 @@ def parse_new_files():
         files = s.query(File).filter(File.status == FileStatus.NEW.value).all()
         log.info("Found %d files with status NEW", len(files))
         for f in files:
-            path = f.local_path
-            if not path or not os.path.exists(path):
-                log.error("Local path missing for File id=%s path=%s; marking FAILED", f.id, path)
-                f.status = FileStatus.FAILED.value
-                continue
+            count = parse_file(s, f)
+            if count is not None:
+                parsed_files += 1
+                created_records += count
+
+    log.info("Parsing complete: files_parsed=%d records_created=%d", parsed_files, created_records)
+    return parsed_files, created_records
+
+def claim_files(s, worker_id: str, limit: int) -> list[int]:
+    """
+    Atomically claim up to `limit` NEW files for worker_id: SELECT ... FOR
+    UPDATE SKIP LOCKED so concurrent workers never wait on or double-claim
+    a row, then flip them to PARSING. Returns the claimed ids.
+    """
+    pick = (
+        select(File.id)
+        .where(File.status == FileStatus.NEW.value)
+        .order_by(File.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(File)
+        .where(File.id.in_(pick))
+        .values(status=FileStatus.PARSING.value, claimed_by=worker_id, claimed_at=func.now())
+        .returning(File.id)
+    )
+    return list(s.execute(stmt).scalars())
 
+def release_claims(s, worker_ids: list[str] | None = None, older_than: float | None = None) -> int:
+    """
+    Put PARSING files back to NEW: those claimed by worker_ids (a worker
+    that died) and/or those claimed more than older_than seconds ago (a
+    crashed process on any host). Returns the number of files released.
+    """
+    stale = []
+    if worker_ids:
+        stale.append(File.claimed_by.in_(worker_ids))
+    if older_than is not None:
+        stale.append(File.claimed_at < datetime.now(timezone.utc) - timedelta(seconds=older_than))
+    if not stale:
+        return 0
+    res = s.execute(
+        update(File)
+        .where(File.status == FileStatus.PARSING.value, or_(*stale))
+        .values(status=FileStatus.NEW.value, claimed_by=None, claimed_at=None)
+    )
+    return res.rowcount or 0
+
+def refresh_claims(s, worker_id: str, ids: list[int]) -> None:
+    """Restart the claim clock on worker_id's still-PARSING files among ids (queued, not abandoned)."""
+    if not ids:
+        return
+    s.execute(
+        update(File)
+        .where(File.id.in_(ids), File.claimed_by == worker_id, File.status == FileStatus.PARSING.value)
+        .values(claimed_at=func.now())
+    )
+
+def _init_worker() -> None:
+    # never share the parent's pooled connections across fork()
+    engine.dispose(close=False)
+
+def _owned(f: File | None, worker_id: str) -> bool:
+    # False once the reaper has released the claim and another worker took it
+    return f is not None and f.status == FileStatus.PARSING.value and f.claimed_by == worker_id
+
+def _prescan_claims(worker_id: str, ids: list[int]) -> dict[int, TxIndex]:
+    """
+    Pre-scan freshly claimed files and commit their total_records, so their
+    size is visible before the slow decode and malformed ones fail at once.
+    """
+    indexes: dict[int, TxIndex] = {}
+    with session_scope() as s:
+        for fid in ids:
+            f = s.get(File, fid, with_for_update=True)
+            if not _owned(f, worker_id):
+                continue
             try:
-                with open(path, "rb") as fh:
-                    data = fh.read()
-                # Import protobuf message class here to avoid heavy import at module import time
-                from app.proto.transactions_pb2 import TransactionBatch
-                batch = TransactionBatch()
-                batch.ParseFromString(data)
+                index = prescan_file(f)
             except DecodeError as e:
-                log.error("Failed to parse protobuf for File id=%s path=%s: %s", f.id, path, str(e))
-                f.status = FileStatus.FAILED.value
-                f.error_message = f"ParseError: {str(e)}" if hasattr(f, "error_message") else None
-                continue
-            except Exception as e:
-                # unexpected IO / import error
-                log.error("Unexpected error while parsing File id=%s path=%s: %s", f.id, path, e)
-                log.debug("Traceback: %s", traceback.format_exc())
+                log.error("Pre-scan rejected File id=%s path=%s: %s", f.id, f.local_path, e)
                 f.status = FileStatus.FAILED.value
+                f.error_message = f"ParseError: {str(e)}"
+                f.claimed_by = None
+                f.claimed_at = None
                 continue
+            if index is not None:
+                f.total_records = index.count
+                indexes[fid] = index
+        refresh_claims(s, worker_id, ids)
+    return indexes
+
+def _parse_worker(worker_id: str) -> tuple[int, int]:
+    """Claim-and-parse loop run in a child process; each file commits on its own."""
+    parsed_files = created_records = 0
+    while True:
+        with session_scope() as s:
+            ids = claim_files(s, worker_id, settings.PARSE_CLAIM_BATCH)
+        if not ids:
+            return parsed_files, created_records
+        indexes = _prescan_claims(worker_id, ids)
+        for n, fid in enumerate(ids):
+            with session_scope() as s:
+                # the row lock makes a concurrent release_claims wait for the
+                # parse to commit, after which the file is no longer PARSING
+                f = s.get(File, fid, with_for_update=True)
+                if not _owned(f, worker_id):
+                    continue
+                count = parse_file(s, f, indexes.get(fid))
+                f.claimed_by = None
+                f.claimed_at = None
+                refresh_claims(s, worker_id, ids[n + 1:])
+            if count is not None:
+                parsed_files += 1
+                created_records += count
 
-            # Insert records
-            count = 0
-            for tx in batch.transactions:
-                # tolerant field lookups
-                record_id = _get_field(tx, "recordId", "record_id", "id", default=None)
-                name = _get_field(tx, "name", default="")
-                amount_raw = _get_field(tx, "amount", "amt", default=0)
-                currency = _get_field(tx, "currency", default="") or ""
-                timestamp = _get_field(tx, "timestamp", "time", default="") or ""
-
-                # convert amount to Decimal (Numeric DB type expects Decimal)
-                try:
-                    # tx.amount might already be float or Decimal; wrap safely
-                    amount = Decimal(str(amount_raw))
-                except Exception:
-                    amount = Decimal("0.00")
-
-                rec = Record(
-                    file_id=f.id,
-                    record_id=str(record_id) if record_id is not None else "",
-                    name=str(name),
-                    amount=amount,
-                    currency=str(currency),
-                    timestamp=str(timestamp),
-                    status=RecordStatus.NEW.value,
-                )
-                s.add(rec)
-                count += 1
-
-            # flush so counts are persisted and to catch DB errors early
+def parse_new_files_parallel(workers: int | None = None):
+    """
+    Parse NEW files on a pool of PARSE_WORKERS processes. Each worker claims
+    PARSE_CLAIM_BATCH files at a time with FOR UPDATE SKIP LOCKED and
+    decodes/bulk-inserts each in its own transaction, so throughput scales
+    with cores and several hosts can run this concurrently. Claims older
+    than PARSE_CLAIM_TIMEOUT_SECONDS (a crashed process) are released first,
+    and a worker that dies in this pool has its claims released at once.
+    """
+    workers = max(1, workers or settings.PARSE_WORKERS)
+    with session_scope() as s:
+        reaped = release_claims(s, older_than=settings.PARSE_CLAIM_TIMEOUT_SECONDS)
+    if reaped:
+        log.warning("Released %d stale PARSING claims", reaped)
+
+    run = f"{socket.gethostname()[:32]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    worker_ids = [f"{run}:{n}" for n in range(workers)]
+    parsed_files = created_records = 0
+    failed: list[str] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_parse_worker, wid): wid for wid in worker_ids}
+        for fut in as_completed(futures):
             try:
-                s.flush()
+                files_done, records_done = fut.result()
             except Exception as e:
-                log.error("DB error inserting records for File id=%s: %s", f.id, e)
-                log.debug("Traceback: %s", traceback.format_exc())
-                s.rollback()
-                f.status = FileStatus.FAILED.value
+                log.error("Parse worker %s died: %s", futures[fut], e)
+                failed.append(futures[fut])
                 continue
+            parsed_files += files_done
+            created_records += records_done
+    if failed:
+        with session_scope() as s:
+            log.warning("Released %d files claimed by dead workers", release_claims(s, failed))
 
-            # update file counters and state
-            f.total_records = count
-            f.status = FileStatus.PROCESSING.value
-            parsed_files += 1
-            created_records += count
-            log.info("Parsed File id=%s (%s) → %d records; set status=%s", f.id, f.blob_name, count, f.status)
-
-    log.info("Parsing complete: files_parsed=%d records_created=%d", parsed_files, created_records)
+    log.info("Parallel parsing complete: workers=%d files_parsed=%d records_created=%d",
+             workers, parsed_files, created_records)
     return parsed_files, created_records
-
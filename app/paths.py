@@ -0,0 +1,112 @@
+# app/paths.py
+"""
+Compiled dotted-path lookups over parsed JSON (dicts and lists), e.g.
+"parProdBlock.parprodrecurBlock.parprodrectable.records.QTY".
+
+A path is split and classified once (compile_path, LRU-cached) instead of
+re-splitting and trying int(part) at every step of every call. Semantics
+match the old _get helper: a missing key or a bad index gives None, and a
+numeric step indexes a list but is a plain key on a dict. A "*" step maps
+the rest of the path over every element of a list (or the values of a
+dict). Misses are dropped and nested wildcards flatten into a single list.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Mapping
+
+WILDCARD = "*"
+PATH_CACHE_SIZE = 1024
+_LOOKUP_ERRORS = (KeyError, IndexError, TypeError)
+
+def _index(part: str) -> int | None:
+    try:
+        return int(part)
+    except ValueError:
+        return None
+
+def _keys_only(keys: tuple[str, ...]) -> Callable[[Any], Any]:
+    # no numeric steps: a failed subscript anywhere is exactly a miss
+    def get(d: Any) -> Any:
+        try:
+            for k in keys:
+                d = d[k]
+        except _LOOKUP_ERRORS:
+            return None
+        return d
+    return get
+
+def _mixed(steps: tuple[tuple[str, int | None], ...]) -> Callable[[Any], Any]:
+    def get(d: Any) -> Any:
+        for key, idx in steps:
+            if isinstance(d, dict):
+                d = d.get(key)
+            elif isinstance(d, list) and idx is not None:
+                try:
+                    d = d[idx]
+                except IndexError:
+                    return None
+            else:
+                return None
+            if d is None:
+                return None
+        return d
+    return get
+
+def _wild(head: Callable[[Any], Any], rest: Callable[[Any], Any], flatten: bool) -> Callable[[Any], Any]:
+    def get(d: Any) -> Any:
+        seq = head(d)
+        if isinstance(seq, dict):
+            seq = seq.values()
+        elif not isinstance(seq, list):
+            return None
+        out = []
+        for item in seq:
+            v = rest(item)
+            if v is None:
+                continue
+            if flatten:
+                out.extend(v)
+            else:
+                out.append(v)
+        return out
+    return get
+
+def _straight(parts: list[str]) -> Callable[[Any], Any]:
+    if not parts:
+        return lambda d: d
+    steps = tuple((p, _index(p)) for p in parts)
+    if all(idx is None for _, idx in steps):
+        return _keys_only(tuple(parts))
+    return _mixed(steps)
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def compile_path(path: str) -> Callable[[Any], Any]:
+    """Extractor for path: a callable taking one parsed-JSON object."""
+    parts = path.split(".") if path else []
+    if WILDCARD not in parts:
+        return _straight(parts)
+    i = parts.index(WILDCARD)
+    rest = ".".join(parts[i + 1:])
+    return _wild(_straight(parts[:i]), compile_path(rest), WILDCARD in parts[i + 1:])
+
+def get_path(d: Any, path: str) -> Any:
+    """One-off lookup of path in d."""
+    return compile_path(path)(d)
+
+class Extractor:
+    """A named set of compiled paths, applied to one record or a whole list of them."""
+    def __init__(self, paths: Mapping[str, str]):
+        self.paths = dict(paths)
+        self._getters = [(name, compile_path(p)) for name, p in self.paths.items()]
+
+    def __call__(self, record: Any) -> dict[str, Any]:
+        return {name: get(record) for name, get in self._getters}
+
+    def many(self, records: Iterable[Any]) -> list[dict[str, Any]]:
+        getters = self._getters
+        return [{name: get(r) for name, get in getters} for r in records]
+
+    def column(self, name: str, records: Iterable[Any]) -> list[Any]:
+        """Just one path's values across records."""
+        get = compile_path(self.paths[name])
+        return [get(r) for r in records]
@@ -0,0 +1,165 @@
+# app/pb_sniff.py
+"""
+Root-message sniffing for .pb payloads that may hold one of several root
+types, stored either as a single message or as length-delimited frames.
+
+Instead of trial-decoding the whole buffer against every candidate class,
+the first few wire-format tags are walked (app.pb_stream.read_varint) and
+checked against each candidate's descriptor: field numbers must exist and
+wire types must agree, one level into sub-messages. The winning
+(root type, layout) is memoised per blob-name pattern, so later files of
+the same family are only re-checked against that one guess.
+"""
+from __future__ import annotations
+import importlib
+import os
+import re
+import threading
+from typing import NamedTuple, Sequence
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from google.protobuf.message import DecodeError, Message
+from app.config import settings
+from app.logging import get_logger
+from app.pb_stream import WIRE_I32, WIRE_I64, WIRE_LEN, WIRE_VARINT, _skip, iter_frames, read_varint
+
+log = get_logger(__name__)
+
+# top-level fields inspected per guess; sub-messages get a quarter of that
+SNIFF_FIELDS = 16
+
+_FD = FieldDescriptor
+_WIRE_TYPES = {
+    _FD.TYPE_DOUBLE: WIRE_I64, _FD.TYPE_FIXED64: WIRE_I64, _FD.TYPE_SFIXED64: WIRE_I64,
+    _FD.TYPE_FLOAT: WIRE_I32, _FD.TYPE_FIXED32: WIRE_I32, _FD.TYPE_SFIXED32: WIRE_I32,
+    _FD.TYPE_STRING: WIRE_LEN, _FD.TYPE_BYTES: WIRE_LEN, _FD.TYPE_MESSAGE: WIRE_LEN,
+    _FD.TYPE_GROUP: 3,
+}
+
+class Sniff(NamedTuple):
+    name: str
+    message_cls: type
+    delimited: bool
+
+def blob_pattern(blob_name: str) -> str:
+    """Memo key: the base name with digit runs collapsed, e.g. GF32_20251009.pb -> GF#_#.pb."""
+    return re.sub(r"\d+", "#", os.path.basename(blob_name))
+
+def _wire_ok(fd: FieldDescriptor, wire_type: int) -> bool:
+    expected = _WIRE_TYPES.get(fd.type, WIRE_VARINT)
+    # repeated scalars may be packed into one length-delimited field
+    return wire_type == expected or (wire_type == WIRE_LEN and fd.label == _FD.LABEL_REPEATED)
+
+def score(descriptor: Descriptor, buf, start: int, end: int,
+          max_fields: int = SNIFF_FIELDS, depth: int = 1) -> int | None:
+    """
+    How well buf[start:end] matches descriptor over its first max_fields
+    fields: known fields count +1, unknown field numbers -2. None if a
+    wire type disagrees or the bytes are not well-formed.
+    """
+    pos, total, seen = start, 0, 0
+    try:
+        while pos < end and seen < max_fields:
+            tag, pos = read_varint(buf, pos, end)
+            number, wire_type = tag >> 3, tag & 7
+            if number == 0:
+                return None
+            field_start = pos
+            pos = _skip(buf, wire_type, pos, end)
+            seen += 1
+            fd = descriptor.fields_by_number.get(number)
+            if fd is None:
+                total -= 2
+                continue
+            if not _wire_ok(fd, wire_type):
+                return None
+            total += 1
+            if depth and fd.type == _FD.TYPE_MESSAGE and wire_type == WIRE_LEN:
+                size, body = read_varint(buf, field_start, end)
+                sub = score(fd.message_type, buf, body, body + size, max(1, max_fields // 4), depth - 1)
+                if sub is None:
+                    return None
+    except DecodeError:
+        return None
+    return total
+
+def _layouts(buf):
+    # (delimited, start, end) readings of the buffer worth scoring
+    yield False, 0, len(buf)
+    try:
+        size, pos = read_varint(buf, 0, len(buf))
+    except DecodeError:
+        return
+    if 0 < size and pos + size <= len(buf):
+        yield True, pos, pos + size
+
+def sniff(buf, candidates: Sequence[tuple[str, type]], max_fields: int = SNIFF_FIELDS) -> Sniff | None:
+    """Best (candidate, layout) for buf, or None if no candidate fits. Ties keep list order, single first."""
+    if not len(buf):
+        name, cls = candidates[0]
+        return Sniff(name, cls, False)
+    best, best_score = None, 0
+    for delimited, start, end in _layouts(buf):
+        for name, cls in candidates:
+            s = score(cls.DESCRIPTOR, buf, start, end, max_fields)
+            if s is not None and s > best_score:
+                best, best_score = Sniff(name, cls, delimited), s
+    return best
+
+def decode_roots(buf, found: Sniff) -> list[Message]:
+    """Decode buf as found says: one root message, or one per delimited frame."""
+    if not found.delimited:
+        return [found.message_cls.FromString(buf[:])]
+    return [found.message_cls.FromString(buf[a:b]) for a, b in iter_frames(buf)]
+
+class RootSniffer:
+    """sniff() with the decision memoised per blob_pattern(); safe to share between threads."""
+    def __init__(self, candidates: Sequence[tuple[str, type]], max_fields: int = SNIFF_FIELDS):
+        self.candidates = list(candidates)
+        self.max_fields = max_fields
+        self._memo: dict[str, Sniff] = {}
+        self._lock = threading.Lock()
+
+    def _still_fits(self, guess: Sniff, buf) -> bool:
+        for delimited, start, end in _layouts(buf):
+            if delimited == guess.delimited:
+                s = score(guess.message_cls.DESCRIPTOR, buf, start, end, self.max_fields)
+                return s is not None and s > 0
+        return False
+
+    def detect(self, blob_name: str, buf) -> Sniff:
+        """The root type and layout of buf; raises DecodeError if no candidate fits."""
+        key = blob_pattern(blob_name)
+        guess = self._memo.get(key)
+        if guess is not None and (not len(buf) or self._still_fits(guess, buf)):
+            return guess
+        found = sniff(buf, self.candidates, self.max_fields)
+        if found is None:
+            raise DecodeError(
+                f"{blob_name} does not look like any of {', '.join(n for n, _ in self.candidates)}"
+            )
+        with self._lock:
+            self._memo[key] = found
+        log.debug("Sniffed %s as %s (%s); memoised for %s", blob_name, found.name,
+                  "delimited" if found.delimited else "single", key)
+        return found
+
+    def forget(self, blob_name: str) -> None:
+        with self._lock:
+            self._memo.pop(blob_pattern(blob_name), None)
+
+_ROOTS: RootSniffer | None = None
+
+def load_root(spec: str) -> tuple[str, type]:
+    """("Class", class) for a "package.module:Class" spec (PB_EXTRA_ROOTS)."""
+    module, _, name = spec.partition(":")
+    return name, getattr(importlib.import_module(module), name)
+
+def root_sniffer() -> RootSniffer:
+    """Shared sniffer for ingested files: TransactionBatch first, then any PB_EXTRA_ROOTS."""
+    global _ROOTS
+    if _ROOTS is None:
+        from app.proto.transactions_pb2 import TransactionBatch
+        candidates = [("TransactionBatch", TransactionBatch)]
+        candidates += [load_root(spec) for spec in settings.PB_EXTRA_ROOTS]
+        _ROOTS = RootSniffer(candidates)
+    return _ROOTS
@@ -0,0 +1,201 @@
+# app/pb_stream.py
+"""
+Streaming reader for TransactionBatch payloads.
+
+Walks the protobuf wire format directly over an mmap of the file (or any
+bytes-like buffer) and decodes PARSE_BATCH_SIZE transactions at a time, so
+memory is bounded by the batch size rather than by the file size. Two layouts are
+accepted:
+
+- a single serialized TransactionBatch (what scripts/make_sample_pb writes);
+- a stream of varint length-delimited TransactionBatch frames.
+
+scan_transactions() does the walk up front without building any message:
+it yields the entry count, rejects bad framing or truncation, and returns an
+offset index of the spans that are then decoded.
+"""
+from __future__ import annotations
+import mmap
+import os
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+from google.protobuf.message import DecodeError
+from app.config import settings
+
+WIRE_VARINT, WIRE_I64, WIRE_LEN, WIRE_I32 = 0, 1, 2, 5
+
+def _batch_cls():
+    # imported lazily like app.parsing did, to keep module import cheap
+    from app.proto.transactions_pb2 import TransactionBatch
+    return TransactionBatch, TransactionBatch.DESCRIPTOR.fields_by_name["transactions"].number
+
+def read_varint(buf, pos: int, end: int) -> tuple[int, int]:
+    """Decode the varint at buf[pos]; returns (value, next_pos)."""
+    result = shift = 0
+    while pos < end:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 64:
+            raise DecodeError(f"varint too long at offset {pos}")
+    raise DecodeError(f"truncated varint at offset {pos}")
+
+def _skip(buf, wire_type: int, pos: int, end: int) -> int:
+    if wire_type == WIRE_VARINT:
+        return read_varint(buf, pos, end)[1]
+    if wire_type == WIRE_I64:
+        pos += 8
+    elif wire_type == WIRE_I32:
+        pos += 4
+    elif wire_type == WIRE_LEN:
+        size, pos = read_varint(buf, pos, end)
+        pos += size
+    else:
+        raise DecodeError(f"unsupported wire type {wire_type}")
+    if pos > end:
+        raise DecodeError("field runs past end of message")
+    return pos
+
+def iter_fields(buf, field_number: int, pos: int = 0, end: int | None = None) -> Iterator[tuple[int, int, int]]:
+    """
+    Yield (tag_start, start, stop) of every length-delimited occurrence of
+    field_number in the message buf[pos:end], skipping all other fields;
+    buf[start:stop] is the payload and buf[tag_start:stop] the whole field.
+    """
+    end = len(buf) if end is None else end
+    while pos < end:
+        tag_start = pos
+        tag, pos = read_varint(buf, pos, end)
+        number, wire_type = tag >> 3, tag & 7
+        if number == field_number and wire_type == WIRE_LEN:
+            size, pos = read_varint(buf, pos, end)
+            if pos + size > end:
+                raise DecodeError(f"field {number} runs past end of message")
+            yield tag_start, pos, pos + size
+            pos += size
+        else:
+            pos = _skip(buf, wire_type, pos, end)
+
+def iter_frames(buf) -> Iterator[tuple[int, int]]:
+    """Yield (start, stop) of each varint length-delimited frame in buf."""
+    pos, end = 0, len(buf)
+    while pos < end:
+        size, pos = read_varint(buf, pos, end)
+        if pos + size > end:
+            raise DecodeError(f"truncated frame at offset {pos}")
+        yield pos, pos + size
+        pos += size
+
+class TxIndex(NamedTuple):
+    """Pre-scan of a TransactionBatch payload (see scan_transactions)."""
+    count: int
+    delimited: bool
+    # (start, stop, n): a run of n consecutive `transactions` fields that
+    # decodes on its own as a TransactionBatch
+    spans: list[tuple[int, int, int]]
+
+def _scan(buf, field: int, ranges, batch_size: int) -> tuple[int, list[tuple[int, int, int]]]:
+    tx_tag = (field << 3) | WIRE_LEN
+    one_byte = tx_tag if tx_tag <= 0x7F else -1  # fast path: compare the tag byte only
+    spans: list[tuple[int, int, int]] = []
+    count = 0
+    for pos, end in ranges:
+        span_start = last = n = 0
+        while pos < end:
+            tag_start = pos
+            if buf[pos] == one_byte:
+                pos += 1
+            else:
+                tag, pos = read_varint(buf, pos, end)
+                number, wire_type = tag >> 3, tag & 7
+                if number == 0:
+                    raise DecodeError(f"invalid field number 0 at offset {tag_start}")
+                if number != field:
+                    pos = _skip(buf, wire_type, pos, end)
+                    continue
+                if wire_type != WIRE_LEN:
+                    raise DecodeError(f"transactions field with wire type {wire_type} at offset {tag_start}")
+            if pos >= end:
+                raise DecodeError(f"truncated field at offset {tag_start}")
+            size = buf[pos]
+            if size & 0x80:
+                size, pos = read_varint(buf, pos, end)
+            else:
+                pos += 1
+            if pos + size > end:
+                raise DecodeError(f"transactions entry at offset {tag_start} runs past end of message")
+            if n == 0:
+                span_start = tag_start
+            pos = last = pos + size
+            n += 1
+            if n == batch_size:
+                spans.append((span_start, pos, n))
+                count += n
+                n = 0
+        if n:
+            spans.append((span_start, last, n))
+            count += n
+    return count, spans
+
+def scan_transactions(buf, delimited: bool | None = None, batch_size: int | None = None) -> TxIndex:
+    """
+    Walk the top-level tag/length pairs of a TransactionBatch payload without
+    building any message: count the `transactions` entries, check that every
+    field and frame ends inside the buffer, and index the runs of batch_size
+    (PARSE_BATCH_SIZE) entries that decode_batches() will decode. Raises
+    DecodeError on bad framing or truncation.
+
+    delimited=None reads the buffer as a single message and falls back to a
+    delimited stream if that does not walk cleanly.
+    """
+    _, field = _batch_cls()
+    batch_size = batch_size or settings.PARSE_BATCH_SIZE
+    if delimited is None:
+        try:
+            return scan_transactions(buf, False, batch_size)
+        except DecodeError as e:
+            try:
+                return scan_transactions(buf, True, batch_size)
+            except DecodeError:
+                raise e from None
+    ranges = iter_frames(buf) if delimited else [(0, len(buf))]
+    count, spans = _scan(buf, field, ranges, batch_size)
+    return TxIndex(count, delimited, spans)
+
+def decode_batches(buf, index: TxIndex) -> Iterator[list]:
+    """Decoded Transaction lists for each span of index, one ParseFromString call per span."""
+    TransactionBatch, _ = _batch_cls()
+    for start, stop, _ in index.spans:
+        yield list(TransactionBatch.FromString(buf[start:stop]).transactions)
+
+def iter_transaction_batches(buf, batch_size: int | None = None,
+                             delimited: bool | None = None) -> Iterator[list]:
+    """
+    Yield lists of at most batch_size (PARSE_BATCH_SIZE) decoded Transaction
+    messages from a single TransactionBatch or a delimited stream of them.
+    Raises DecodeError on malformed input.
+
+    Only field boundaries are walked in Python (scan_transactions). Each run
+    of batch_size `transactions` fields is itself a valid TransactionBatch
+    encoding, so it is decoded with a single ParseFromString call in the C
+    runtime. Pass delimited (e.g. from app.pb_sniff) to skip guessing the layout.
+    """
+    yield from decode_batches(buf, scan_transactions(buf, delimited, batch_size))
+
+def iter_transactions(buf, batch_size: int | None = None, delimited: bool | None = None) -> Iterator:
+    """Flattened iter_transaction_batches()."""
+    for batch in iter_transaction_batches(buf, batch_size, delimited):
+        yield from batch
+
+@contextmanager
+def mapped(path: str):
+    """Read-only mmap of path (b"" for an empty file, which mmap rejects)."""
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
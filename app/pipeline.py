@@ -7,85 +7,57 @@ from typing import List
 
 from app.config import settings
 from app.db import session_scope, try_advisory_lock, advisory_unlock
-from app.models import File, FileStatus, Record, RecordStatus
-from app.azure_rest import list_blobs, download_blob
+from app.downloader import download_many
+from app.pairs import sync_pairs
+from app.sync import RECORD_BATCH, IncrementalListing, chunked, prior_versions, record_downloads, unseen_blobs
 from app.parsing import parse_new_files
-from app.soap_client import send_record
+from app.soap_dispatch import send_new_records
 
 log = logging.getLogger(__name__)
 LOCK_KEY = 424242  # choose a project-unique integer
 
+def _local_path(blob_name: str) -> str:
+    return os.path.join(str(settings.INCOMING_DIR), os.path.basename(blob_name))
+
 def sync_from_azure() -> List[str]:
     downloaded: List[str] = []
     os.makedirs(str(settings.INCOMING_DIR), exist_ok=True)
-
-    with session_scope() as s:
-        for item in list_blobs():
-            exists = s.query(File.id).filter(
-                File.blob_name == item.name,
-                File.etag == item.etag,
-            ).first()
-            if exists:
-                log.debug("Skipping seen blob %s (etag=%s)", item.name, item.etag)
-                continue
-
-            local_name = os.path.basename(item.name)
-            local_path = os.path.join(str(settings.INCOMING_DIR), local_name)
+    if settings.SYNC_PAIR_MODE:
+        return sync_pairs(_local_path)
+
+    listing = IncrementalListing()
+    for page in chunked(listing):
+        # 1) one set-based dedupe query per listing page
+        with session_scope() as s:
+            pending = unseen_blobs(s, page)
+            prior = prior_versions(s, pending)
+        log.debug("Listing page: %d blobs, %d unseen", len(page), len(pending))
+        if not pending:
+            continue
+
+        # 2) download in parallel with no DB transaction open, recording landed
+        #    blobs in batches; rows raced in by another worker are skipped
+        landed = set()
+        ok_results = (r for r in download_many(pending, _local_path, prior=prior) if r.ok)
+        for batch in chunked(ok_results, RECORD_BATCH):
             try:
-                etag = download_blob(item.name, local_path)
+                with session_scope() as s:
+                    ids = record_downloads(s, batch)
             except Exception as e:
-                log.exception("Failed downloading blob %s: %s", item.name, e)
+                # the batch is retried by the next tick; earlier batches stay recorded
+                log.error("Failed to record %d downloads: %s", len(batch), e)
                 continue
-
-            f = File(
-                blob_name=item.name,
-                etag=etag or item.etag,
-                local_path=local_path,
-                status=FileStatus.NEW.value,
-            )
-            s.add(f)
-            log.info("Recorded new File for blob=%s etag=%s path=%s", item.name, f.etag, local_path)
-            downloaded.append(local_path)
+            landed.update(r.blob_name for r in batch)
+            log.info("Recorded %d new File rows (%d downloaded)", len(ids), len(batch))
+            downloaded.extend(r.local_path or r.blob_name for r in batch)
+        listing.failed(i for i in pending if i.name not in landed)
+    listing.save()
     return downloaded
 
 
 def process_records_via_soap():
-    with session_scope() as s:
-        recs = s.query(Record).filter(Record.status == RecordStatus.NEW.value).all()
-        log.info("Found %d NEW records to send", len(recs))
-        for r in recs:
-            try:
-                ok, corr_id, err = send_record(r)
-            except Exception as e:
-                ok = False
-                corr_id = None
-                err = f"Exception: {e}"
-            if ok:
-                r.status = RecordStatus.PROCESSED.value
-                r.soap_corr_id = corr_id
-                r.error_message = None
-                log.info("Record id=%s -> PROCESSED corr=%s", r.record_id, corr_id)
-            else:
-                r.status = RecordStatus.FAILED.value
-                r.error_message = err
-                log.warning("Record id=%s -> FAILED: %s", r.record_id, err)
-
-        files = s.query(File).all()
-        for f in files:
-            child_statuses = [rc.status for rc in f.records]
-            f.processed_count = sum(1 for st in child_statuses if st == RecordStatus.PROCESSED.value)
-            if not child_statuses:
-                continue
-            if all(st == RecordStatus.PROCESSED.value for st in child_statuses):
-                f.status = FileStatus.PROCESSED.value
-                log.info("File id=%s marked PROCESSED", f.id)
-            elif any(st == RecordStatus.FAILED.value for st in child_statuses) and \
-                 not all(st == RecordStatus.PROCESSED.value for st in child_statuses):
-                f.status = FileStatus.FAILED.value
-                log.info("File id=%s marked FAILED (some records failed)", f.id)
-            else:
-                f.status = FileStatus.PROCESSING.value
-                log.debug("File id=%s remains PROCESSING", f.id)
+    """Send NEW records concurrently (SOAP_CONCURRENCY) and roll up their files; see app.soap_dispatch."""
+    return send_new_records()
 
 
 def pipeline_tick():
@@ -0,0 +1,197 @@
+# app/projection.py
+"""
+Read a handful of dotted field paths straight from a decoded protobuf
+message, with the values MessageToDict would have produced at those paths.
+This avoids MessageToJson-ing the whole tree and json.load-ing it back.
+
+Paths use the JSON (lowerCamel) field names, as the JSON-based mapping code
+did; proto field names are accepted too. A numeric step indexes a repeated
+field, "*" maps the rest of the path over all of its elements (as in
+app.paths), and any other step after a map field is a key. A path that ends on
+a message is rendered with MessageToDict for that subtree only. Paths are
+compiled once per message descriptor.
+"""
+from __future__ import annotations
+import base64
+import math
+import os
+from pathlib import Path
+from typing import Any, Callable, Mapping
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from google.protobuf.json_format import MessageToDict, MessageToJson
+from google.protobuf.message import Message
+from app.logging import get_logger
+from app.paths import WILDCARD, Extractor
+
+try:
+    from google.protobuf.internal.type_checkers import ToShortestFloat
+except ImportError:  # internal helper MessageToDict uses for float fields
+    def ToShortestFloat(v: float) -> float:
+        return float(f"{v:.7g}")
+
+log = get_logger(__name__)
+
+_FD = FieldDescriptor
+_MISSING = object()
+_INT64 = {_FD.TYPE_INT64, _FD.TYPE_UINT64, _FD.TYPE_SINT64, _FD.TYPE_FIXED64, _FD.TYPE_SFIXED64}
+
+def _json_scalar(fd: FieldDescriptor) -> Callable[[Any], Any]:
+    """Converter from a stored value of fd to its MessageToDict rendering."""
+    if fd.type == _FD.TYPE_MESSAGE:
+        return MessageToDict
+    if fd.type == _FD.TYPE_ENUM:
+        names = fd.enum_type.values_by_number
+        return lambda v: names[v].name if v in names else v
+    if fd.type in _INT64:
+        return str
+    if fd.type == _FD.TYPE_BYTES:
+        return lambda v: base64.b64encode(v).decode("utf-8")
+    if fd.type in (_FD.TYPE_DOUBLE, _FD.TYPE_FLOAT):
+        short = fd.type == _FD.TYPE_FLOAT
+        def conv(v: float):
+            if math.isnan(v):
+                return "NaN"
+            if math.isinf(v):
+                return "Infinity" if v > 0 else "-Infinity"
+            return ToShortestFloat(v) if short else v
+        return conv
+    return lambda v: v
+
+def _field(descriptor: Descriptor, part: str) -> FieldDescriptor | None:
+    fd = descriptor.fields_by_name.get(part)
+    if fd is None:
+        fd = next((f for f in descriptor.fields if f.json_name == part), None)
+    return fd
+
+def _is_map(fd: FieldDescriptor) -> bool:
+    return fd.type == _FD.TYPE_MESSAGE and fd.message_type.GetOptions().map_entry
+
+def _compile(descriptor: Descriptor, path: str) -> Callable[[Message], Any]:
+    """Steps for path as closures over cur -> next value (or _MISSING)."""
+    steps: list[Callable] = []
+    parts = path.split(".")
+    desc: Descriptor | None = descriptor
+    leaf: Callable[[Any], Any] = MessageToDict
+    i = 0
+    while i < len(parts):
+        part = parts[i]
+        fd = _field(desc, part) if desc is not None else None
+        if fd is None:
+            log.warning("Projection path %r: no field %r in %s", path, part,
+                        desc.full_name if desc is not None else "a scalar")
+            return lambda msg: None
+        name = fd.name
+        if _is_map(fd):
+            key_fd, value_fd = fd.message_type.fields_by_name["key"], fd.message_type.fields_by_name["value"]
+            steps.append(lambda cur, n=name: getattr(cur, n) if len(getattr(cur, n)) else _MISSING)
+            i += 1
+            if i == len(parts):
+                conv = _json_scalar(value_fd)
+                leaf = lambda m, conv=conv: {str(k): conv(v) for k, v in m.items()}
+                break
+            key = parts[i]
+            if key_fd.type == _FD.TYPE_BOOL:
+                key = key == "true"
+            elif key_fd.cpp_type != _FD.CPPTYPE_STRING:
+                try:
+                    key = int(key)
+                except ValueError:
+                    return lambda msg: None
+            steps.append(lambda cur, k=key: cur[k] if k in cur else _MISSING)
+            desc, leaf = value_fd.message_type, _json_scalar(value_fd)
+        elif fd.label == _FD.LABEL_REPEATED:
+            steps.append(lambda cur, n=name: getattr(cur, n) if len(getattr(cur, n)) else _MISSING)
+            i += 1
+            if i == len(parts):
+                conv = _json_scalar(fd)
+                leaf = lambda seq, conv=conv: [conv(v) for v in seq]
+                break
+            if parts[i] == WILDCARD:
+                rest = ".".join(parts[i + 1:])
+                if not rest:
+                    sub = _json_scalar(fd)
+                elif fd.type == _FD.TYPE_MESSAGE:
+                    sub = _compile(fd.message_type, rest)
+                else:
+                    return lambda msg: None
+                flatten = WILDCARD in parts[i + 1:]
+                def each(seq, sub=sub, flatten=flatten):
+                    out = []
+                    for item in seq:
+                        v = sub(item)
+                        if v is None:
+                            continue
+                        if flatten:
+                            out.extend(v)
+                        else:
+                            out.append(v)
+                    return out
+                leaf = each
+                break
+            try:
+                idx = int(parts[i])
+            except ValueError:
+                # a named step into a list is a miss in the JSON walk too
+                return lambda msg: None
+            def at(cur, idx=idx):
+                try:
+                    return cur[idx]
+                except IndexError:
+                    return _MISSING
+            steps.append(at)
+            desc, leaf = fd.message_type, _json_scalar(fd)
+        elif fd.type == _FD.TYPE_MESSAGE or fd.has_presence:
+            steps.append(lambda cur, n=name: getattr(cur, n) if cur.HasField(n) else _MISSING)
+            desc, leaf = fd.message_type, _json_scalar(fd)
+        else:
+            # implicit-presence scalar: MessageToDict omits the default value
+            default = fd.default_value
+            steps.append(lambda cur, n=name, d=default: _MISSING if getattr(cur, n) == d else getattr(cur, n))
+            desc, leaf = None, _json_scalar(fd)
+        i += 1
+
+    def get(msg: Message) -> Any:
+        cur = msg
+        for step in steps:
+            cur = step(cur)
+            if cur is _MISSING:
+                return None
+        return leaf(cur)
+    return get
+
+class Projection:
+    """
+    A named set of dotted paths. Calling it on a message returns
+    {name: value-or-None}; a plain dict (already-parsed JSON) goes through
+    app.paths, so both sources map identically.
+    """
+    def __init__(self, paths: Mapping[str, str]):
+        self.paths = dict(paths)
+        self._json = Extractor(self.paths)
+        self._plans: dict[str, list[tuple[str, Callable]]] = {}
+
+    def _plan(self, descriptor: Descriptor) -> list[tuple[str, Callable]]:
+        plan = self._plans.get(descriptor.full_name)
+        if plan is None:
+            plan = self._plans[descriptor.full_name] = [
+                (key, _compile(descriptor, path)) for key, path in self.paths.items()
+            ]
+        return plan
+
+    def __call__(self, source: Message | Mapping[str, Any]) -> dict[str, Any]:
+        if isinstance(source, Message):
+            return {key: get(source) for key, get in self._plan(source.DESCRIPTOR)}
+        return self._json(source)
+
+def write_debug_json(msgs: list[Message], pb_path: str) -> str:
+    """Debug artifact: the decoded root(s) as pretty JSON next to the .pb (a list if several)."""
+    out = Path(pb_path).with_suffix(".json")
+    if len(msgs) == 1:
+        text = MessageToJson(msgs[0], indent=2)
+    else:
+        text = "[\n" + ",\n".join(MessageToJson(m, indent=2) for m in msgs) + "\n]"
+    tmp = f"{out}.part"
+    Path(tmp).write_text(text, encoding="utf-8")
+    os.replace(tmp, out)
+    log.info("Wrote debug JSON %s", out)
+    return str(out)
@@ -0,0 +1,260 @@
+# app/soap_async.py
+"""
+asyncio backend for ProcessTransaction (SOAP_BACKEND=asyncio).
+
+Thousands of calls can be in flight without a thread each. Requests go over a
+small HTTP/1.1 client on pooled keep-alive asyncio connections, at most
+SOAP_ASYNC_INFLIGHT of them at once. Envelopes and replies go through the
+same app.soap_fast codec (or Zeep) as app.soap_client, so results and
+faults match, and AsyncSoapSender.send() returns the same
+(ok, corr_id, err) tuple as send_record_to_soap.
+
+dispatch_async() runs the event loop on a helper thread and yields outcomes
+to synchronous callers such as app.soap_dispatch. Closing the generator
+cancels the in-flight calls and closes their connections.
+"""
+from __future__ import annotations
+import asyncio
+import base64
+import queue
+import ssl
+import threading
+import uuid
+from types import SimpleNamespace
+from typing import Iterable, Iterator
+from urllib.parse import urlsplit
+from lxml import etree
+from requests.structures import CaseInsensitiveDict
+from zeep import Client
+from zeep.exceptions import Fault
+from app.config import settings
+from app.logging import get_logger
+from app.soap_client import OPERATION, _get_client, is_success, transaction_args
+from app.soap_fast import codec_for
+
+log = get_logger(__name__)
+
+_DONE = object()
+
+class _Unanswered(ConnectionError):
+    """A pooled connection closed before the request was written or any reply byte came back."""
+
+class HttpPool:
+    """Keep-alive HTTP/1.1 POSTs to one URL over at most `size` connections."""
+    def __init__(self, url: str, size: int, timeout: float = 30.0):
+        u = urlsplit(url)
+        self.host = u.hostname
+        self.ssl = ssl.create_default_context() if u.scheme == "https" else None
+        self.port = u.port or (443 if self.ssl else 80)
+        self.path = (u.path or "/") + (f"?{u.query}" if u.query else "")
+        self.host_header = u.netloc.rsplit("@", 1)[-1]
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def post(self, body: bytes, headers: dict[str, str]) -> SimpleNamespace:
+        """POST body; returns a requests-like response (status_code, headers, content)."""
+        async with self._slots:
+            for attempt in (1, 2):
+                conn = self._idle.pop() if self._idle else None
+                reused = conn is not None
+                if conn is None:
+                    conn = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+                try:
+                    resp, keep = await asyncio.wait_for(self._roundtrip(conn, body, headers), self.timeout)
+                except _Unanswered:
+                    _close(conn)
+                    if reused and attempt == 1:
+                        continue  # the server dropped an idle keep-alive connection
+                    raise
+                except BaseException:
+                    # the request may have been processed (POST is not idempotent):
+                    # resending is left to send()'s retries; timeouts and
+                    # cancellation leave the stream mid-response
+                    _close(conn)
+                    raise
+                if keep:
+                    self._idle.append(conn)
+                else:
+                    _close(conn)
+                return resp
+
+    async def _roundtrip(self, conn, body: bytes, headers: dict[str, str]) -> tuple[SimpleNamespace, bool]:
+        reader, writer = conn
+        if reader.at_eof():
+            raise _Unanswered("connection closed by the server while idle")
+        head = [f"POST {self.path} HTTP/1.1", f"Host: {self.host_header}",
+                f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        head += [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        try:
+            status_line = await reader.readuntil(b"\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            # EOF before the first byte of a reply: the server closed the
+            # keep-alive connection rather than answer on it
+            raise _Unanswered("connection closed before any response") from e
+        parts = status_line.decode("latin-1").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise ConnectionError(f"bad HTTP status line {status_line!r}")
+        status, version = int(parts[1]), parts[0]
+        resp_headers: CaseInsensitiveDict = CaseInsensitiveDict()
+        while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.decode("latin-1").partition(":")
+            resp_headers[name.strip()] = value.strip()
+
+        keep = version == "HTTP/1.1" and resp_headers.get("Connection", "").lower() != "close"
+        if "chunked" in resp_headers.get("Transfer-Encoding", "").lower():
+            chunks = []
+            while size := int((await reader.readuntil(b"\r\n")).split(b";")[0], 16):
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            while await reader.readuntil(b"\r\n") != b"\r\n":
+                pass  # trailers
+            content = b"".join(chunks)
+        elif "Content-Length" in resp_headers:
+            content = await reader.readexactly(int(resp_headers["Content-Length"]))
+        else:
+            content, keep = await reader.read(), False
+        return SimpleNamespace(status_code=status, headers=resp_headers, content=content, encoding=None), keep
+
+    async def close(self) -> None:
+        while self._idle:
+            _close(self._idle.pop())
+
+def _close(conn) -> None:
+    conn[1].close()
+
+class AsyncSoapSender:
+    """
+    ProcessTransaction over HttpPool. The Zeep client (and its FastCodec) is
+    only used to build envelopes and parse replies, so one client can serve
+    the whole loop.
+    """
+    def __init__(self, inflight: int | None = None, client: Client | None = None):
+        self.client = client or _get_client()
+        self.service = self.client.service
+        self.binding = self.service._binding
+        self.operation = self.binding.get(OPERATION)
+        self.codec = codec_for(self.client, OPERATION) if settings.SOAP_FAST_PATH else None
+        self.headers = {
+            "Content-Type": "text/xml; charset=utf-8",
+            "SOAPAction": f'"{self.operation.soapaction or ""}"',
+        }
+        if settings.SOAP_USER and settings.SOAP_PASS:
+            token = base64.b64encode(f"{settings.SOAP_USER}:{settings.SOAP_PASS}".encode()).decode()
+            self.headers["Authorization"] = f"Basic {token}"
+        self.pool = HttpPool(self.service._binding_options["address"],
+                             max(1, inflight or settings.SOAP_ASYNC_INFLIGHT))
+
+    def envelope(self, record, corr: str) -> bytes:
+        args = transaction_args(record, corr)
+        if self.codec and (body := self.codec.envelope(args)) is not None:
+            return body
+        return etree.tostring(self.client.create_message(self.service, OPERATION, **args),
+                              encoding="utf-8", xml_declaration=True)
+
+    def reply(self, resp):
+        if self.codec:
+            return self.codec.reply(resp)
+        return self.binding.process_reply(self.client, self.operation, resp)
+
+    async def send(self, record, max_retries: int = 3, backoff_seconds: float = 1.0) -> tuple[bool, str | None, str | None]:
+        """send_record_to_soap() semantics: retries with exponential backoff, no retry on non-success."""
+        corr = str(uuid.uuid4())
+        last_err = None
+        for attempt in range(1, max_retries + 1):
+            try:
+                resp = await self.pool.post(self.envelope(record, corr), self.headers)
+                res = self.reply(resp)
+                if is_success(res):
+                    return True, corr, None
+                err_msg = f"Remote returned non-success: {res}"
+                log.warning(err_msg)
+                return False, corr, err_msg
+            except Fault as f:
+                last_err = f"{type(f).__name__}: {str(f)}"
+                log.warning("SOAP Fault for record=%s: %s", record.record_id, last_err)
+            except (asyncio.CancelledError, KeyboardInterrupt):
+                raise
+            except Exception as exc:
+                last_err = f"{type(exc).__name__}: {str(exc)}"
+                log.warning("SOAP attempt %d failed for record=%s: %s", attempt, record.record_id, last_err)
+            if attempt < max_retries:
+                await asyncio.sleep(backoff_seconds * (2 ** (attempt - 1)))
+        log.error("SOAP send failed after %d attempts for record=%s: last_error=%s",
+                  max_retries, getattr(record, "record_id", "<no-id>"), last_err)
+        return False, corr, last_err
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+async def _run(items: Iterator, inflight: int, client: Client | None, emit,
+               stop: threading.Event) -> None:
+    from app.soap_dispatch import Outcome
+    sender = AsyncSoapSender(inflight, client)
+
+    async def worker() -> None:
+        # the loop is single-threaded, so workers can share one iterator
+        for item in items:
+            if stop.is_set():
+                return  # a cancel swallowed by a finishing wait_for must not start new calls
+            try:
+                ok, corr, err = await sender.send(item)
+            except (asyncio.CancelledError, KeyboardInterrupt):
+                raise
+            except Exception as e:
+                ok, corr, err = False, None, f"Exception: {type(e).__name__}: {e}"
+            emit(Outcome(item.id, item.file_id, ok, corr, err))
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(inflight):
+                tg.create_task(worker())
+    finally:
+        await sender.close()
+
+def dispatch_async(items: Iterable, inflight: int | None = None) -> Iterator:
+    """
+    soap_dispatch.dispatch() on the asyncio backend: yields an Outcome per
+    item as it completes, with at most `inflight` (SOAP_ASYNC_INFLIGHT) calls open.
+    """
+    inflight = max(1, inflight or settings.SOAP_ASYNC_INFLIGHT)
+    client = _get_client()  # built (WSDL fetched) once, on the calling thread
+    out: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    state: dict = {}
+
+    def run() -> None:
+        loop = asyncio.new_event_loop()
+        state["loop"] = loop
+        try:
+            task = state["task"] = loop.create_task(_run(iter(items), inflight, client, out.put, stop))
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        except BaseException as e:
+            state["error"] = e
+        finally:
+            loop.close()
+            out.put(_DONE)
+
+    thread = threading.Thread(target=run, name="soap-async", daemon=True)
+    thread.start()
+    try:
+        while (o := out.get()) is not _DONE:
+            yield o
+    finally:
+        stop.set()
+        if thread.is_alive() and "task" in state:
+            try:
+                state["loop"].call_soon_threadsafe(state["task"].cancel)
+            except RuntimeError:
+                pass  # the loop finished and closed meanwhile
+        thread.join()
+    if "error" in state:
+        raise state["error"]
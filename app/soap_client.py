@@ -1,5 +1,6 @@
 # app/soap_client.py
 from __future__ import annotations
+import threading
 import uuid
 import time
 from typing import Tuple
@@ -10,28 +11,76 @@ from zeep.transports import Transport
 from zeep.exceptions import Fault
 from app.config import settings
 from app.logging import get_logger
+from app.soap_fast import codec_for
+from app.wsdl_cache import wsdl_cache
 
 log = get_logger(__name__)
 
-# simple module-level client cache
-_CLIENT: Client | None = None
+OPERATION = "ProcessTransaction"
+BATCH_OPERATION = "ProcessTransactionBatch"
+
+# one Zeep client (and requests Session) per thread: neither is safe to
+# share between the threads of app.soap_dispatch
+_LOCAL = threading.local()
 
 def _get_client() -> Client:
-    global _CLIENT
-    if _CLIENT is None:
+    client = getattr(_LOCAL, "client", None)
+    if client is None:
         sess = Session()
         # attach basic auth to HTTP layer if provided
         if settings.SOAP_USER and settings.SOAP_PASS:
             sess.auth = HTTPBasicAuth(settings.SOAP_USER, settings.SOAP_PASS)
         # optional: tune session/timeouts, pool, etc
-        transport = Transport(session=sess, timeout=30)
-        log.info("Creating Zeep client for WSDL=%s", settings.SOAP_WSDL_URL)
-        _CLIENT = Client(wsdl=str(settings.SOAP_WSDL_URL), transport=transport)
-    return _CLIENT
+        cache = wsdl_cache()
+        log.info("Creating Zeep client for WSDL=%s (thread=%s)", settings.SOAP_WSDL_URL, threading.current_thread().name)
+        if cache is None:
+            client = Client(wsdl=str(settings.SOAP_WSDL_URL), transport=Transport(session=sess, timeout=30))
+        else:
+            client = cache.client(str(settings.SOAP_WSDL_URL), cache.transport(session=sess, timeout=30))
+        _LOCAL.client = client
+    return client
+
+def transaction_args(record, corr: str) -> dict:
+    """ProcessTransaction keyword arguments for a record."""
+    # Adjust operation name / parameter names to match your WSDL.
+    # We assume an operation named ProcessTransaction that accepts these args.
+    return dict(
+        recordId=record.record_id,
+        name=record.name,
+        amount=float(record.amount),
+        currency=record.currency,
+        timestamp=record.timestamp,
+        correlationId=corr,  # optional, some WSDLs accept correlation id
+    )
+
+def is_success(res) -> bool:
+    """Interpret a ProcessTransaction result: Zeep may return an object or dict; handle both."""
+    try:
+        if isinstance(res, str):
+            # a single-element reply comes back from Zeep as the bare value
+            return res == "SUCCESS"
+        if hasattr(res, "result"):
+            return getattr(res, "result") == "SUCCESS"
+        if isinstance(res, dict):
+            return res.get("result") == "SUCCESS"
+        # best-effort: if the response is truthy treat as success
+        return bool(res)
+    except Exception:
+        return bool(res)
+
+def process_transaction(client: Client, record, corr: str):
+    """One ProcessTransaction call: app.soap_fast bytes when SOAP_FAST_PATH allows, Zeep otherwise."""
+    args = transaction_args(record, corr)
+    codec = codec_for(client, OPERATION) if settings.SOAP_FAST_PATH else None
+    body = codec.envelope(args) if codec else None
+    if body is None:
+        return client.service.ProcessTransaction(**args)
+    return codec.reply(client.transport.post(codec.address, body, codec.headers))
 
 def send_record_to_soap(record, max_retries: int = 3, backoff_seconds: float = 1.0) -> Tuple[bool, str | None, str | None]:
     """
-    Send a single Record to SOAP. Returns (success, correlation_id, error_message).
+    Send a single Record (or any object with its fields, e.g. a
+    soap_dispatch.Outgoing) to SOAP. Returns (success, correlation_id, error_message).
     correlation_id is a UUID created locally for tracing.
     Retries on any exception up to max_retries with exponential backoff.
     """
@@ -41,32 +90,10 @@ def send_record_to_soap(record, max_retries: int = 3, backoff_seconds: float = 1
 
     for attempt in range(1, max_retries + 1):
         try:
-            # Adjust operation name / parameter names to match your WSDL.
-            # We assume an operation named ProcessTransaction that accepts these args.
             log.info("SOAP send attempt %d for record=%s (corr=%s)", attempt, getattr(record, "record_id", "<no-id>"), corr)
-            res = client.service.ProcessTransaction(
-                recordId=record.record_id,
-                name=record.name,
-                amount=float(record.amount),
-                currency=record.currency,
-                timestamp=record.timestamp,
-                correlationId=corr,  # optional, some WSDLs accept correlation id
-            )
-
-            # Interpret result: Zeep may return an object or dict; handle both.
-            ok = False
-            try:
-                if hasattr(res, "result"):
-                    ok = (getattr(res, "result") == "SUCCESS")
-                elif isinstance(res, dict):
-                    ok = (res.get("result") == "SUCCESS")
-                else:
-                    # best-effort: if the response is truthy treat as success
-                    ok = bool(res)
-            except Exception:
-                ok = bool(res)
+            res = process_transaction(client, record, corr)
 
-            if ok:
+            if is_success(res):
                 log.info("SOAP success for record=%s corr=%s", record.record_id, corr)
                 return True, corr, None
             else:
@@ -95,3 +122,65 @@ def send_record_to_soap(record, max_retries: int = 3, backoff_seconds: float = 1
     log.error("SOAP send failed after %d attempts for record=%s: last_error=%s", max_retries, getattr(record, "record_id", "<no-id>"), last_err)
     return False, corr, last_err
 
+
+def _batch_items(res) -> list:
+    # Zeep returns the bare list for a reply whose only element is repeated
+    if res is None:
+        return []
+    if isinstance(res, list):
+        return res
+    return list(getattr(res, "item", None) or [])
+
+def send_batch_to_soap(records: list, max_retries: int = 3,
+                       backoff_seconds: float = 1.0) -> list[Tuple[bool, str | None, str | None]]:
+    """
+    Send records in ProcessTransactionBatch envelopes; returns one
+    (success, correlation_id, error_message) per record, in order. Items are
+    matched to records by correlation id. Failed items, and every item of an
+    envelope that failed as a whole, are sent again (only those) with
+    exponential backoff, up to max_retries attempts each.
+    """
+    client = _get_client()
+    corrs = [str(uuid.uuid4()) for _ in records]
+    results: list = [None] * len(records)
+    errors: dict[int, str] = {}
+    pending = list(range(len(records)))
+
+    for attempt in range(1, max_retries + 1):
+        log.info("SOAP batch attempt %d: %d of %d records", attempt, len(pending), len(records))
+        try:
+            res = client.service.ProcessTransactionBatch(
+                transaction=[transaction_args(records[i], corrs[i]) for i in pending])
+            by_corr = {getattr(item, "correlationId", None): item for item in _batch_items(res)}
+            retry = []
+            for i in pending:
+                item = by_corr.get(corrs[i])
+                if item is None:
+                    errors[i] = "No result for this transaction in the batch reply"
+                    retry.append(i)
+                elif is_success(getattr(item, "result", None)):
+                    results[i] = (True, corrs[i], None)
+                else:
+                    errors[i] = item.error or f"Remote returned non-success: {item.result}"
+                    retry.append(i)
+            pending = retry
+        except Fault as f:
+            err = f"{type(f).__name__}: {str(f)}"
+            log.warning("SOAP Fault for a batch of %d records: %s", len(pending), err)
+            errors.update((i, err) for i in pending)
+        except Exception as exc:
+            err = f"{type(exc).__name__}: {str(exc)}"
+            log.warning("SOAP batch attempt %d failed for %d records: %s", attempt, len(pending), err)
+            errors.update((i, err) for i in pending)
+        if not pending:
+            break
+        if attempt < max_retries:
+            sleep = backoff_seconds * (2 ** (attempt - 1))
+            log.info("%d records failed; sleeping %.1fs before resending them", len(pending), sleep)
+            time.sleep(sleep)
+
+    for i in pending:
+        log.error("SOAP send failed after %d attempts for record=%s: last_error=%s",
+                  max_retries, getattr(records[i], "record_id", "<no-id>"), errors[i])
+        results[i] = (False, corrs[i], errors[i])
+    return results
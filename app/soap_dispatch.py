@@ -0,0 +1,250 @@
+# app/soap_dispatch.py
+"""
+Concurrent SOAP sending of NEW records.
+
+Records are claimed SOAP_CLAIM_BATCH at a time (NEW -> PROCESSING, FOR UPDATE
+SKIP LOCKED, committed at once) and snapshotted into plain Outgoing tuples,
+so no ORM object crosses a thread. A pool of SOAP_CONCURRENCY threads then
+sends them, each thread with its own Zeep client (app.soap_client), and the
+outcomes are written back SOAP_WRITEBACK_BATCH rows per transaction
+together with the File roll-ups; each write-back also refreshes updated_at
+on the batch's still-unsent claims, so release_stale_records only ever
+takes the claims of a sender that stopped making progress. Throughput is roughly
+concurrency / round-trip time instead of 1 / round-trip time. With
+SOAP_BACKEND=asyncio the sending goes through app.soap_async instead.
+With SOAP_BATCH_SIZE > 1 each thread sends up to that many records per
+ProcessTransactionBatch envelope (send_batch_to_soap), on either backend
+setting; only failed items are resent.
+"""
+from __future__ import annotations
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from itertools import islice
+from typing import Callable, Iterable, Iterator, NamedTuple
+from sqlalchemy import func, select, update
+from app.config import settings
+from app.db import session_scope
+from app.logging import get_logger
+from app.models import File, FileStatus, Record, RecordStatus
+from app.soap_client import send_batch_to_soap, send_record_to_soap
+
+log = get_logger(__name__)
+
+class Outgoing(NamedTuple):
+    """Snapshot of a claimed Record: what send_record_to_soap reads."""
+    id: int
+    file_id: int
+    record_id: str
+    name: str
+    amount: object
+    currency: str
+    timestamp: str
+
+class Outcome(NamedTuple):
+    id: int
+    file_id: int
+    ok: bool
+    corr_id: str | None
+    error: str | None
+
+Sender = Callable[[Outgoing], tuple[bool, str | None, str | None]]
+BatchSender = Callable[[list[Outgoing]], list[tuple[bool, str | None, str | None]]]
+
+def claim_records(s, limit: int) -> list[Outgoing]:
+    """Atomically move up to `limit` NEW records to PROCESSING and return their snapshots."""
+    pick = (
+        select(Record.id)
+        .where(Record.status == RecordStatus.NEW.value)
+        .order_by(Record.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Record)
+        .where(Record.id.in_(pick))
+        .values(status=RecordStatus.PROCESSING.value)
+        .returning(Record.id, Record.file_id, Record.record_id, Record.name,
+                   Record.amount, Record.currency, Record.timestamp)
+    )
+    return sorted((Outgoing(*row) for row in s.execute(stmt)), key=lambda o: o.id)
+
+def release_stale_records(s, older_than: float) -> int:
+    """Put PROCESSING records untouched for older_than seconds (a crashed sender) back to NEW."""
+    res = s.execute(
+        update(Record)
+        .where(Record.status == RecordStatus.PROCESSING.value,
+               Record.updated_at < datetime.now(timezone.utc) - timedelta(seconds=older_than))
+        .values(status=RecordStatus.NEW.value)
+    )
+    return res.rowcount or 0
+
+def touch_claims(s, ids: Iterable[int]) -> None:
+    """Refresh updated_at on the still-PROCESSING records among ids (claims being sent)."""
+    ids = sorted(ids)
+    for i in range(0, len(ids), settings.SOAP_CLAIM_BATCH):
+        s.execute(
+            update(Record)
+            .where(Record.id.in_(ids[i:i + settings.SOAP_CLAIM_BATCH]),
+                   Record.status == RecordStatus.PROCESSING.value)
+            .values(updated_at=func.now())
+        )
+
+def _call(send: Sender, item: Outgoing) -> Outcome:
+    try:
+        ok, corr_id, err = send(item)
+    except Exception as e:
+        ok, corr_id, err = False, None, f"Exception: {type(e).__name__}: {e}"
+    return Outcome(item.id, item.file_id, ok, corr_id, err)
+
+def _call_batch(send_batch: BatchSender, items: list[Outgoing]) -> list[Outcome]:
+    try:
+        results = send_batch(items)
+    except Exception as e:
+        results = [(False, None, f"Exception: {type(e).__name__}: {e}")] * len(items)
+    return [Outcome(item.id, item.file_id, ok, corr_id, err) for item, (ok, corr_id, err) in zip(items, results)]
+
+def _pooled(fn: Callable, args: Iterator, concurrency: int | None) -> Iterator:
+    # fn(arg) on `concurrency` threads, results as they complete, at most twice that many args queued
+    concurrency = max(1, concurrency or settings.SOAP_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="soap") as pool:
+        pending = {pool.submit(fn, arg) for arg in islice(args, concurrency * 2)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+            pending |= {pool.submit(fn, arg) for arg in islice(args, len(done))}
+
+def dispatch(items: Iterable[Outgoing], send: Sender | None = None,
+             concurrency: int | None = None) -> Iterator[Outcome]:
+    """
+    Send items on `concurrency` (SOAP_CONCURRENCY) threads and yield
+    outcomes as they complete. At most twice that many items are queued
+    ahead, so a long iterable is never materialised.
+    """
+    return _pooled(partial(_call, send or send_record_to_soap), iter(items), concurrency)
+
+def dispatch_batches(items: Iterable[Outgoing], batch_size: int | None = None,
+                     send_batch: BatchSender | None = None,
+                     concurrency: int | None = None) -> Iterator[Outcome]:
+    """
+    dispatch() for batch envelopes: items are grouped batch_size
+    (SOAP_BATCH_SIZE) at a time, each group is one send_batch call on the
+    thread pool, and every item's outcome is yielded when its group is done.
+    """
+    size = max(1, batch_size or settings.SOAP_BATCH_SIZE)
+    it = iter(items)
+    groups = iter(lambda: list(islice(it, size)), [])
+    for outcomes in _pooled(partial(_call_batch, send_batch or send_batch_to_soap), groups, concurrency):
+        yield from outcomes
+
+def write_back(s, outcomes: list[Outcome]) -> None:
+    """One bulk UPDATE (by primary key) for a batch of outcomes."""
+    if not outcomes:
+        return
+    s.execute(update(Record), [
+        {
+            "id": o.id,
+            "status": RecordStatus.PROCESSED.value if o.ok else RecordStatus.FAILED.value,
+            "soap_corr_id": o.corr_id,
+            "error_message": None if o.ok else o.error,
+        }
+        for o in outcomes
+    ])
+
+def rollup_files(s, file_ids: Iterable[int]) -> None:
+    """
+    Recompute processed_count (records finished either way) and status for
+    files: PROCESSED once every record is, FAILED if any record failed,
+    otherwise PROCESSING.
+    """
+    ids = sorted(set(file_ids))
+    if not ids:
+        return
+    counts: dict[int, dict[str, int]] = {fid: {} for fid in ids}
+    rows = s.execute(
+        select(Record.file_id, Record.status, func.count())
+        .where(Record.file_id.in_(ids))
+        .group_by(Record.file_id, Record.status)
+    )
+    for fid, status, n in rows:
+        counts[fid][status] = n
+    updates = []
+    for fid, by_status in counts.items():
+        if not by_status:
+            continue
+        processed = by_status.get(RecordStatus.PROCESSED.value, 0)
+        failed = by_status.get(RecordStatus.FAILED.value, 0)
+        if processed == sum(by_status.values()):
+            status = FileStatus.PROCESSED.value
+        elif failed:
+            status = FileStatus.FAILED.value
+        else:
+            status = FileStatus.PROCESSING.value
+        updates.append({"id": fid, "processed_count": processed + failed, "status": status})
+    if updates:
+        s.execute(update(File), updates)
+
+def _outcomes(batch: list[Outgoing], send: Sender | None, concurrency: int | None) -> Iterator[Outcome]:
+    if settings.SOAP_BATCH_SIZE > 1 and send is None:
+        return dispatch_batches(batch, concurrency=concurrency)
+    if settings.SOAP_BACKEND == "asyncio" and send is None:
+        from app.soap_async import dispatch_async
+        return dispatch_async(batch, concurrency)
+    return dispatch(batch, send, concurrency)
+
+def _flush(outcomes: list[Outcome], unsent: set[int]) -> None:
+    with session_scope() as s:
+        write_back(s, outcomes)
+        rollup_files(s, (o.file_id for o in outcomes))
+        touch_claims(s, unsent)
+
+def send_new_records(limit: int | None = None, concurrency: int | None = None,
+                     send: Sender | None = None) -> tuple[int, int]:
+    """
+    Claim and send NEW records until none are left (or `limit` were sent),
+    on the SOAP_BACKEND engine, or in SOAP_BATCH_SIZE batches; a custom
+    `send` always runs one record per call on threads.
+    concurrency overrides SOAP_CONCURRENCY / SOAP_ASYNC_INFLIGHT.
+    Returns (processed, failed).
+    """
+    with session_scope() as s:
+        reaped = release_stale_records(s, settings.SOAP_CLAIM_TIMEOUT_SECONDS)
+    if reaped:
+        log.warning("Released %d stale PROCESSING records", reaped)
+
+    start = time.perf_counter()
+    processed = failed = 0
+    while limit is None or processed + failed < limit:
+        want = settings.SOAP_CLAIM_BATCH if limit is None else min(settings.SOAP_CLAIM_BATCH, limit - processed - failed)
+        with session_scope() as s:
+            batch = claim_records(s, want)
+        if not batch:
+            break
+        log.info("Claimed %d NEW records to send", len(batch))
+        pending: list[Outcome] = []
+        unsent = {o.id for o in batch}
+        # flush at least this often so live claims never look stale
+        heartbeat = settings.SOAP_CLAIM_TIMEOUT_SECONDS / 3
+        flushed = time.monotonic()
+        for o in _outcomes(batch, send, concurrency):
+            unsent.discard(o.id)
+            if o.ok:
+                processed += 1
+            else:
+                failed += 1
+                log.warning("Record id=%s -> FAILED: %s", o.id, o.error)
+            pending.append(o)
+            if len(pending) >= settings.SOAP_WRITEBACK_BATCH or time.monotonic() - flushed >= heartbeat:
+                _flush(pending, unsent)
+                pending = []
+                flushed = time.monotonic()
+        _flush(pending, unsent)
+
+    elapsed = time.perf_counter() - start
+    total = processed + failed
+    log.info("SOAP sending complete: processed=%d failed=%d in %.2fs (%.1f records/s)",
+             processed, failed, elapsed, total / elapsed if elapsed else 0.0)
+    return processed, failed
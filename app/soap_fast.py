@@ -0,0 +1,212 @@
+# app/soap_fast.py
+"""
+Byte-level fast path for a document/literal SOAP operation.
+
+Zeep walks the WSDL binding, builds an lxml tree, serializes it and parses
+the reply back into objects on every call; against a nearby endpoint that
+CPU is comparable to the round trip. A FastCodec is derived once per Zeep
+client from the operation itself: Zeep renders the envelope with a marker
+in every field, and the bytes around the markers become the template.
+Each call then only converts (with the field's own Zeep type), escapes and
+joins the values. Replies are read by a minimal pull parser that walks
+Envelope/Body/<response>/<result> tags and returns what Zeep would.
+
+Zeep stays the validating fallback: envelope() returns None and reply()
+hands over to Zeep for anything the template does not cover (missing
+required values, nil, text lxml would refuse, faults, comments, CDATA,
+other encodings, unexpected elements), so both paths send and return the
+same thing. scripts/check_soap_parity.py checks this against the mock.
+"""
+from __future__ import annotations
+import re
+import threading
+import weakref
+from typing import Callable, NamedTuple
+from lxml import etree
+from zeep import Client
+from zeep.wsdl.utils import etree_to_string
+from zeep.xsd.types.builtins import BuiltinType
+from app.logging import get_logger
+
+log = get_logger(__name__)
+
+_MISS = object()
+# characters lxml refuses in text (Zeep raises for them, so leave those calls to Zeep)
+_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+_TAG = re.compile(
+    rb"<(/?)([A-Za-z_][\w.\-]*(?::[A-Za-z_][\w.\-]*)?)"
+    rb"(?:\s+[^\s=/>]+\s*=\s*(?:\"[^\"]*\"|'[^']*'))*\s*(/?)>"
+)
+_ENCODING = re.compile(rb"encoding\s*=\s*[\"']([^\"']+)[\"']")
+_ENTITY = re.compile(r"&(#x[0-9a-fA-F]+|#[0-9]+|amp|lt|gt|quot|apos);")
+_NAMED = {"amp": "&", "lt": "<", "gt": ">", "quot": '"', "apos": "'"}
+
+class Unsupported(Exception):
+    """The operation needs Zeep for every call."""
+
+class Field(NamedTuple):
+    name: str
+    open: bytes
+    close: bytes
+    xmlvalue: Callable[[object], str]
+    optional: bool  # None omits the element (minOccurs=0, not nillable)
+
+def _escape(text: str) -> str:
+    # what libxml2 escapes in element text
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    return text
+
+def _entity(m: re.Match) -> str:
+    ref = m.group(1)
+    if ref[0] == "#":
+        return chr(int(ref[2:], 16) if ref[1] == "x" else int(ref[1:]))
+    return _NAMED[ref]
+
+class FastCodec:
+    """Envelope template and reply reader for one operation of a Zeep client."""
+    def __init__(self, client: Client, operation: str):
+        self.client = client
+        self.binding = client.service._binding
+        self.operation = self.binding.get(operation)
+        if self.operation is None:
+            raise Unsupported(f"no operation {operation!r}")
+        op = self.operation
+        if client.wsse or client.plugins:
+            raise Unsupported("WS-Security/plugins rewrite every envelope")
+        if op.abstract.wsa_action:
+            raise Unsupported("WS-Addressing headers differ per call")
+        if op.style != "document" or op.input.body is None or op.output.body is None:
+            raise Unsupported("not a document/literal operation")
+        if op.input.header.type.elements or op.output.header.type.elements:
+            raise Unsupported("SOAP headers")
+        self.address = client.service._binding_options["address"]
+        self.fields, self.prefix, self.suffix, self.headers = self._template(operation)
+        self.names = {f.name for f in self.fields}
+        outputs = op.output.body.type.elements
+        if len(outputs) != 1 or not isinstance(outputs[0][1].type, BuiltinType) or outputs[0][1].max_occurs != 1:
+            raise Unsupported("reply is not a single simple element")
+        self.result_type = outputs[0][1].type
+        self.path = tuple(etree.QName(q).localname.encode() for q in (
+            f"{{{self.binding.nsmap['soap-env']}}}Envelope", f"{{{self.binding.nsmap['soap-env']}}}Body",
+            op.output.body.qname, outputs[0][1].qname))
+
+    def _template(self, operation: str) -> tuple[list[Field], bytes, bytes, dict[str, str]]:
+        elements = self.operation.input.body.type.elements
+        markers = {name: f"\ue000{i}\ue001" for i, (name, _) in enumerate(elements)}
+        for name, el in elements:
+            if not isinstance(el.type, BuiltinType) or el.max_occurs != 1 or el.type.xmlvalue(markers[name]) != markers[name]:
+                raise Unsupported(f"field {name!r} is not a plain simple value")
+        envelope, headers = self.binding._create(operation, (), markers, client=self.client,
+                                                 options=self.client.service._binding_options)
+        raw = etree_to_string(envelope)
+        fields, first, last = [], None, None
+        for name, el in elements:
+            mark = markers[name].encode()
+            pos = raw.find(mark)
+            if pos < 0 or raw.count(mark) != 1:
+                raise Unsupported(f"field {name!r} does not render once")
+            start, end = raw.rfind(b"<", 0, pos), raw.find(b">", pos) + 1
+            if last is not None and start != last or not raw.startswith(b"</", pos + len(mark)):
+                raise Unsupported(f"field {name!r} is not a plain child element")
+            fields.append(Field(name, raw[start:pos], raw[pos + len(mark):end], el.type.xmlvalue,
+                                el.min_occurs == 0 and not el.nillable))
+            if first is None:
+                first = start
+            last = end
+        if not fields:
+            raise Unsupported("no input fields")
+        return fields, raw[:first], raw[last:], dict(headers)
+
+    def envelope(self, values: dict) -> bytes | None:
+        """The request body Zeep would send for these keyword arguments, or None to let Zeep build it."""
+        if not self.names.issuperset(values):
+            return None
+        parts = [self.prefix]
+        for f in self.fields:
+            value = values.get(f.name)
+            if value is None:
+                if not f.optional:
+                    return None
+                continue
+            text = f.xmlvalue(value)
+            if _INVALID.search(text):
+                return None
+            parts += (f.open, _escape(text).encode("utf-8"), f.close)
+        if len(parts) == 1:
+            return None  # Zeep self-closes an empty request element
+        parts.append(self.suffix)
+        return b"".join(parts)
+
+    def reply(self, response):
+        """What Zeep's process_reply returns for response (requests-like: status_code, headers, content)."""
+        if response.status_code == 200 and "multipart" not in response.headers.get("Content-Type", ""):
+            value = self._pull(response.content)
+            if value is not _MISS:
+                return value
+        return self.binding.process_reply(self.client, self.operation, response)
+
+    def _pull(self, content: bytes):
+        if content.startswith(b"\xef\xbb\xbf"):
+            content = content[3:]
+        pos = 0
+        if content.startswith(b"<?xml"):
+            pos = content.find(b"?>") + 2
+            m = _ENCODING.search(content, 0, pos)
+            if pos < 2 or m and m.group(1).lower() not in (b"utf-8", b"utf8"):
+                return _MISS
+        depth = 0
+        while (i := content.find(b"<", pos)) >= 0:
+            m = _TAG.match(content, i)
+            if m is None:
+                return _MISS  # comment, CDATA, PI or DOCTYPE
+            closing, qname, empty = m.groups()
+            if closing or qname.rpartition(b":")[2] != self.path[depth]:
+                return _MISS  # a Fault, a Header, or no result: Zeep decides
+            pos = m.end()
+            if depth == len(self.path) - 1:
+                if empty:
+                    return None
+                j = content.find(b"<", pos)
+                end = _TAG.match(content, j) if j >= 0 else None
+                if end is None or not end.group(1) or end.group(2) != qname:
+                    return _MISS
+                return self._value(content[pos:j])
+            if empty:
+                return _MISS
+            depth += 1
+        return _MISS
+
+    def _value(self, raw: bytes):
+        if b"\r" in raw:
+            return _MISS  # parsers normalise line ends
+        try:
+            text = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            return _MISS
+        if "&" in text:
+            text, n = _ENTITY.subn(_entity, text)
+            if n != raw.count(b"&"):
+                return _MISS
+        return self.result_type.pythonvalue(text) if text else None
+
+_CODECS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_LOCK = threading.Lock()
+
+def codec_for(client: Client, operation: str) -> FastCodec | None:
+    """The FastCodec of client's operation (built once per client), or None where only Zeep will do."""
+    with _LOCK:
+        per_client = _CODECS.setdefault(client, {})
+        if operation not in per_client:
+            try:
+                per_client[operation] = FastCodec(client, operation)
+            except Unsupported as e:
+                log.info("SOAP fast path off for %s: %s", operation, e)
+                per_client[operation] = None
+        return per_client[operation]
@@ -0,0 +1,284 @@
+# app/sync.py
+"""
+Listing checkpoints and set-based helpers shared by
+app.pipeline.sync_from_azure and scripts/sync_from_azure.sync_once.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Iterable, Iterator, Mapping, Sequence, TypeVar
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from app.azure_rest import BlobItem, ListCursor, list_blobs
+from app import content_store
+from app.config import settings
+from app.db import session_scope
+from app.downloader import DownloadResult, PriorVersion
+from app.logging import get_logger
+from app.models import File, FileStatus, SyncState
+from app.parsing import ingest_file_data
+
+log = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Azure returns at most 5000 blobs per List Blobs page
+PAGE_SIZE = 5000
+# downloads recorded per transaction; bounds how many in-memory bodies are held at once
+RECORD_BATCH = 100
+
+def chunked(items: Iterable[T], size: int = PAGE_SIZE) -> Iterator[list[T]]:
+    """Yield lists of up to `size` items without materialising the whole iterable."""
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def unseen_blobs(s, items: Sequence[BlobItem]) -> list[BlobItem]:
+    """
+    Return the items whose (blob_name, etag) is not in `files` yet, using one
+    round trip per page: WHERE (blob_name, etag) IN (...) against uq_blob_etag.
+    Duplicates within the page are dropped as well.
+    """
+    if not items:
+        return []
+    keys = {(i.name, i.etag) for i in items}
+    seen = set(s.execute(
+        select(File.blob_name, File.etag).where(tuple_(File.blob_name, File.etag).in_(list(keys)))
+    ).tuples())
+    out = []
+    for item in items:
+        key = (item.name, item.etag)
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(item)
+    return out
+
+def _insert(s):
+    if s.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(File)
+    return postgresql.insert(File)
+
+def insert_files(s, rows: Sequence[dict]) -> dict[tuple[str, str], int]:
+    """
+    Bulk insert File rows with ON CONFLICT (blob_name, etag) DO NOTHING.
+    Returns {(blob_name, etag): id} for the rows actually inserted; rows
+    another worker inserted first are skipped silently instead of aborting
+    the transaction.
+    """
+    if not rows:
+        return {}
+    stmt = (
+        _insert(s)
+        .values(list(rows))
+        .on_conflict_do_nothing(index_elements=[File.blob_name, File.etag])
+        .returning(File.id, File.blob_name, File.etag)
+    )
+    return {(name, etag): fid for fid, name, etag in s.execute(stmt).tuples()}
+
+def prior_versions(s, items: Sequence[BlobItem]) -> dict[str, PriorVersion]:
+    """
+    Latest stored version (etag, content_md5, local_path) of each listed blob
+    name that is already in `files`, for conditional If-None-Match downloads.
+    """
+    names = list({i.name for i in items})
+    if not names:
+        return {}
+    latest = (
+        select(func.max(File.id))
+        .where(File.blob_name.in_(names), File.content_md5.is_not(None), File.local_path.is_not(None))
+        .group_by(File.blob_name)
+    )
+    rows = s.execute(
+        select(File.blob_name, File.etag, File.content_md5, File.local_path).where(File.id.in_(latest))
+    ).tuples()
+    return {name: PriorVersion(etag, md5, path) for name, etag, md5, path in rows}
+
+def _originals(s, md5s: set[str]) -> dict[str, tuple[int, str | None]]:
+    # first non-duplicate, non-failed File per payload MD5
+    if not md5s:
+        return {}
+    rows = s.execute(
+        select(File.content_md5, File.id, File.local_path)
+        .where(
+            File.content_md5.in_(list(md5s)),
+            File.duplicate_of_id.is_(None),
+            File.status != FileStatus.FAILED.value,
+        )
+        .order_by(File.id)
+    ).tuples()
+    out: dict[str, tuple[int, str | None]] = {}
+    for md5, fid, path in rows:
+        out.setdefault(md5, (fid, path))
+    return out
+
+def _row(r: DownloadResult, path: str | None, original: tuple[int, str | None] | None = None,
+         control: DownloadResult | None = None) -> dict:
+    row = {
+        "blob_name": r.blob_name,
+        "etag": r.etag,
+        "local_path": path,
+        "content_md5": r.content_md5,
+        "status": FileStatus.NEW.value,
+        "duplicate_of_id": None,
+        "control_blob_name": control.blob_name if control else None,
+        "control_etag": control.etag if control else None,
+        "control_path": control.local_path if control else None,
+    }
+    if original is not None:
+        row.update(status=FileStatus.DUPLICATE.value, duplicate_of_id=original[0],
+                   local_path=path or original[1])
+    return row
+
+def record_downloads(s, results: Sequence[DownloadResult],
+                     controls: Mapping[str, DownloadResult] | None = None) -> dict[tuple[str, str], int]:
+    """
+    Insert File rows for landed downloads. A payload whose MD5 is already
+    held by another File (an ETag-only change, or the same bytes under another
+    name) is inserted as DUPLICATE linked via duplicate_of_id and is never
+    parsed, so it adds no Record rows or SOAP calls. Results spooled in memory
+    (disk-free ingest) are decoded into Record rows in the same transaction;
+    with INGEST_KEEP_LOCAL_COPY the body is also written to the content store.
+    `controls` maps a .pb blob name to its landed control file (pair mode).
+    Closes every result body. Returns {(blob_name, etag): id} for new rows.
+    """
+    controls = controls or {}
+    try:
+        originals = _originals(s, {r.content_md5 for r in results if r.content_md5})
+        first: list[DownloadResult] = []
+        repeats: list[DownloadResult] = []
+        rows = []
+        claimed: set[str] = set()
+        for r in results:
+            md5 = r.content_md5
+            if md5 in originals:
+                rows.append(_row(r, r.local_path, originals[md5], controls.get(r.blob_name)))
+            elif md5 and md5 in claimed:
+                repeats.append(r)  # same bytes earlier in this batch; linked below
+            else:
+                if md5:
+                    claimed.add(md5)
+                path = r.local_path
+                if r.body is not None and settings.INGEST_KEEP_LOCAL_COPY and md5:
+                    path = content_store.put_stream(r.body, md5)
+                rows.append(_row(r, path, control=controls.get(r.blob_name)))
+                first.append(r)
+        ids = insert_files(s, rows)
+
+        for r in first:
+            fid = ids.get((r.blob_name, r.etag))
+            if fid is not None and r.content_md5:
+                originals.setdefault(r.content_md5, (fid, r.local_path))
+        # a repeat whose first copy lost an insert race has no original; it goes in as NEW
+        first.extend(r for r in repeats if r.content_md5 not in originals)
+        ids.update(insert_files(s, [
+            _row(r, r.local_path, originals.get(r.content_md5), controls.get(r.blob_name)) for r in repeats
+        ]))
+        dupes = len(results) - len(first)
+        if dupes:
+            log.info("%d of %d downloads duplicate stored content; linked without parsing", dupes, len(results))
+
+        for r in first:
+            fid = ids.get((r.blob_name, r.etag))
+            if r.body is None or fid is None:
+                continue
+            ingest_file_data(s, s.get(File, fid), r.body.read())
+    finally:
+        for r in results:
+            if r.body is not None:
+                r.body.close()
+    return ids
+
+def _utc(dt: datetime | None) -> datetime | None:
+    # timestamptz comes back aware from Postgres; treat naive values as UTC
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+class IncrementalListing:
+    """
+    One tick's walk of the container, driven by the persisted SyncState row
+    for (container, prefix).
+
+    Incremental ticks resume from the marker of the last page seen and skip
+    blobs whose Last-Modified is older than the watermark, so a quiet
+    container costs a single List Blobs call. Every SYNC_FULL_SWEEP_SECONDS
+    a full sweep lists from the start without the watermark filter to catch
+    stragglers (names sorting before the marker, downloads that failed).
+
+    Iterate it like list_blobs(), report failed downloads with failed(), and
+    call save() once the tick's work is durable.
+    """
+    def __init__(self, prefix: str | None = None, container: str | None = None):
+        self.container = container or settings.AZURE_CONTAINER
+        self.prefix = prefix if prefix is not None else (settings.SYNC_PREFIX or "")
+        self.cursor = ListCursor()
+        self.started_at = datetime.now(timezone.utc)
+        self.complete = False
+        self._max_seen: datetime | None = None
+        self._min_failed: datetime | None = None
+
+        with session_scope() as s:
+            st = self._state(s)
+            self.marker = st.marker if st else None
+            self.watermark = _utc(st.watermark) if st else None
+            last_full = _utc(st.last_full_sweep_at) if st else None
+
+        self.full_sweep = (
+            last_full is None
+            or (self.started_at - last_full).total_seconds() >= settings.SYNC_FULL_SWEEP_SECONDS
+        )
+        if self.full_sweep:
+            self.marker = None
+        log.info(
+            "Listing container=%s prefix=%r mode=%s marker=%s watermark=%s",
+            self.container, self.prefix, "full" if self.full_sweep else "incremental",
+            self.marker, self.watermark,
+        )
+
+    def _state(self, s) -> SyncState | None:
+        return s.query(SyncState).filter(
+            SyncState.container == self.container,
+            SyncState.prefix == self.prefix,
+        ).one_or_none()
+
+    def __iter__(self) -> Iterator[BlobItem]:
+        listed = skipped = 0
+        for item in list_blobs(prefix=self.prefix or None, marker=self.marker, cursor=self.cursor):
+            listed += 1
+            lm = item.last_modified
+            if lm is not None and (self._max_seen is None or lm > self._max_seen):
+                self._max_seen = lm
+            if not self.full_sweep and lm is not None and self.watermark is not None and lm < self.watermark:
+                skipped += 1
+                continue
+            yield item
+        self.complete = True
+        log.info("Listed %d blobs in %d page(s), %d older than watermark", listed, self.cursor.pages, skipped)
+
+    def failed(self, items: Iterable[BlobItem]) -> None:
+        """Hold the watermark below blobs that could not be ingested so the next tick retries them."""
+        for item in items:
+            lm = item.last_modified
+            if lm is not None and (self._min_failed is None or lm < self._min_failed):
+                self._min_failed = lm
+
+    def save(self) -> None:
+        """Persist marker/watermark; a listing that did not run to the end is not checkpointed."""
+        if not self.complete:
+            return
+        watermark = self._max_seen or self.watermark
+        if self._min_failed is not None:
+            watermark = self._min_failed - timedelta(microseconds=1)
+        with session_scope() as s:
+            st = self._state(s)
+            if st is None:
+                st = SyncState(container=self.container, prefix=self.prefix)
+                s.add(st)
+            st.marker = self.cursor.page_marker
+            st.watermark = watermark
+            if self.full_sweep:
+                st.last_full_sweep_at = self.started_at
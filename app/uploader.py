@@ -0,0 +1,125 @@
+# app/uploader.py
+from __future__ import annotations
+import base64
+import contextlib
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, NamedTuple
+from app.azure_rest import get_blob_properties, put_blob, put_block, put_block_list
+from app.config import settings
+from app.logging import get_logger
+
+log = get_logger(__name__)
+
+class UploadResult(NamedTuple):
+    path: str
+    blob_name: str
+    status: str  # "uploaded" | "skipped" | "failed"
+    size: int = 0
+    error: str | None = None
+    elapsed: float = 0.0
+
+def file_md5(path: str) -> str:
+    """Base64 MD5 of a file (the Content-MD5 form), read in UPLOAD_BLOCK_BYTES pieces."""
+    md5 = hashlib.md5()
+    with open(path, "rb") as fh:
+        while True:
+            chunk = fh.read(settings.UPLOAD_BLOCK_BYTES)
+            if not chunk:
+                break
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode()
+
+def _block_id(index: int) -> str:
+    # ids must be equal length within a blob
+    return base64.b64encode(f"{index:08d}".encode()).decode()
+
+def _upload_blocks(path: str, blob_name: str, content_type: str,
+                   pool: ThreadPoolExecutor, budget: threading.BoundedSemaphore) -> None:
+    md5 = hashlib.md5()
+    block_ids: list[str] = []
+    futures = []
+    with open(path, "rb") as fh:
+        while True:
+            # every block read from disk holds one budget permit until its Put Block returns
+            budget.acquire()
+            data = fh.read(settings.UPLOAD_BLOCK_BYTES)
+            if not data:
+                budget.release()
+                break
+            md5.update(data)
+            bid = _block_id(len(block_ids))
+            fut = pool.submit(put_block, blob_name, bid, data)
+            fut.add_done_callback(lambda _f: budget.release())
+            block_ids.append(bid)
+            futures.append(fut)
+            failed = next((f for f in futures if f.done() and f.exception()), None)
+            if failed is not None:
+                break
+    for fut in futures:
+        fut.result()
+    put_block_list(blob_name, block_ids, content_type, base64.b64encode(md5.digest()).decode())
+
+def upload_file(path: str, blob_name: str | None = None,
+                block_pool: ThreadPoolExecutor | None = None,
+                budget: threading.BoundedSemaphore | None = None) -> UploadResult:
+    """
+    Upload one file as a block blob and return an UploadResult (never raises).
+
+    Skips the upload when the remote blob already has the same size and
+    Content-MD5. Files up to one block go up in a single Put Blob; larger
+    files are streamed from disk as Put Block requests on `block_pool` and
+    committed with Put Block List, with at most `budget` blocks in memory
+    (a single Put Blob holds one permit of it too).
+    The blob's Content-MD5 is always set so later runs can skip it.
+    """
+    blob_name = blob_name or os.path.basename(path)
+    start = time.perf_counter()
+    size = 0
+    try:
+        size = os.path.getsize(path)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        props = get_blob_properties(blob_name)
+        if props and props.get("Content-MD5") and props.get("Content-Length") == str(size):
+            if file_md5(path) == props["Content-MD5"]:
+                return UploadResult(path, blob_name, "skipped", size, None, time.perf_counter() - start)
+
+        if size <= settings.UPLOAD_BLOCK_BYTES:
+            # a whole small file is one block of the shared budget while it is sent
+            with budget if budget is not None else contextlib.nullcontext():
+                with open(path, "rb") as fh:
+                    data = fh.read()
+                put_blob(blob_name, data, content_type, base64.b64encode(hashlib.md5(data).digest()).decode())
+                del data
+        elif block_pool is not None and budget is not None:
+            _upload_blocks(path, blob_name, content_type, block_pool, budget)
+        else:
+            with ThreadPoolExecutor(max_workers=settings.UPLOAD_BLOCK_WORKERS, thread_name_prefix="blob-up") as pool:
+                _upload_blocks(path, blob_name, content_type, pool, _new_budget())
+    except Exception as e:
+        return UploadResult(path, blob_name, "failed", size, f"{type(e).__name__}: {e}", time.perf_counter() - start)
+    return UploadResult(path, blob_name, "uploaded", size, None, time.perf_counter() - start)
+
+def _new_budget() -> threading.BoundedSemaphore:
+    return threading.BoundedSemaphore(max(1, settings.UPLOAD_MEMORY_BYTES // settings.UPLOAD_BLOCK_BYTES))
+
+def upload_many(paths: Iterable[str], workers: int | None = None) -> Iterator[UploadResult]:
+    """
+    Upload files concurrently: UPLOAD_WORKERS files at a time, sharing one
+    pool of UPLOAD_BLOCK_WORKERS Put Block threads and one memory budget of
+    UPLOAD_MEMORY_BYTES. Yields an UploadResult per file as it finishes.
+    """
+    workers = max(1, workers or settings.UPLOAD_WORKERS)
+    budget = _new_budget()
+    with ThreadPoolExecutor(max_workers=settings.UPLOAD_BLOCK_WORKERS, thread_name_prefix="blob-up") as block_pool, \
+         ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-up") as file_pool:
+        futures = [file_pool.submit(upload_file, str(p), None, block_pool, budget) for p in paths]
+        for fut in as_completed(futures):
+            res = fut.result()
+            if res.status == "failed":
+                log.warning("Upload failed for %s: %s", res.path, res.error)
+            yield res
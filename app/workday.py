@@ -0,0 +1,135 @@
+# app/workday.py
+"""
+Workday Customer_Invoice payloads built from decoded bill messages.
+
+The mapping reads about a dozen paths through app.projection, straight off
+the message. The old pipeline pretty-printed the bill to .json, reloaded it
+and walked the dict; that JSON is now only written when PB_DEBUG_JSON is set.
+Parsed JSON dicts are still accepted and map to the same payload.
+"""
+from __future__ import annotations
+from datetime import datetime
+from typing import Any, Mapping, Optional
+from google.protobuf.message import Message
+from app.config import settings
+from app.logging import get_logger
+from app.pb_sniff import RootSniffer, decode_roots
+from app.pb_stream import mapped
+from app.projection import Projection, write_debug_json
+
+log = get_logger(__name__)
+
+_LINE = "parProdBlock.parprodrecurBlock"
+WORKDAY_PATHS = {
+    "customer_id": "customerRef",
+    "currency_id": "accCurrencyCode",
+    "invoice_date": "invoiceActualDate",
+    "desc": "parProdBlock.parprodtariffdescription",
+    "revenue_category": "parProdBlock.parprodlabel",
+    "from_date": f"{_LINE}.parprodrecurfromdate",
+    "to_date": f"{_LINE}.parprodrecurtodate",
+    "qty": f"{_LINE}.parprodrectable.records.QTY",
+    "qty2": f"{_LINE}.parprodrectable.records.QTY_2",
+    "unit_cost": f"{_LINE}.parprodrectable.records.UNITRATE",
+    "ext_amt": f"{_LINE}.parprodrectotal.amount",
+    "tax_code": f"{_LINE}.parprodrectable.records.TAX_CODE_ID",
+}
+_PROJECTION = Projection(WORKDAY_PATHS)
+
+Result = tuple[Optional[dict[str, Any]], list[str], list[str]]
+
+def _norm_date(value: Optional[str]) -> Optional[str]:
+    """YYYY-MM-DD from 'YYYY-MM-DD', 'YYYY-MM-DDTHH:MM:SS' or 'YYYY/MM/DD'; other text is returned as is."""
+    if not value:
+        return None
+    v = value.strip()
+    if len(v) >= 10 and v[4] == "-" and v[7] == "-":
+        return v[:10]
+    for fmt in ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(v, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return v
+
+def _ref(id_type: str, value: Any) -> dict:
+    return {"ID": {"_type": id_type, "_value_1": value}}
+
+def build_workday_payload(bill: Message | Mapping[str, Any]) -> Result:
+    """
+    (payload, warnings, errors) for one bill, given as a decoded message or
+    its parsed JSON. Builds a single invoice line from parProdBlock; payload
+    is None when a required header field is missing.
+    """
+    v = _PROJECTION(bill)
+    warnings: list[str] = []
+    errors: list[str] = []
+
+    customer_id, currency_id = v["customer_id"], v["currency_id"]
+    invoice_date = _norm_date(v["invoice_date"])
+    if not settings.WORKDAY_COMPANY_ID:
+        errors.append("Missing WORKDAY_COMPANY_ID setting.")
+    if not customer_id:
+        errors.append("Missing required 'customerRef' for Customer.")
+    if not currency_id:
+        errors.append("Missing required 'accCurrencyCode' for Currency.")
+    if not invoice_date:
+        errors.append("Missing required 'invoiceActualDate' for Invoice Date.")
+
+    from_date, to_date = _norm_date(v["from_date"]), _norm_date(v["to_date"])
+    if not v["desc"]:
+        warnings.append("Line: missing description.")
+    if v["qty"] is None:
+        warnings.append("Line: missing Quantity.")
+    if v["unit_cost"] is None:
+        warnings.append("Line: missing Unit Cost.")
+    if not from_date or not to_date:
+        warnings.append("Line: missing period start/end dates.")
+    if errors:
+        return None, warnings, errors
+
+    line: dict[str, Any] = {
+        "Line_Item_Description": v["desc"],
+        "Quantity": v["qty"],
+        "Unit_Cost": v["unit_cost"],
+    }
+    if v["qty2"] is not None:
+        line["Quantity_2"] = v["qty2"]
+    if v["ext_amt"] is not None:
+        line["Extended_Amount"] = v["ext_amt"]
+    if from_date:
+        line["From_Date"] = from_date
+    if to_date:
+        line["To_Date"] = to_date
+    if v["revenue_category"]:
+        line["Revenue_Category_Reference"] = _ref("Revenue_Category_ID", v["revenue_category"])
+    if v["tax_code"]:
+        line["Tax_Code_Reference"] = _ref("Tax_Code_ID", v["tax_code"])
+
+    payload = {
+        "Customer_Invoice_Data": {
+            "Company_Reference": _ref("Company_Reference_ID", settings.WORKDAY_COMPANY_ID),
+            "Customer_Reference": _ref("Customer_Reference_ID", customer_id),
+            "Currency_Reference": _ref("Currency_ID", currency_id),
+            "Invoice_Date": invoice_date,
+            "Customer_Invoice_Line_Replacement_Data": [line],
+        },
+        "Business_Process_Parameters": {"Auto_Complete": True},
+    }
+    return payload, warnings, errors
+
+def payloads_from_pb(path: str, sniffer: RootSniffer, debug_json: bool | None = None) -> list[Result]:
+    """
+    build_workday_payload() for every root message in a .pb file (one, or one
+    per delimited frame). The root type comes from sniffer and the file is
+    decoded once. Raises DecodeError on a malformed file.
+    """
+    with mapped(path) as buf:
+        found = sniffer.detect(path, buf)
+        roots = decode_roots(buf, found)
+    if settings.PB_DEBUG_JSON if debug_json is None else debug_json:
+        write_debug_json(roots, path)
+    results = [build_workday_payload(r) for r in roots]
+    log.info("Mapped %s (%s, %d root%s) → %d payload(s)", path, found.name, len(roots),
+             "" if len(roots) == 1 else "s", sum(p is not None for p, _, _ in results))
+    return results
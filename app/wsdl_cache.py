@@ -0,0 +1,271 @@
+# app/wsdl_cache.py
+"""
+On-disk cache of the SOAP WSDL: its documents and the compiled Zeep client.
+
+Without it every process fetches the WSDL and each imported XSD and compiles
+them before its first call, which takes seconds for a large WSDL and needs
+the WSDL host to be up. Under WSDL_CACHE_DIR:
+
+  docs/<sha256(url)>.xml/.json       each fetched document, with its URL,
+                                     fetch time and content sha256
+  compiled/<sha256(url)>.pickle/.json
+                                     the compiled Client, with the sha256 of
+                                     every document it was built from
+
+Within WSDL_CACHE_TTL_SECONDS of the last check the pickled client is loaded
+without touching the network. After that its documents are fetched again:
+while their hashes are unchanged the pickle is kept, otherwise the WSDL is
+recompiled and pickled again. If the host is unreachable, expired documents
+and the last compiled client are used with a warning. invalidate() (or
+python -m scripts.wsdl_cache clear) drops entries by hand.
+
+The pickles are only read from this directory, which must not be writable by
+anyone the service does not trust.
+"""
+from __future__ import annotations
+import hashlib
+import io
+import json
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+import requests
+import zeep
+from lxml import etree
+from zeep import Client, Settings
+from zeep.cache import Base
+from zeep.transports import Transport
+from app.config import settings
+from app.logging import get_logger
+
+log = get_logger(__name__)
+
+CACHE_FORMAT = 1
+# modules of the classes Zeep generates while compiling a schema
+_DYNAMIC_MODULES = ("zeep.xsd.dynamic_types", "zeep.objects")
+
+def _key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+def _versions() -> dict:
+    return {"format": CACHE_FORMAT, "zeep": zeep.__version__, "lxml": etree.__version__,
+            "python": f"{sys.version_info.major}.{sys.version_info.minor}"}
+
+def _write(path: Path, data: bytes) -> None:
+    # atomic, so concurrent workers never read a torn file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def _read_json(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+class DocumentCache(Base):
+    """Zeep cache backend (add/get) of fetched documents; entries older than ttl miss unless stale_ok."""
+    def __init__(self, directory: str | Path, ttl: float):
+        self.dir = Path(directory) / "docs"
+        self.ttl = ttl
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = _key(url)
+        return self.dir / f"{key}.xml", self.dir / f"{key}.json"
+
+    def add(self, url: str, content: bytes) -> None:
+        doc, meta = self._paths(url)
+        _write(doc, content)
+        _write(meta, json.dumps({"url": url, "fetched": time.time(), "sha256": _digest(content)}).encode())
+
+    def get(self, url: str, stale_ok: bool = False) -> bytes | None:
+        doc, meta = self._paths(url)
+        info = _read_json(meta)
+        if info is None or info.get("url") != url:
+            return None
+        if not stale_ok and time.time() - info["fetched"] > self.ttl:
+            return None
+        try:
+            content = doc.read_bytes()
+        except OSError:
+            return None
+        return content if _digest(content) == info["sha256"] else None
+
+    def remove(self, url: str) -> None:
+        for path in self._paths(url):
+            path.unlink(missing_ok=True)
+
+class CachingTransport(Transport):
+    """
+    Transport loading WSDL/XSD documents through a DocumentCache. Records the
+    sha256 of everything it loads and falls back to expired copies when the
+    host cannot be reached.
+    """
+    def __init__(self, cache: DocumentCache, **kwargs):
+        super().__init__(cache=cache, **kwargs)
+        self.loaded: dict[str, str] = {}
+
+    def _stale(self, url: str, exc: Exception) -> bytes:
+        content = self.cache.get(url, stale_ok=True)
+        if content is None:
+            raise exc
+        log.warning("Could not fetch %s (%s); using the expired cached copy", url, exc)
+        return content
+
+    def load(self, url):
+        try:
+            content = super().load(url)
+        except requests.RequestException as e:
+            content = self._stale(url, e)
+        self.loaded[url] = _digest(content)
+        return content
+
+    def fetch(self, url: str) -> str:
+        """Fetch url past the TTL, store it, and return its sha256."""
+        if urlparse(url).scheme not in ("http", "https", "file"):
+            return _digest(super().load(url))  # local paths are never cached
+        try:
+            content = self._load_remote_data(url)
+        except requests.RequestException as e:
+            return _digest(self._stale(url, e))
+        self.cache.add(url, content)
+        return _digest(content)
+
+def _element(xml: bytes):
+    return etree.fromstring(xml)
+
+def _dynamic_class(name: str, bases: tuple, namespace: dict) -> type:
+    return type(name, bases, namespace)
+
+class _Pickler(pickle.Pickler):
+    """Pickles a Client minus its transport and settings, rebuilding lxml values and Zeep's generated classes."""
+    def __init__(self, file, client: Client):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shared = {id(client.transport): "transport", id(client.settings): "settings"}
+
+    def persistent_id(self, obj):
+        return self.shared.get(id(obj))
+
+    def reducer_override(self, obj):
+        if isinstance(obj, etree.QName):
+            return etree.QName, (obj.text,)
+        if isinstance(obj, etree._Element):
+            return _element, (etree.tostring(obj),)
+        if isinstance(obj, type) and obj.__module__ in _DYNAMIC_MODULES:
+            namespace = {k: v for k, v in vars(obj).items() if k not in ("__dict__", "__weakref__")}
+            return _dynamic_class, (obj.__name__, obj.__bases__, namespace)
+        return NotImplemented
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, transport: Transport, zeep_settings: Settings):
+        super().__init__(file)
+        self.shared = {"transport": transport, "settings": zeep_settings}
+
+    def persistent_load(self, pid):
+        return self.shared[pid]
+
+class WsdlCache:
+    """Documents and compiled clients under directory, re-validated every ttl seconds."""
+    def __init__(self, directory: str | Path, ttl: float):
+        self.root = Path(directory)
+        self.ttl = ttl
+        self.documents = DocumentCache(self.root, ttl)
+
+    def transport(self, **kwargs) -> CachingTransport:
+        return CachingTransport(self.documents, **kwargs)
+
+    def _compiled(self, url: str) -> tuple[Path, Path]:
+        key = _key(url)
+        return self.root / "compiled" / f"{key}.pickle", self.root / "compiled" / f"{key}.json"
+
+    def client(self, url: str, transport: CachingTransport, zeep_settings: Settings | None = None) -> Client:
+        """A Client for the WSDL at url on transport: the cached compiled one while still valid, else a fresh compile."""
+        zeep_settings = zeep_settings or Settings()
+        data_path, meta_path = self._compiled(url)
+        meta = _read_json(meta_path)
+        if meta and (meta.get("url") != url or meta.get("versions") != _versions()):
+            meta = None
+        if meta:
+            valid = time.time() - meta["checked"] <= self.ttl
+            if not valid:
+                valid = self._unchanged(meta["documents"], transport)
+                meta["checked"] = time.time()
+                _write(meta_path, json.dumps(meta).encode())
+            if valid and (client := self._load(data_path, meta, transport, zeep_settings)) is not None:
+                return client
+
+        start = time.perf_counter()
+        try:
+            client = Client(wsdl=url, transport=transport, settings=zeep_settings)
+        except Exception as e:
+            if meta and (client := self._load(data_path, meta, transport, zeep_settings)) is not None:
+                log.warning("Could not compile WSDL %s (%s); using the cached client", url, e)
+                return client
+            raise
+        log.info("Compiled WSDL %s (%d documents) in %.0f ms", url, len(transport.loaded),
+                 (time.perf_counter() - start) * 1000)
+        self._save(url, client, dict(transport.loaded))
+        return client
+
+    def _unchanged(self, documents: dict[str, str], transport: CachingTransport) -> bool:
+        try:
+            return all(transport.fetch(doc) == digest for doc, digest in documents.items())
+        except (requests.RequestException, OSError) as e:
+            log.warning("Could not re-validate cached WSDL documents: %s", e)
+            return False
+
+    def _load(self, data_path: Path, meta: dict, transport: Transport, zeep_settings: Settings) -> Client | None:
+        start = time.perf_counter()
+        try:
+            data = data_path.read_bytes()
+            if _digest(data) != meta["sha256"]:
+                return None
+            client = _Unpickler(io.BytesIO(data), transport, zeep_settings).load()
+        except Exception as e:
+            log.warning("Ignoring unreadable compiled WSDL %s: %s", data_path, e)
+            return None
+        log.info("Loaded compiled WSDL %s from cache in %.0f ms", meta["url"], (time.perf_counter() - start) * 1000)
+        return client
+
+    def _save(self, url: str, client: Client, documents: dict[str, str]) -> None:
+        buf = io.BytesIO()
+        try:
+            _Pickler(buf, client).dump(client)
+        except (pickle.PicklingError, TypeError, AttributeError, RecursionError) as e:
+            log.warning("Compiled WSDL %s cannot be cached: %s", url, e)
+            return
+        data = buf.getvalue()
+        data_path, meta_path = self._compiled(url)
+        _write(data_path, data)
+        _write(meta_path, json.dumps({
+            "url": url, "checked": time.time(), "sha256": _digest(data),
+            "documents": documents, "versions": _versions(),
+        }).encode())
+
+    def invalidate(self, url: str | None = None) -> None:
+        """Drop the cached WSDL at url (its compiled client and every document it loaded), or everything."""
+        if url is None:
+            for sub in ("docs", "compiled"):
+                shutil.rmtree(self.root / sub, ignore_errors=True)
+            return
+        data_path, meta_path = self._compiled(url)
+        meta = _read_json(meta_path) or {}
+        for doc in {url, *meta.get("documents", ())}:
+            self.documents.remove(doc)
+        data_path.unlink(missing_ok=True)
+        meta_path.unlink(missing_ok=True)
+
+def wsdl_cache() -> WsdlCache | None:
+    """The cache configured by WSDL_CACHE_DIR / WSDL_CACHE_TTL_SECONDS, or None when WSDL_CACHE_DIR is empty."""
+    if not settings.WSDL_CACHE_DIR:
+        return None
+    return WsdlCache(settings.WSDL_CACHE_DIR, settings.WSDL_CACHE_TTL_SECONDS)
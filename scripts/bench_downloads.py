@@ -0,0 +1,67 @@
+# scripts/bench_downloads.py
+"""
+Benchmark the parallel blob download engine against the local blob stand-in
+(app.mock_blob_server). Seeds N synthetic .pb blobs, lists them through
+app.azure_rest and reports files/sec at 1, 4, 16 and 64 workers.
+Run: python -m scripts.bench_downloads [n_files] [size_bytes] [latency_ms] [bandwidth_Bps] [error_rate]
+"""
+import logging
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+
+from app import azure_rest
+from app.config import settings
+from app.azure_rest import list_blobs
+from app.downloader import download_many
+from app.mock_blob_server import make_server
+
+WORKER_COUNTS = (1, 4, 16, 64)
+
+def main(n_files: int = 256, size: int = 64 * 1024, latency_ms: float = 20.0,
+         bandwidth: int = 0, error_rate: float = 0.0) -> int:
+    root = tempfile.mkdtemp(prefix="bench_blobs_")
+    dst = tempfile.mkdtemp(prefix="bench_dst_")
+    container = os.path.join(root, settings.AZURE_CONTAINER)
+    os.makedirs(container)
+    payload = os.urandom(size)
+    for i in range(n_files):
+        # distinct bytes per blob so the content store cannot short-circuit downloads
+        with open(os.path.join(container, f"bench_{i:06d}.pb"), "wb") as fh:
+            fh.write(i.to_bytes(8, "big") + payload[8:])
+
+    logging.getLogger("app.azure_rest").setLevel(logging.WARNING)
+    logging.getLogger("app.downloader").setLevel(logging.ERROR)
+    server = make_server(root, port=0, latency_ms=latency_ms, bandwidth=bandwidth, error_rate=error_rate, seed=42)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.AZURE_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    settings.AZURE_SAS_TOKEN = None
+    items = list(list_blobs())
+
+    print(f"{len(items)} blobs x {size} bytes, {latency_ms:.0f} ms latency, "
+          f"bandwidth={bandwidth or 'unlimited'}, error_rate={error_rate}")
+    print(f"{'workers':>8} {'seconds':>9} {'files/s':>9} {'MB/s':>8} {'failed':>7}")
+    try:
+        for workers in WORKER_COUNTS:
+            settings.DOWNLOAD_WORKERS = workers
+            azure_rest._SESSION = None  # resize the connection pool for this run
+            run_dir = os.path.join(dst, str(workers))
+            settings.CONTENT_STORE_DIR = os.path.join(run_dir, ".objects")
+            start = time.perf_counter()
+            results = list(download_many(items, lambda b: os.path.join(run_dir, b), workers=workers))
+            elapsed = time.perf_counter() - start
+            ok = sum(1 for r in results if r.ok)
+            print(f"{workers:>8} {elapsed:>9.2f} {ok / elapsed:>9.1f} {ok * size / elapsed / 1e6:>8.1f} {len(results) - ok:>7}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(dst, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    casts = (int, int, float, int, float)
+    args = [c(a) for c, a in zip(casts, sys.argv[1:6])]
+    sys.exit(main(*args))
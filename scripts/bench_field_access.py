@@ -0,0 +1,58 @@
+# scripts/bench_field_access.py
+"""
+Micro-benchmark: per-transaction cost of reading the Record fields off a
+decoded Transaction, old hasattr probing vs the precompiled accessor in
+app.field_access. Amount conversion is left out so only field access is timed.
+Run: python -m scripts.bench_field_access [n_transactions]
+"""
+import sys
+import time
+from app.field_access import transaction_accessor
+from app.proto.transactions_pb2 import TransactionBatch
+
+def _get_field(obj, *names, default=None):
+    # the probing helper parsing.py used before
+    for n in names:
+        if hasattr(obj, n):
+            return getattr(obj, n)
+    return default
+
+def probe(tx) -> tuple:
+    record_id = _get_field(tx, "recordId", "record_id", "id", default=None)
+    name = _get_field(tx, "name", default="")
+    amount = _get_field(tx, "amount", "amt", default=0)
+    currency = _get_field(tx, "currency", default="") or ""
+    timestamp = _get_field(tx, "timestamp", "time", default="") or ""
+    return (str(record_id) if record_id is not None else "", str(name), amount, str(currency), str(timestamp))
+
+def _time(fn, txs, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for tx in txs:
+            fn(tx)
+        best = min(best, time.perf_counter() - start)
+    return best / len(txs) * 1e9
+
+def main(n: int = 200_000) -> int:
+    batch = TransactionBatch()
+    for i in range(n):
+        tx = batch.transactions.add()
+        tx.record_id = f"rec-{i}"
+        tx.name = "Alice"
+        tx.amount = i / 100
+        tx.currency = "USD"
+        tx.timestamp = "2025-10-09T12:00:00Z"
+    txs = list(batch.transactions)
+    get = transaction_accessor()
+    assert all(get(tx) == probe(tx) for tx in txs[:1000])
+
+    before = _time(probe, txs)
+    after = _time(get, txs)
+    print(f"{n} transactions, best of 5")
+    print(f"{'hasattr probing':>20}: {before:8.1f} ns/tx")
+    print(f"{'compiled accessor':>20}: {after:8.1f} ns/tx  ({before / after:.1f}x)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:2]]))
@@ -0,0 +1,74 @@
+# scripts/bench_paths.py
+"""
+Benchmark: extracting the Workday mapping paths (app.workday.WORKDAY_PATHS)
+from parsed bill JSONs, the old per-call _get walk vs compiled
+app.paths extractors applied to the whole list in one call.
+Run: python -m scripts.bench_paths [n_bills]
+"""
+import random
+import sys
+import time
+from app.paths import Extractor
+from app.workday import WORKDAY_PATHS
+
+def _get(d, path):
+    # the helper the JSON mapping code used before
+    cur = d
+    for part in path.split("."):
+        if cur is None:
+            return None
+        if isinstance(cur, list):
+            try:
+                cur = cur[int(part)]
+                continue
+            except (ValueError, IndexError):
+                return None
+        if isinstance(cur, dict):
+            cur = cur.get(part)
+        else:
+            return None
+    return cur
+
+def _bill(r: random.Random, i: int) -> dict:
+    records = {"QTY": r.randint(1, 9), "UNITRATE": round(r.random() * 100, 2)}
+    if r.random() < 0.5:
+        records["TAX_CODE_ID"] = "VAT20"
+    bill = {
+        "customerRef": f"CUST-{i % 5000}",
+        "accCurrencyCode": "EUR",
+        "invoiceActualDate": "2025-10-01T00:00:00",
+        "parProdBlock": {
+            "parprodlabel": "Recurring",
+            "parprodtariffdescription": "Line rental",
+            "parprodrecurBlock": {
+                "parprodrecurfromdate": "2025-09-01",
+                "parprodrecurtodate": "2025-09-30",
+                "parprodrectable": {"records": records},
+                "parprodrectotal": {"amount": records["QTY"] * records["UNITRATE"]},
+            },
+        },
+    }
+    if r.random() < 0.1:
+        del bill["parProdBlock"]["parprodrecurBlock"]
+    return bill
+
+def main(n: int = 100_000) -> int:
+    r = random.Random(7)
+    bills = [_bill(r, i) for i in range(n)]
+    extract = Extractor(WORKDAY_PATHS)
+
+    start = time.perf_counter()
+    old = [{k: _get(b, p) for k, p in WORKDAY_PATHS.items()} for b in bills]
+    before = time.perf_counter() - start
+    start = time.perf_counter()
+    new = extract.many(bills)
+    after = time.perf_counter() - start
+    assert old == new
+
+    print(f"{n} bills x {len(WORKDAY_PATHS)} paths")
+    print(f"{'_get per call':>20}: {before:6.2f}s  {before / n * 1e6:6.2f} us/bill")
+    print(f"{'compiled, many()':>20}: {after:6.2f}s  {after / n * 1e6:6.2f} us/bill  ({before / after:.1f}x)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:2]]))
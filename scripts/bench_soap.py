@@ -0,0 +1,46 @@
+# scripts/bench_soap.py
+"""
+Benchmark SOAP dispatch against the threaded mock (app.mock_server) with a
+simulated upstream round trip: records/sec as concurrency goes up, on the
+thread backend (app.soap_dispatch) and the asyncio backend (app.soap_async).
+No database is involved.
+Run: python -m scripts.bench_soap [n_records] [latency_ms]
+"""
+import logging
+import sys
+import threading
+import time
+from decimal import Decimal
+from app.config import settings
+from app.mock_server import make_server
+from app.soap_async import dispatch_async
+from app.soap_dispatch import Outgoing, dispatch
+
+def _threads(items, c):
+    return dispatch(items, concurrency=c)
+
+RUNS = [("threads", _threads, c) for c in (1, 4, 16, 64)] + \
+       [("asyncio", dispatch_async, c) for c in (16, 64, 256)]
+
+def main(n: int = 1000, latency_ms: float = 50.0) -> int:
+    logging.getLogger("app.soap_client").setLevel(logging.WARNING)
+    server = make_server(port=0, latency_ms=latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.SOAP_WSDL_URL = f"http://127.0.0.1:{server.server_address[1]}/mock?wsdl"
+    items = [Outgoing(i, 1, f"rec-{i}", "Alice", Decimal("12.50"), "USD", "2025-10-09T12:00:00Z") for i in range(n)]
+
+    print(f"{n} records, {latency_ms:.0f} ms simulated round trip")
+    print(f"{'backend':>8} {'in flight':>9} {'seconds':>9} {'records/s':>10} {'failed':>7}")
+    try:
+        for backend, run, c in RUNS:
+            start = time.perf_counter()
+            outcomes = list(run(items, c))
+            elapsed = time.perf_counter() - start
+            failed = sum(1 for o in outcomes if not o.ok)
+            print(f"{backend:>8} {c:>9} {elapsed:>9.2f} {len(outcomes) / elapsed:>10.1f} {failed:>7}")
+    finally:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:2]], *[float(a) for a in sys.argv[2:3]]))
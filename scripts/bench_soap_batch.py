@@ -0,0 +1,64 @@
+# scripts/bench_soap_batch.py
+"""
+Benchmark ProcessTransactionBatch against the mock (app.mock_server): for
+each batch size, the HTTP requests needed, throughput, and the latency each
+record sees (the round trip of the envelope carrying it, plus resends).
+Size 1 is the one-record ProcessTransaction path. The mock adds a fixed
+round trip per request, a small cost per transaction, and fails a share of
+transactions, so partial retries are included. No database is involved.
+Run: python -m scripts.bench_soap_batch [n_records] [latency_ms] [fail_rate]
+"""
+import logging
+import statistics
+import sys
+import threading
+import time
+from decimal import Decimal
+from app.config import settings
+from app.mock_server import make_server
+from app.soap_client import send_batch_to_soap, send_record_to_soap
+from app.soap_dispatch import Outgoing, dispatch, dispatch_batches
+
+SIZES = (1, 10, 50, 200)
+CONCURRENCY = 8
+ITEM_MS = 0.2
+
+def main(n: int = 2000, latency_ms: float = 50.0, fail_rate: float = 0.01) -> int:
+    logging.getLogger("app.soap_client").setLevel(logging.CRITICAL)
+    server = make_server(port=0, latency_ms=latency_ms, item_ms=ITEM_MS, fail_rate=fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.SOAP_WSDL_URL = f"http://127.0.0.1:{server.server_address[1]}/mock?wsdl"
+    items = [Outgoing(i, 1, f"rec-{i}", "Alice", Decimal("12.50"), "USD", "2025-10-09T12:00:00Z") for i in range(n)]
+    waits: list[float] = []
+
+    def timed(send, arg, k: int):
+        start = time.perf_counter()
+        result = send(arg, backoff_seconds=0.05)
+        waits.extend([time.perf_counter() - start] * k)
+        return result
+
+    print(f"{n} records, {CONCURRENCY} threads, {latency_ms:.0f} ms round trip + {ITEM_MS} ms/transaction, "
+          f"{fail_rate:.0%} transactions failed by the mock")
+    print(f"{'batch':>6} {'requests':>9} {'saved':>7} {'seconds':>8} {'records/s':>10} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'failed':>7}")
+    try:
+        for size in SIZES:
+            waits.clear()
+            before = server.posts
+            start = time.perf_counter()
+            if size == 1:
+                outcomes = list(dispatch(items, lambda o: timed(send_record_to_soap, o, 1), CONCURRENCY))
+            else:
+                outcomes = list(dispatch_batches(items, size, lambda b: timed(send_batch_to_soap, b, len(b)),
+                                                 CONCURRENCY))
+            elapsed = time.perf_counter() - start
+            posts = server.posts - before
+            q = statistics.quantiles(waits, n=20)
+            print(f"{size:>6} {posts:>9} {1 - posts / n:>7.1%} {elapsed:>8.2f} {n / elapsed:>10.1f} "
+                  f"{q[9] * 1000:>7.0f} {q[18] * 1000:>7.0f} {sum(not o.ok for o in outcomes):>7}")
+    finally:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:2]], *[float(a) for a in sys.argv[2:4]]))
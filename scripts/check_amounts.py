@@ -0,0 +1,51 @@
+# scripts/check_amounts.py
+"""
+Check app.amounts.to_cents against what records.amount held before it:
+Decimal(str(x)) rounded half away from zero into Numeric(18, 2). Random
+amounts with 3 to 6 decimals (many of them exact half cents), known
+awkward doubles and large magnitudes go through both the NumPy and the
+array('d') paths. Exits 1 on any mismatch.
+Run: python -m scripts.check_amounts [n_values]
+"""
+import random
+import sys
+from decimal import ROUND_HALF_UP, Decimal
+from app import amounts
+
+KNOWN = [0.125, 12.345, 1.005, -0.005, 2.675, 0.615, 0.005, -2.675, 1.115, 8.345,
+         0.5, 99.995, -99.995, 1e-7, 123456789.125, 90071992547.405, 0.0, -0.0]
+
+def expected(x: float) -> int:
+    return int(Decimal(str(x)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP).scaleb(2))
+
+def samples(n: int) -> list[float]:
+    r = random.Random(15)
+    out = list(KNOWN)
+    for _ in range(n):
+        places = r.randint(3, 6)
+        whole = r.choice([r.randint(0, 99), r.randint(0, 10**6), r.randint(0, 10**12)])
+        frac = r.randrange(10**places)
+        if r.random() < 0.5:
+            frac = (frac // 10**(places - 2)) * 10**(places - 2) + 5 * 10**(places - 3)  # x.xx5
+        out.append(float(f"{'-' if r.random() < 0.3 else ''}{whole}.{frac:0{places}d}"))
+    return out
+
+def main(n: int = 200_000) -> int:
+    values = samples(n)
+    want = [expected(x) for x in values]
+    paths = {"array": None}
+    if amounts.np is not None:
+        paths = {"numpy": amounts.np, **paths}
+    bad = 0
+    for name, np in paths.items():
+        amounts.np = np
+        cents, valid = amounts.to_cents(values)
+        wrong = [(x, c, w) for x, c, ok, w in zip(values, cents, valid, want) if not ok or c != w]
+        bad += len(wrong)
+        print(f"{name}: {len(values)} values, {len(wrong)} mismatches")
+        for x, c, w in wrong[:5]:
+            print(f"  {x!r}: got {c}, Numeric(18, 2) stored {w}")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:2]]))
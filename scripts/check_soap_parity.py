@@ -0,0 +1,169 @@
+# scripts/check_soap_parity.py
+"""
+Parity check for the SOAP fast path (app.soap_fast) against Zeep.
+
+1. Requests: random records (escapable, non-ASCII, invalid and missing
+   values, odd floats) are sent to app.mock_server once through Zeep and
+   once through soap_client.process_transaction with SOAP_FAST_PATH on; the
+   bodies and SOAP headers the mock received must be byte-identical and
+   the results (or errors) equal.
+2. Replies: canned responses (results, entities, empty results, faults,
+   headers, CDATA, comments, other encodings) go through FastCodec.reply
+   and Zeep's process_reply; both must return or raise the same thing.
+3. Client-side CPU per call of both paths.
+Exits 1 on any mismatch.
+Run: python -m scripts.check_soap_parity [n_records]
+"""
+import logging
+import random
+import sys
+import threading
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from lxml import etree
+from app.config import settings
+from app.mock_server import Handler, MockServer, RESPONSE
+from app.soap_client import OPERATION, _get_client, process_transaction, transaction_args
+from app.soap_fast import codec_for
+
+CHARS = "abcXYZ 019-_.:/&<>\"'\r\n\t\x85éß€漢😀]]>"
+
+class CapturingHandler(Handler):
+    quiet = True
+    seen: list = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        self.seen.append((self.headers.get("SOAPAction"), self.headers.get("Content-Type"), body))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+def _text(r: random.Random):
+    roll = r.random()
+    if roll < 0.1:
+        return None
+    if roll < 0.15:
+        return ""
+    if roll < 0.17:
+        return "bad\x01char"
+    return "".join(r.choice(CHARS) for _ in range(r.randint(1, 12)))
+
+def _amount(r: random.Random):
+    return r.choice([0.0, -0.0, 12.5, 1e20, 1e-7, 123456789.123, float("inf"), Decimal("0.10"), r.uniform(-1e6, 1e6)])
+
+def _outcome(fn, *args):
+    try:
+        return "ok", fn(*args)
+    except Exception as e:
+        return type(e).__name__, str(e)
+
+def check_requests(client, n: int) -> int:
+    r = random.Random(23)
+    codec = codec_for(client, OPERATION)
+    fast = mismatches = 0
+    for i in range(n):
+        rec = SimpleNamespace(record_id=_text(r), name=_text(r), amount=_amount(r),
+                              currency=_text(r), timestamp=_text(r))
+        corr = f"corr-{i}" if r.random() < 0.9 else None
+        fast += codec.envelope(transaction_args(rec, corr)) is not None
+        results = []
+        for on in (False, True):
+            settings.SOAP_FAST_PATH = on
+            CapturingHandler.seen.clear()
+            results.append((_outcome(process_transaction, client, rec, corr), list(CapturingHandler.seen)))
+        if results[0] != results[1]:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"request mismatch for {rec}:\n  zeep {results[0]}\n  fast {results[1]}")
+    print(f"requests: {n} records, {fast} on the fast path, {mismatches} mismatches")
+    return mismatches
+
+def _envelope(body: bytes, xml_decl: bytes = b'<?xml version="1.0" encoding="UTF-8"?>') -> bytes:
+    return (xml_decl + b'<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+            + body + b"</soap:Envelope>")
+
+def _response(inner: bytes) -> bytes:
+    return _envelope(b'<soap:Body><ProcessTransactionResponse xmlns="http://example.com/soap">'
+                     + inner + b"</ProcessTransactionResponse></soap:Body>")
+
+FAULT = _envelope(b"<soap:Body><soap:Fault><faultcode>soap:Server</faultcode>"
+                  b"<faultstring>boom</faultstring></soap:Fault></soap:Body>")
+
+REPLIES = [
+    (200, RESPONSE),
+    (200, _response(b"<result>FAILURE</result>")),
+    (200, _response(b"<result> A&amp;B &lt;&gt;&quot;&apos; &#233;&#x20AC; </result>")),
+    (200, _response(b"<result>\xc3\xa9\xe2\x82\xac\xf0\x9f\x98\x80</result>")),
+    (200, _response(b"<result/>")),
+    (200, _response(b"<result></result>")),
+    (200, _response(b"<result>\n  SUCCESS\r\n</result>")),
+    (200, _response(b'<result a="x>y">SUCCESS</result>')),
+    (200, _response(b"<result><![CDATA[SUCCESS]]></result>")),
+    (200, _response(b"<result>SUC<!-- c -->CESS</result>")),
+    (200, _response(b"<result>a &nbsp; b</result>")),
+    (200, _response(b"")),
+    (200, _envelope(b'<soap:Body><p:ProcessTransactionResponse xmlns:p="http://example.com/soap">'
+                    b"<p:result>SUCCESS</p:result></p:ProcessTransactionResponse></soap:Body>")),
+    (200, _envelope(b"<soap:Header/><soap:Body><ProcessTransactionResponse xmlns=\"http://example.com/soap\">"
+                    b"<result>SUCCESS</result></ProcessTransactionResponse></soap:Body>")),
+    (200, _response(b"<result>caf\xe9</result>").replace(b"UTF-8", b"ISO-8859-1")),
+    (200, FAULT),
+    (500, FAULT),
+    (500, b""),
+    (200, b"not xml"),
+]
+
+def check_replies(client) -> int:
+    codec = codec_for(client, OPERATION)
+    mismatches = 0
+    for status, content in REPLIES:
+        resp = SimpleNamespace(status_code=status, headers={"Content-Type": "text/xml; charset=utf-8"},
+                               content=content, encoding=None)
+        zeep = _outcome(codec.binding.process_reply, client, codec.operation, resp)
+        fast = _outcome(codec.reply, resp)
+        if zeep != fast:
+            mismatches += 1
+            print(f"reply mismatch for {status} {content!r}:\n  zeep {zeep}\n  fast {fast}")
+    print(f"replies: {len(REPLIES)} canned responses, {mismatches} mismatches")
+    return mismatches
+
+def cpu_per_call(client, n: int = 5000) -> None:
+    codec = codec_for(client, OPERATION)
+    rec = SimpleNamespace(record_id="rec-1", name="Alice & Bob", amount=Decimal("12.50"),
+                          currency="USD", timestamp="2025-10-09T12:00:00Z")
+    resp = SimpleNamespace(status_code=200, headers={}, content=RESPONSE, encoding=None)
+    start = time.perf_counter()
+    for _ in range(n):
+        etree.tostring(client.create_message(client.service, OPERATION, **transaction_args(rec, "c")),
+                       encoding="utf-8", xml_declaration=True)
+        codec.binding.process_reply(client, codec.operation, resp)
+    zeep = (time.perf_counter() - start) / n
+    start = time.perf_counter()
+    for _ in range(n):
+        codec.envelope(transaction_args(rec, "c"))
+        codec.reply(resp)
+    fast = (time.perf_counter() - start) / n
+    print(f"cpu per call (envelope + reply): zeep {zeep * 1e6:.1f} us, fast {fast * 1e6:.1f} us ({zeep / fast:.1f}x)")
+
+def main(n: int = 500) -> int:
+    logging.getLogger("app.soap_client").setLevel(logging.ERROR)
+    server = MockServer(("127.0.0.1", 0), CapturingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.SOAP_WSDL_URL = f"http://127.0.0.1:{server.server_address[1]}/mock?wsdl"
+    try:
+        client = _get_client()
+        if codec_for(client, OPERATION) is None:
+            print("fast path unavailable for this WSDL")
+            return 1
+        bad = check_requests(client, n) + check_replies(client)
+        cpu_per_call(client)
+    finally:
+        server.shutdown()
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:2]]))
@@ -1,7 +1,9 @@
 # scripts/sync_from_azure.py
 """
-List blobs in Azure container, download unseen blobs to INCOMING_DIR,
-and insert a File row for each downloaded blob (idempotent on blob_name+etag).
+List new blobs in Azure container (incrementally, from the persisted
+sync_state checkpoint), download unseen blobs to INCOMING_DIR
+(DOWNLOAD_WORKERS in parallel), and insert a File row for each downloaded
+blob (idempotent on blob_name+etag).
 Run: python -m scripts.sync_from_azure
 """
 import os
@@ -9,11 +11,11 @@ import sys
 import pathlib
 import traceback
 from urllib.parse import unquote
-from app.azure_rest import list_blobs, download_blob
+from app.downloader import download_many
+from app.pairs import sync_pairs
+from app.sync import RECORD_BATCH, IncrementalListing, chunked, prior_versions, record_downloads, unseen_blobs
 from app.config import settings
 from app.db import session_scope
-from app.models import File, FileStatus
-from sqlalchemy.exc import IntegrityError
 from app.logging import get_logger
 
 log = get_logger("sync_from_azure")
@@ -28,57 +30,55 @@ def local_path_for_blob(blob_name: str) -> str:
     pathlib.Path(os.path.dirname(dest)).mkdir(parents=True, exist_ok=True)
     return dest
 
-def sync_once():
+def sync_once(workers: int | None = None):
     """
-    Lists blobs, downloads unseen, inserts File rows.
+    Lists blobs page by page, dedupes each page with one query, downloads
+    unseen blobs in parallel and bulk-inserts their File rows (decoding
+    in-memory downloads right away when INGEST_IN_MEMORY is on).
+    With SYNC_PAIR_MODE only complete .pb/control_*.json pairs are synced.
     """
+    if settings.SYNC_PAIR_MODE:
+        recorded = sync_pairs(local_path_for_blob, workers=workers)
+        log.info("Pair sync complete: recorded %d new files", len(recorded))
+        return
+
     seen = 0
     downloaded = 0
-    with session_scope() as s:
-        for item in list_blobs():
-            seen += 1
-            # quick existence check
-            exists = s.query(File.id).filter(
-                File.blob_name == item.name,
-                File.etag == item.etag,
-            ).first()
-            if exists:
-                log.info("Skipping already-seen blob %s (etag=%s)", item.name, item.etag)
-                continue
+    listing = IncrementalListing()
+    for page in chunked(listing):
+        seen += len(page)
+        with session_scope() as s:
+            pending = unseen_blobs(s, page)
+            prior = prior_versions(s, pending)
+        log.info("Listed %d blobs, %d unseen", len(page), len(pending))
 
-            # download to local path
-            try:
-                dest = local_path_for_blob(item.name)
-                log.info("Downloading %s -> %s", item.name, dest)
-                etag = download_blob(item.name, dest) or item.etag
-            except Exception as e:
-                log.info("Failed to download %s: %s", item.name, e)
-                log.debug("Download traceback: %s", traceback.format_exc())
-                # do not create a DB row for failed downloads
-                continue
+        # download with no DB transaction open; failed downloads get no DB row
+        def landed_results():
+            for res in download_many(pending, local_path_for_blob, workers=workers, prior=prior):
+                if res.ok:
+                    log.info("Downloaded %s -> %s (%.2fs)", res.blob_name, res.local_path or "<memory>", res.elapsed)
+                    yield res
+                else:
+                    log.info("Failed to download %s: %s", res.blob_name, res.error)
 
-            # attempt to insert File row
+        landed = set()
+        for batch in chunked(landed_results(), RECORD_BATCH):
             try:
-                f = File(
-                    blob_name=item.name,
-                    etag=etag,
-                    local_path=dest,
-                    status=FileStatus.NEW.value,
-                )
-                s.add(f)
-                # commit happens at session_scope exit; flush now to detect integrity errors immediately
-                s.flush()
-                downloaded += 1
-                log.info("Recorded File row for %s (etag=%s) id=%s", item.name, etag, f.id)
-            except IntegrityError:
-                # race: another process inserted the same blob_name+etag between our check & insert
-                s.rollback()
-                log.info("File row already inserted by another process for %s (etag=%s)", item.name, etag)
+                with session_scope() as s:
+                    ids = record_downloads(s, batch)
             except Exception as e:
-                s.rollback()
-                log.error("Failed to insert File row for %s: %s", item.name, e)
+                log.error("Failed to insert File rows for %d blobs: %s", len(batch), e)
                 log.debug("Insert traceback: %s", traceback.format_exc())
+                continue
+            downloaded += len(ids)
+            if len(ids) < len(batch):
+                # race: another process inserted some of these blob_name+etag pairs first
+                log.info("%d File rows already inserted by another process", len(batch) - len(ids))
+            landed.update(r.blob_name for r in batch)
+        # failed downloads and failed inserts both hold the watermark back
+        listing.failed(i for i in pending if i.name not in landed)
 
+    listing.save()
     log.info("Sync complete: listed %d blobs, downloaded %d new files", seen, downloaded)
 
 if __name__ == "__main__":
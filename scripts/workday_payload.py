@@ -0,0 +1,16 @@
+# scripts/workday_payload.py
+import json
+import sys
+from app.pb_sniff import RootSniffer, load_root
+from app.workday import payloads_from_pb
+
+# Usage: python -m scripts.workday_payload <file.pb> [package.module:RootClass ...] [--debug-json]
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--debug-json"]
+    if not args:
+        print("Usage: python -m scripts.workday_payload <file.pb> [module:Class ...] [--debug-json]")
+        raise SystemExit(1)
+    path, roots = args[0], args[1:] or ["app.proto.transactions_pb2:TransactionBatch"]
+    candidates = [load_root(spec) for spec in roots]
+    for payload, warnings, errors in payloads_from_pb(path, RootSniffer(candidates), "--debug-json" in sys.argv):
+        print(json.dumps({"payload": payload, "warnings": warnings, "errors": errors}, indent=2))
@@ -0,0 +1,41 @@
+# scripts/wsdl_cache.py
+"""
+Inspect or reset the WSDL cache (app.wsdl_cache).
+Run: python -m scripts.wsdl_cache show
+     python -m scripts.wsdl_cache clear [wsdl_url]   # default: everything
+     python -m scripts.wsdl_cache warm               # fetch and compile SOAP_WSDL_URL now
+"""
+import json
+import sys
+import time
+from app.config import settings
+from app.soap_client import _get_client
+from app.wsdl_cache import wsdl_cache
+
+def main(argv: list[str]) -> int:
+    cache = wsdl_cache()
+    if cache is None:
+        print("WSDL cache disabled (WSDL_CACHE_DIR is empty)")
+        return 1
+    cmd = argv[0] if argv else "show"
+    if cmd == "clear":
+        cache.invalidate(argv[1] if len(argv) > 1 else None)
+        print("cleared", argv[1] if len(argv) > 1 else cache.root)
+    elif cmd == "warm":
+        start = time.perf_counter()
+        _get_client()
+        print(f"{settings.SOAP_WSDL_URL} ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+    elif cmd == "show":
+        for meta_path in sorted((cache.root / "compiled").glob("*.json")):
+            meta = json.loads(meta_path.read_bytes())
+            age = time.time() - meta["checked"]
+            print(f"{meta['url']}  checked {age:.0f}s ago (ttl {cache.ttl}s), {len(meta['documents'])} documents")
+            for url, digest in meta["documents"].items():
+                print(f"  {digest[:12]}  {url}")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))